@@ -1,4 +1,12 @@
+import json
+import tracemalloc
 import streamlit as st
+from src.cache import cache_info
+from src.cleaning import format_step
+from src.history import HISTORY_KEY, checkout
+from src.lazy import prewarm
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun, set_memory_tracing
 
 st.set_page_config(
     page_title="Stats Dashboard",
@@ -6,16 +14,24 @@ st.set_page_config(
     layout="wide",
 )
 
+profiler = begin_rerun(st.session_state, "app")
+# scipy / matplotlib load in the background while the landing page renders
+prewarm()
+
 st.title("📊 Stats Dashboard")
 st.caption("Practical template: CSV → Cleaning → Visualize → Tests")
 
+df = session_df(st.session_state)
+if NOTICE_KEY in st.session_state:
+    st.warning(st.session_state.pop(NOTICE_KEY))
+
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.metric("Dataset loaded", "Yes" if "df" in st.session_state else "No")
+    st.metric("Dataset loaded", "Yes" if df is not None else "No")
 with col2:
-    st.metric("Rows", int(st.session_state["df"].shape[0]) if "df" in st.session_state else 0)
+    st.metric("Rows", int(df.shape[0]) if df is not None else 0)
 with col3:
-    st.metric("Columns", int(st.session_state["df"].shape[1]) if "df" in st.session_state else 0)
+    st.metric("Columns", int(df.shape[1]) if df is not None else 0)
 
 st.markdown("---")
 
@@ -34,4 +50,40 @@ st.info("Tip: If you don’t have data, use `data/sample.csv` (included).", icon
 if "log" in st.session_state and st.session_state["log"]:
     with st.expander("📌 Cleaning / Processing Log"):
         for item in st.session_state["log"]:
-            st.write("•", item)
+            st.write("•", format_step(item))
+
+if HISTORY_KEY in st.session_state:
+    history = st.session_state[HISTORY_KEY]
+    with st.expander("🕘 Dataset versions", expanded=len(history.versions) > 1):
+        for i, v in enumerate(history.versions):
+            c1, c2 = st.columns([5, 1])
+            marker = "▶ " if i == history.pos else ""
+            c1.markdown(f"{marker}**v{i}** · {v['label']}")
+            for rec in v["records"]:
+                c1.caption(format_step(rec))
+            if c2.button("Open", key=f"version-{i}", disabled=i == history.pos):
+                checkout(st.session_state, i)
+                st.rerun()
+
+with st.expander("⏱ Diagnostics"):
+    st.caption("Timing spans of this session: page reruns and every io / cleaning / stats / viz call "
+               "(rows processed, net memory allocated).")
+    d1, d2, d3 = st.columns([2, 2, 1])
+    track = d1.toggle("Count Python allocations (tracemalloc; all sessions, slower)", value=tracemalloc.is_tracing())
+    set_memory_tracing(track)
+    # the trace is serialized only on request, not on every rerun
+    if d2.button("Export Chrome trace (JSON)"):
+        d2.download_button("Download trace", json.dumps(profiler.chrome_trace()),
+                           file_name="stats_dashboard_trace.json", mime="application/json")
+    if d3.button("Clear"):
+        profiler.clear()
+    st.write("By function (slowest total first)")
+    st.dataframe(profiler.summary(), use_container_width=True)
+    st.write("Recent spans")
+    st.dataframe(profiler.frame().tail(200).iloc[::-1], use_container_width=True)
+
+info = cache_info()
+st.caption(f"Result cache: {info['size']} entries, {info['bytes'] / 2**20:,.0f}/{info['max_bytes'] / 2**20:,.0f} MB · "
+           f"{info['hits']} hits · {info['misses']} misses")
+
+end_rerun(st.session_state)
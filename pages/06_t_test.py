@@ -1,16 +1,24 @@
 import streamlit as st
 import numpy as np
-from src.stats_tests import t_test_independent
+from src.resampling import bootstrap_ci, permutation_test
+from src.cache import fingerprint
+from src.live import live_dataset
+from src.ooc import chunked_group_moments
+from src.progressive import cancellable_chunks, is_large, run_exact, show_progressive, stratified_sample
+from src.stats_tests import batch_group_tests, group_codes, group_moments, t_test_from_moments
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "06 T-test")
 
 st.title("06) T-test (Effect: mean difference)")
 st.caption("Independent two-sample t-test (Welch recommended).")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
 
-df = st.session_state["df"]
-
 alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
 equal_var = st.toggle("Assume equal variances (classic t-test)", value=False)
 
@@ -24,8 +32,23 @@ if not numeric_cols:
 gcol = st.selectbox("Group column (A/B, Before/After)", group_cols)
 vcol = st.selectbox("Numeric value column", numeric_cols)
 
-groups = df[gcol].dropna().astype("string").unique().tolist()
-groups = sorted(groups)
+# per-group n / mean / m2, built once per (group column, value column) and cached
+live = live_dataset(st.session_state)
+large = is_large(df) and live is None
+if live is not None:
+    # live mode: moments maintained across appended batches (each append only merges its own rows)
+    idx = live.aggregate("group_moments", gcol, vcol)
+elif large:
+    # large data: groups and a first answer come from a sample stratified by group;
+    # exact moments accumulate in the background (cancelled when the columns change)
+    pair = df[list(dict.fromkeys([gcol, vcol]))]
+    sample = stratified_sample(pair, gcol)
+    job = run_exact(st.session_state, "t-test", fingerprint(pair),
+                    lambda cancel: chunked_group_moments(cancellable_chunks(pair, cancel), gcol, vcol))
+    idx = job.result if job.done and job.error is None else group_moments(sample[gcol], sample[vcol])
+else:
+    idx = group_moments(df[gcol], df[vcol])
+groups = idx.index.tolist()
 
 if len(groups) < 2:
     st.info("Need at least 2 groups in group column.")
@@ -34,22 +57,65 @@ if len(groups) < 2:
 g1 = st.selectbox("Group 1", groups, index=0)
 g2 = st.selectbox("Group 2", groups, index=1 if len(groups) > 1 else 0)
 
+with st.expander("Resampling (no normality assumption)"):
+    use_perm = st.toggle("Also run a permutation test and bootstrap CI", value=False)
+    n_resamples = st.select_slider("Max permutations", options=[999, 4999, 9999, 49999, 99999], value=9999,
+                                   help="Stops early once the p-value is clearly above or below alpha.")
+
 if st.button("Run T-test", type="primary"):
     try:
-        x = df.loc[df[gcol].astype("string") == g1, vcol]
-        y = df.loc[df[gcol].astype("string") == g2, vcol]
-        res = t_test_independent(x, y, equal_var=equal_var)
+        note, box = st.empty(), st.empty()
+
+        def display(moments, provisional):
+            res = t_test_from_moments(moments.loc[g1], moments.loc[g2], equal_var=equal_var)
+            with box.container():
+                c1, c2, c3 = st.columns(3)
+                c1.metric(f"mean({g1})", f"{res['mean1']:.4f}")
+                c2.metric(f"mean({g2})", f"{res['mean2']:.4f}")
+                c3.metric("p-value" + (" (provisional)" if provisional else ""), f"{res['pvalue']:.6f}")
+
+                if res["pvalue"] < alpha:
+                    st.success("Result: mean difference is statistically significant.")
+                else:
+                    st.info("Result: no evidence of mean difference.")
 
-        c1, c2, c3 = st.columns(3)
-        c1.metric(f"mean({g1})", f"{res['mean1']:.4f}")
-        c2.metric(f"mean({g2})", f"{res['mean2']:.4f}")
-        c3.metric("p-value", f"{res['pvalue']:.6f}")
+                st.write(res)
 
-        if res["pvalue"] < alpha:
-            st.success("Result: mean difference is statistically significant.")
+        if large:
+            show_progressive(note, job, lambda: idx, display, len(sample), len(df))
         else:
-            st.info("Result: no evidence of mean difference.")
+            display(idx, False)
 
-        st.write(res)
+        if use_perm:
+            # cached factorization of the group column: integer compares, no string conversion per click
+            codes, labels = group_codes(df[gcol])
+            x, y = df.loc[codes == labels.get_loc(g1), vcol], df.loc[codes == labels.get_loc(g2), vcol]
+            with st.spinner("Resampling..."):
+                perm = permutation_test(x, y, "pooled_t" if equal_var else "welch_t", n_resamples=n_resamples, alpha=alpha)
+                boot = bootstrap_ci(x, y, "mean_diff")
+            p1, p2 = st.columns(2)
+            p1.metric("Permutation p-value", f"{perm['pvalue']:.6f}")
+            p2.metric("Bootstrap 95% CI (mean difference)", f"[{boot['ci'][0]:.4f}, {boot['ci'][1]:.4f}]")
+            note = " (stopped early: p-value clearly on one side of alpha)" if perm["stopped_early"] else ""
+            st.caption(f"{perm['n_resamples']} permutations{note}, {boot['n_resamples']} bootstrap resamples.")
     except Exception as e:
         st.error(str(e))
+
+st.markdown("---")
+st.subheader("All group pairs × all numeric columns")
+correction = st.selectbox("Multiple-comparison correction", ["holm", "bh", "none"], index=0,
+                          help="holm controls family-wise error; bh (Benjamini-Hochberg) controls false discovery rate.")
+if st.button("Run batch T-test"):
+    try:
+        res = batch_group_tests(df, gcol, [c for c in numeric_cols if c != gcol], correction=correction)
+        p_col = "t_p" if equal_var else "welch_p"
+        stat_col = "t" if equal_var else "welch_t"
+        show = res[["value_col", "group1", "group2", "n1", "n2", "mean1", "mean2", "diff", stat_col, p_col, p_col + "_adj"]]
+        show = show.sort_values(p_col + "_adj")
+        n_sig = int((show[p_col + "_adj"] < alpha).sum())
+        st.write(f"{len(show)} comparisons, {n_sig} significant after {correction} correction (alpha={alpha}).")
+        st.dataframe(show, use_container_width=True)
+    except ValueError as e:
+        st.error(str(e))
+
+end_rerun(st.session_state)
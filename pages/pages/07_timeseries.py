@@ -1,16 +1,21 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-from src.viz import plot_timeseries
+from src.live import live_dataset
+from src.render import show_plot
+from src.viz import plot_timeseries, resample_mean
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "07 Time series")
 
 st.title("07) Time Series")
 st.caption("Trend + simple moving average + resampling.")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
-
-df = st.session_state["df"]
 cols = df.columns.tolist()
 
 date_col = st.selectbox("Datetime column", cols)
@@ -22,14 +27,21 @@ freq = st.selectbox("Resample frequency", ["none", "D", "W", "M"], index=2)
 
 if st.button("Plot", type="primary"):
     try:
-        fig, ts = plot_timeseries(df, date_col, value_col, ma_window=ma, title=f"{value_col} over time")
-        st.pyplot(fig, clear_figure=True)
+        ts = show_plot(st.empty(), st.session_state, "timeseries", plot_timeseries, df, date_col, value_col,
+                       ma_window=ma, title=f"{value_col} over time")
 
         if freq != "none":
-            resampled = ts[value_col].resample(freq).mean().to_frame("value")
+            live = live_dataset(st.session_state)
+            if live is not None:
+                # live mode: per-period sums and counts maintained across appended batches
+                resampled = live.aggregate("resample", date_col, value_col, freq).to_frame("value")
+            else:
+                resampled = resample_mean(ts[value_col], freq).to_frame("value")
             st.subheader(f"Resampled mean ({freq})")
             st.dataframe(resampled.tail(30), use_container_width=True)
 
         st.info("If you see repeating ups/downs at regular intervals, you likely have seasonality (周期性).")
     except Exception as e:
         st.error(str(e))
+
+end_rerun(st.session_state)
@@ -1,16 +1,25 @@
 import streamlit as st
 import numpy as np
-from src.stats_tests import correlation
-from src.viz import plot_scatter
+import pandas as pd
+from src.cache import fingerprint
+from src.ooc import chunked_pearson
+from src.progressive import cancel_stale, cancellable_chunks, is_large, run_exact, show_progressive, stratified_sample
+from src.render import show_plot
+from src.resampling import bootstrap_ci, permutation_test
+from src.stats_tests import correlation, correlation_matrix
+from src.viz import plot_heatmap, plot_scatter
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "08 Correlation")
 
 st.title("08) Correlation")
 st.caption("Correlation checks association (not causation).")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
-
-df = st.session_state["df"]
 numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
 
 if len(numeric_cols) < 2:
@@ -18,26 +27,98 @@ if len(numeric_cols) < 2:
     st.stop()
 
 method = st.selectbox("Method", ["pearson", "spearman"], index=0)
+mode = st.radio("Mode", ["Pair (X vs Y)", "Matrix (all numeric columns)"], horizontal=True)
+
+if mode.startswith("Matrix"):
+    alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
+    mcols = st.multiselect("Columns (empty = all numeric)", numeric_cols)
+    if st.button("Run correlation matrix", type="primary"):
+        try:
+            res = correlation_matrix(df, mcols or numeric_cols, method=method)
+            show_plot(st.empty(), st.session_state, "correlation-heatmap", plot_heatmap, res["r"],
+                      title=f"{method} correlation ({len(res['r'])} columns)")
+            if res["pairwise_missing"]:
+                st.caption("Missing values handled pairwise (see n per pair below).")
+
+            i, j = np.triu_indices(len(res["r"]), k=1)
+            names = res["r"].index.to_numpy()
+            pairs = pd.DataFrame({
+                "x": names[i],
+                "y": names[j],
+                "r": res["r"].to_numpy()[i, j],
+                "pvalue": res["pvalue"].to_numpy()[i, j],
+                "n": res["n"].to_numpy()[i, j],
+            })
+            pairs = pairs.iloc[np.argsort(-np.abs(pairs["r"].to_numpy()), kind="stable")]
+            st.write(f"{int((pairs['pvalue'] < alpha).sum())} of {len(pairs)} pairs significant at alpha={alpha} (uncorrected).")
+            st.dataframe(pairs.head(1000), use_container_width=True)
+            st.warning("Even significant correlation does NOT prove causation.", icon="⚠️")
+        except Exception as e:
+            st.error(str(e))
+    st.stop()
+
 xcol = st.selectbox("X", numeric_cols, index=0)
 ycol = st.selectbox("Y", numeric_cols, index=1)
 
 alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
 
+with st.expander("Resampling (no normality assumption)"):
+    use_perm = st.toggle("Also run a permutation test and bootstrap CI", value=False)
+    n_resamples = st.select_slider("Max permutations", options=[999, 4999, 9999, 49999, 99999], value=9999,
+                                   help="Stops early once the p-value is clearly above or below alpha.")
+
+pair = df[list(dict.fromkeys([xcol, ycol]))]
+large = is_large(df)
+key = fingerprint((pair, method))
+cancel_stale(st.session_state, "correlation", key)
+
+
+def exact_correlation(cancel):
+    # Pearson accumulates per slice and stops when cancelled; Spearman needs global ranks
+    if method == "pearson":
+        return chunked_pearson(cancellable_chunks(pair, cancel), xcol, ycol)
+    return correlation(pair[xcol], pair[ycol], method=method)
+
+
 if st.button("Run correlation", type="primary"):
     try:
-        fig = plot_scatter(df[xcol], df[ycol], title=f"Scatter: {xcol} vs {ycol}")
-        st.pyplot(fig, clear_figure=True)
+        # the scatter renders after the numbers but keeps its place above them
+        scatter, note, box = st.empty(), st.empty(), st.empty()
+
+        def display(res, provisional):
+            with box.container():
+                st.metric("r" + (" (provisional)" if provisional else ""), f"{res['r']:.4f}")
+                st.metric("p-value", f"{res['pvalue']:.6f}")
 
-        res = correlation(df[xcol], df[ycol], method=method)
-        st.metric("r", f"{res['r']:.4f}")
-        st.metric("p-value", f"{res['pvalue']:.6f}")
+                if res["pvalue"] < alpha:
+                    st.success("Result: correlation is statistically significant.")
+                else:
+                    st.info("Result: correlation not statistically significant.")
 
-        if res["pvalue"] < alpha:
-            st.success("Result: correlation is statistically significant.")
+                st.write(res)
+
+        if large:
+            sample = stratified_sample(pair)
+            job = run_exact(st.session_state, "correlation", key, exact_correlation)
+            show_progressive(note, job, lambda: correlation(sample[xcol], sample[ycol], method=method),
+                             display, len(sample), len(df))
         else:
-            st.info("Result: correlation not statistically significant.")
+            display(correlation(df[xcol], df[ycol], method=method), False)
+
+        show_plot(scatter, st.session_state, "scatter", plot_scatter, df[xcol], df[ycol],
+                  title=f"Scatter: {xcol} vs {ycol}")
 
-        st.write(res)
+        if use_perm:
+            with st.spinner("Resampling..."):
+                perm = permutation_test(df[xcol], df[ycol], method, n_resamples=n_resamples, alpha=alpha)
+                boot = bootstrap_ci(df[xcol], df[ycol], method)
+            p1, p2 = st.columns(2)
+            p1.metric("Permutation p-value", f"{perm['pvalue']:.6f}")
+            p2.metric("Bootstrap 95% CI (r)", f"[{boot['ci'][0]:.4f}, {boot['ci'][1]:.4f}]")
+            note = " (stopped early: p-value clearly on one side of alpha)" if perm["stopped_early"] else ""
+            st.caption(f"{perm['n_resamples']} permutations{note}, {boot['n_resamples']} bootstrap resamples.")
         st.warning("Even significant correlation does NOT prove causation.", icon="⚠️")
     except Exception as e:
         st.error(str(e))
+
+end_rerun(st.session_state)
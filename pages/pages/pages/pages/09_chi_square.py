@@ -1,15 +1,23 @@
 import streamlit as st
 import pandas as pd
-from src.stats_tests import chi_square_independence
+from src.cache import fingerprint
+from src.live import live_dataset
+from src.progressive import cancel_stale, is_large, run_exact, show_progressive, stratified_sample
+from src.render import show_plot
+from src.stats_tests import association_matrix, chi_square_from_table, chi_square_independence
+from src.store import NOTICE_KEY, session_df
+from src.viz import plot_heatmap
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "09 Chi-square")
 
 st.title("09) Chi-square Test (Independence)")
 st.caption("Test whether two categorical variables are independent.")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
-
-df = st.session_state["df"]
 cols = df.columns.tolist()
 
 alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
@@ -17,24 +25,66 @@ alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
 row_col = st.selectbox("Row category column", cols, index=0)
 col_col = st.selectbox("Column category column", cols, index=1 if len(cols) > 1 else 0)
 
+pair = df[list(dict.fromkeys([row_col, col_col]))]
+live = live_dataset(st.session_state)
+large = is_large(df) and live is None
+key = fingerprint(pair)
+cancel_stale(st.session_state, "chi-square", key)
+
 if st.button("Run chi-square", type="primary"):
     try:
-        res = chi_square_independence(df, row_col, col_col)
+        note, box = st.empty(), st.empty()
 
-        st.subheader("Observed (contingency table)")
-        st.dataframe(res["table"], use_container_width=True)
+        def display(res, provisional):
+            with box.container():
+                if res["table"] is not None:
+                    st.subheader("Observed (contingency table)" + (" — sample counts" if provisional else ""))
+                    st.dataframe(res["table"], use_container_width=True)
 
-        st.subheader("Expected counts")
-        st.dataframe(res["expected"].round(3), use_container_width=True)
+                    st.subheader("Expected counts")
+                    st.dataframe(res["expected"].round(3), use_container_width=True)
+                else:
+                    st.info(f"Contingency table is {res['shape'][0]} x {res['shape'][1]}; computed sparse and not displayed.")
 
-        c1, c2, c3 = st.columns(3)
-        c1.metric("chi2", f"{res['chi2']:.4f}")
-        c2.metric("dof", f"{res['dof']}")
-        c3.metric("p-value", f"{res['pvalue']:.6f}")
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("chi2", f"{res['chi2']:.4f}")
+                c2.metric("dof", f"{res['dof']}")
+                c3.metric("p-value" + (" (provisional)" if provisional else ""), f"{res['pvalue']:.6f}")
+                c4.metric("Cramér's V", f"{res['cramers_v']:.4f}")
 
-        if res["pvalue"] < alpha:
-            st.success("Result: evidence of association (not independent).")
+                if res["pvalue"] < alpha:
+                    st.success("Result: evidence of association (not independent).")
+                else:
+                    st.info("Result: no evidence of association (independence plausible).")
+
+        if live is not None:
+            # live mode: contingency counts maintained across appended batches
+            display(chi_square_from_table(live.aggregate("contingency", row_col, col_col)), False)
+        elif large:
+            # sampling within row categories keeps each row's column distribution, so the test stays valid;
+            # the exact table is one bincount pass (not interruptible: a stale result is just not shown)
+            sample = stratified_sample(pair, row_col)
+            job = run_exact(st.session_state, "chi-square", key,
+                            lambda cancel: chi_square_independence(pair, row_col, col_col))
+            show_progressive(note, job, lambda: chi_square_independence(sample, row_col, col_col),
+                             display, len(sample), len(df))
         else:
-            st.info("Result: no evidence of association (independence plausible).")
+            display(chi_square_independence(df, row_col, col_col), False)
     except Exception as e:
         st.error(str(e))
+
+st.markdown("---")
+st.subheader("Association matrix (all categorical column pairs)")
+max_levels = st.number_input("Max distinct values per column", min_value=2, value=1000, step=100)
+if st.button("Run association matrix"):
+    try:
+        res = association_matrix(df, max_levels=int(max_levels))
+        show_plot(st.empty(), st.session_state, "association-heatmap", plot_heatmap, res["cramers_v"],
+                  title="Cramér's V", vmin=0.0, vmax=1.0)
+        st.dataframe(res["cramers_v"].round(3), use_container_width=True)
+        with st.expander("p-values (uncorrected)"):
+            st.dataframe(res["pvalue"], use_container_width=True)
+    except Exception as e:
+        st.error(str(e))
+
+end_rerun(st.session_state)
@@ -0,0 +1,301 @@
+"""
+Headless batch runner: the same cleaning plan and tests as the UI, over many CSV files.
+
+    python -m src.batch spec.json [--out DIR] [--workers N] [more.csv ...]
+
+Spec (JSON):
+    {
+      "inputs": ["data/*.csv"],
+      "read": {"encoding": null, "engine": "pyarrow", "dtype_backend": "pyarrow", "compact": true},
+      "chunked": false,
+      "chunk_rows": 500000,
+      "cleaning": [
+        {"step": "coerce_datetime", "col": "date"},
+        {"step": "coerce_numeric", "cols": ["amount"]},
+        {"step": "fill_missing", "numeric_strategy": "median"},
+        {"step": "drop_duplicates"},
+        {"step": "iqr_filter", "col": "amount", "k": 1.5}
+      ],
+      "tests": [
+        {"test": "t_test", "group_col": "variant", "value_col": "amount", "group1": "A", "group2": "B"},
+        {"test": "batch_group_tests", "group_col": "variant", "correction": "holm", "name": "all_pairs"}
+      ]
+    }
+
+Cleaning steps are CleaningPlan methods with their keyword arguments; tests are listed in TESTS.
+With "chunked": true a file is streamed in chunk_rows chunks and cleaned out of core (run_plan_chunked),
+so files larger than memory can be cleaned; only the cleaned result is loaded for the tests.
+Writes DIR/results.jsonl (one line per file) and DIR/timings.csv.
+"""
+from __future__ import annotations
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import CleaningPlan, SeenHashes
+from src.io import compact_dtypes, iter_csv_chunks, read_csv_bytes
+from src.ooc import DEFAULT_CHUNK_ROWS, ChunkedDataset, run_plan_chunked
+from src.stats_tests import (association_matrix, batch_binomial_tests, batch_group_tests, binomial_test,
+                             chi_square_independence, correlation, correlation_matrix, f_test_from_moments,
+                             group_moments, t_test_from_moments)
+
+CLEANING_STEPS = ("coerce_datetime", "coerce_numeric", "fill_missing", "drop_duplicates", "iqr_filter")
+
+
+def _two_groups(df: pd.DataFrame, group_col: str, value_col: str, group1=None, group2=None):
+    m = group_moments(df[group_col], df[value_col])
+    if len(m) < 2:
+        raise ValueError("Need at least 2 groups in group column.")
+    g1 = str(group1) if group1 is not None else m.index[0]
+    g2 = str(group2) if group2 is not None else m.index[1]
+    return m.loc[g1], m.loc[g2]
+
+
+def _t_test(df, group_col, value_col, group1=None, group2=None, equal_var=False):
+    return t_test_from_moments(*_two_groups(df, group_col, value_col, group1, group2), equal_var=equal_var)
+
+
+def _f_test(df, group_col, value_col, group1=None, group2=None):
+    return f_test_from_moments(*_two_groups(df, group_col, value_col, group1, group2))
+
+
+def _correlation(df, x, y, method="pearson"):
+    return correlation(df[x], df[y], method=method)
+
+
+def _chi_square(df, row_col, col_col):
+    return chi_square_independence(df, row_col, col_col)
+
+
+def _binomial(df, col, success, p0=0.5, alternative="two-sided"):
+    s = df[col].dropna()
+    k = int((s.astype("string") == str(success)).sum())
+    return binomial_test(k, int(len(s)), float(p0), alternative=alternative)
+
+
+# test name -> callable(df, **params)
+TESTS = {
+    "t_test": _t_test,
+    "f_test": _f_test,
+    "batch_group_tests": batch_group_tests,
+    "correlation": _correlation,
+    "correlation_matrix": correlation_matrix,
+    "chi_square": _chi_square,
+    "association_matrix": association_matrix,
+    "binomial": _binomial,
+    "batch_binomial_tests": batch_binomial_tests,
+}
+
+
+def build_plan(steps: list[dict]) -> CleaningPlan:
+    """CleaningPlan from spec steps: {"step": <method name>, **method kwargs}."""
+    plan = CleaningPlan()
+    for step in steps:
+        params = dict(step)
+        name = params.pop("step", None)
+        if name not in CLEANING_STEPS:
+            raise ValueError(f"Unknown cleaning step: {name!r} (expected one of {', '.join(CLEANING_STEPS)})")
+        getattr(plan, name)(**params)
+    return plan
+
+
+def load_spec(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    build_plan(spec.get("cleaning", []))
+    for t in spec.get("tests", []):
+        if t.get("test") not in TESTS:
+            raise ValueError(f"Unknown test: {t.get('test')!r} (expected one of {', '.join(TESTS)})")
+    return spec
+
+
+def unique_paths(paths: list[str]) -> list[str]:
+    """paths without repeats of the same file (compared by resolved path), first spelling kept."""
+    seen, out = set(), []
+    for p in paths:
+        real = os.path.realpath(p)
+        if real not in seen:
+            seen.add(real)
+            out.append(p)
+    return out
+
+
+def expand_inputs(patterns: list[str], base_dir: str = ".") -> list[str]:
+    files = []
+    for pat in patterns:
+        pat = pat if os.path.isabs(pat) else os.path.join(base_dir, pat)
+        files.extend(sorted(glob.glob(pat)) if glob.has_magic(pat) else [pat])
+    return unique_paths(files)
+
+
+def to_jsonable(obj):
+    """Results -> JSON-safe values (frames as split orient, NaN/inf -> null)."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return json.loads(obj.to_json(orient="split", date_format="iso", default_handler=str))
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return to_jsonable(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+def _clean_chunked(path: str, plan: CleaningPlan, read: dict, chunk_rows: int):
+    """
+    Stream one CSV through run_plan_chunked (memory bounded by chunk_rows while cleaning).
+    Returns (cleaned frame, records, kept-row hashes per seen_path, input rows).
+    """
+    opts = {"dtype_backend": read["dtype_backend"]} if read.get("dtype_backend") else {}
+    rows_in = 0
+
+    def chunks():
+        nonlocal rows_in
+        for chunk in iter_csv_chunks(path, chunk_rows, encoding=read.get("encoding"), **opts):
+            rows_in += len(chunk)
+            yield chunk
+
+    # the source is read once: later passes read the spilled parts
+    out, records = run_plan_chunked(ChunkedDataset(chunks), plan, seen_source=os.path.abspath(path))
+    try:
+        seen = plan.seen_hashes(out)
+        df = out.to_pandas()
+    finally:
+        out.cleanup()
+    return df, records, seen, rows_in
+
+
+def run_file(path: str, spec: dict) -> dict:
+    """Read, clean and test one file. Never raises: failures are reported in the result."""
+    timings = {}
+    result = {"file": path, "status": "ok"}
+    t_start = time.perf_counter()
+    try:
+        read = dict(spec.get("read", {}))
+        compact = read.pop("compact", True)
+        plan = build_plan(spec.get("cleaning", []))
+        if spec.get("chunked"):
+            t0 = time.perf_counter()
+            df, records, result["_seen"], result["rows_in"] = _clean_chunked(
+                path, plan, read, int(spec.get("chunk_rows", DEFAULT_CHUNK_ROWS)))
+            if compact:
+                df, _ = compact_dtypes(df)
+            # reading is interleaved with the cleaning passes
+            timings["read+clean"] = time.perf_counter() - t0
+        else:
+            t0 = time.perf_counter()
+            with open(path, "rb") as f:
+                df = read_csv_bytes(f.read(), **read)
+            if compact:
+                df, _ = compact_dtypes(df)
+            timings["read"] = time.perf_counter() - t0
+            result["rows_in"] = int(len(df))
+
+            t0 = time.perf_counter()
+            df, records = plan.run(df, source=os.path.abspath(path))
+            # kept-row hashes go back to the parent, the only writer of the seen-hash sets
+            result["_seen"] = plan.seen_hashes(df)
+            timings["clean"] = time.perf_counter() - t0
+        result["rows_out"] = int(len(df))
+        result["cleaning"] = to_jsonable(records)
+
+        tests = {}
+        for i, t in enumerate(spec.get("tests", [])):
+            params = dict(t)
+            name = params.pop("name", None) or f"{params['test']}_{i}"
+            func = TESTS[params.pop("test")]
+            t0 = time.perf_counter()
+            try:
+                tests[name] = {"status": "ok", "result": to_jsonable(func(df, **params))}
+            except Exception as e:
+                tests[name] = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            timings[f"test:{name}"] = time.perf_counter() - t0
+        result["tests"] = tests
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = time.perf_counter() - t_start
+    result["timings"] = timings
+    return result
+
+
+def run_batch(files: list[str], spec: dict, out_dir: str, workers: int | None = None) -> list[dict]:
+    """
+    Process files in a process pool, one file per task (the same file given twice is processed once).
+    Results are appended to out_dir/results.jsonl as they finish (so partial runs keep their output),
+    then per-file timings are written to out_dir/timings.csv in input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = unique_paths(files)
+    results = {}
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(files))) if workers > 1 and len(files) > 1 else None
+    with open(os.path.join(out_dir, "results.jsonl"), "w", encoding="utf-8") as out:
+        try:
+            if pool is None:
+                done = ((p, run_file(p, spec)) for p in files)
+            else:
+                futures = {pool.submit(run_file, p, spec): p for p in files}
+                done = ((futures[f], f.result()) for f in as_completed(futures))
+            for path, res in done:
+                for seen_path, hashes in res.pop("_seen", {}).items():
+                    SeenHashes(seen_path).record(os.path.abspath(path), hashes)
+                results[path] = res
+                out.write(json.dumps(res, ensure_ascii=False) + "\n")
+                out.flush()
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    ordered = [results[p] for p in files if p in results]
+    timings = pd.DataFrame([{"file": r["file"], "status": r["status"], "rows_in": r.get("rows_in"),
+                             "rows_out": r.get("rows_out"), **r["timings"]} for r in ordered])
+    if len(timings):
+        timings = timings[[c for c in timings.columns if c != "total"] + ["total"]]
+        timings = timings.astype({"rows_in": "Int64", "rows_out": "Int64"})
+    timings.to_csv(os.path.join(out_dir, "timings.csv"), index=False)
+    return ordered
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Run cleaning + tests over many CSVs.")
+    parser.add_argument("spec", help="JSON spec (inputs, read, cleaning, tests)")
+    parser.add_argument("files", nargs="*", help="extra CSV files (added to the spec inputs)")
+    parser.add_argument("--out", default="batch_results", help="output directory (default: batch_results)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Invalid spec: {e}", file=sys.stderr)
+        return 2
+    files = expand_inputs(spec.get("inputs", []), os.path.dirname(os.path.abspath(args.spec)))
+    files = unique_paths(files + args.files)
+    if not files:
+        print("No input files.", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    results = run_batch(files, spec, args.out, args.workers)
+    n_err = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results)} files in {time.perf_counter() - t0:.1f}s, {n_err} failed -> {args.out}", file=sys.stderr)
+    return 1 if n_err else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
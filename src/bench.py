@@ -0,0 +1,313 @@
+"""
+Benchmarks: wall time and peak memory of the I/O, cleaning, stats and viz functions and of
+end-to-end upload -> clean -> test flows, on synthetic data.
+
+    python -m src.bench --cold-start [--cold-start-target 3.0]
+    python -m src.bench --rows 1e4,1e6 [--cols 4] [--cardinality 50] [--missing 0.05] [--encoding utf-8]
+                        [--filter substring] [--baseline bench_baseline.json] [--save-baseline] [--out results.json]
+
+With --baseline, every case is compared with the stored numbers and the run exits with status 1
+listing each regression (slower than time_tolerance or larger peak than memory_tolerance).
+--save-baseline writes the current numbers instead. Baselines are machine-specific.
+--cold-start runs the landing page (app.py) in fresh interpreters and fails when the median time
+exceeds the target or when it imports a module that should load lazily (src.lazy.HEAVY_MODULES).
+Peak memory is measured with tracemalloc (NumPy/pandas buffers; Arrow's C++ pool is not traced).
+The lazily imported modules (src.lazy.HEAVY_MODULES) are imported before timing starts.
+"""
+from __future__ import annotations
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import CleaningPlan
+from src.io import compact_dtypes, read_csv_bytes
+from src.lazy import HEAVY_MODULES
+from src.ooc import ChunkedDataset, chunked_group_moments, run_plan_chunked
+from src.stats_tests import (batch_binomial_tests, batch_group_tests, chi_square_independence, correlation_matrix,
+                             group_moments)
+from src.viz import histogram_bins, pareto_table, plot_timeseries
+
+# above this many rows the data is only generated to disk and run through the chunked (out-of-core) path
+IN_MEMORY_MAX_ROWS = 20_000_000
+GENERATE_CHUNK_ROWS = 1_000_000
+
+DEFAULT_TIME_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.10
+# landing page in a fresh interpreter, median of runs (seconds)
+COLD_START_TARGET = 3.0
+
+# differences below these are noise, never regressions
+MIN_TIME_DELTA = 0.05
+MIN_MEMORY_DELTA = 1024 * 1024
+
+
+def make_dataset(rows: int, numeric_cols: int = 4, cat_cols: int = 2, cardinality: int = 50,
+                 missing_rate: float = 0.0, encoding: str = "utf-8", seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic dataset: a daily `date` column, `seg_*` categorical columns with `cardinality` levels
+    (non-ASCII labels for cp932), `x_*` numeric columns with group-dependent means and a few outliers,
+    a 0/1 `flag` success column. missing_rate blanks that share of seg/x values.
+    """
+    rng = np.random.default_rng(seed)
+    prefix = "区分" if encoding == "cp932" else "seg"
+    labels = np.array([f"{prefix}{i:04d}" for i in range(cardinality)], dtype=object)
+    data = {"date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D")}
+    codes = rng.zipf(1.3, rows) % cardinality
+    for i in range(cat_cols):
+        data[f"seg_{i}"] = labels[codes if i == 0 else rng.integers(0, cardinality, rows)]
+    for i in range(numeric_cols):
+        x = rng.normal(codes * 0.01 * (i + 1), 1.0 + i, rows)
+        x[rng.random(rows) < 0.001] *= 50
+        data[f"x_{i}"] = np.round(x, 4)
+    data["flag"] = (rng.random(rows) < 0.05 + (codes % 7) * 0.01).astype(np.int8)
+    df = pd.DataFrame(data)
+    if missing_rate:
+        for c in df.columns:
+            if c.startswith(("seg_", "x_")):
+                df.loc[rng.random(rows) < missing_rate, c] = None
+    return df
+
+
+def make_csv(rows: int, path: str | None = None, encoding: str = "utf-8", seed: int = 0, **kwargs) -> bytes | str:
+    """CSV of make_dataset: bytes in memory, or written to `path` in chunks (for sizes that do not fit)."""
+    if path is None:
+        return make_dataset(rows, encoding=encoding, seed=seed, **kwargs).to_csv(index=False).encode(encoding)
+    with open(path, "wb") as f:
+        for i, start in enumerate(range(0, rows, GENERATE_CHUNK_ROWS)):
+            n = min(GENERATE_CHUNK_ROWS, rows - start)
+            chunk = make_dataset(n, encoding=encoding, seed=seed + i, **kwargs)
+            text = chunk.to_csv(index=False, header=i == 0)
+            # only the first chunk carries a BOM
+            f.write(text.encode(encoding if i == 0 else encoding.replace("-sig", "")))
+    return path
+
+
+def warm_up(modules: tuple[str, ...] = HEAVY_MODULES) -> None:
+    """Import the lazily loaded modules before timing, so the first stats/viz case does not absorb them."""
+    for name in modules:
+        importlib.import_module(name)
+
+
+def measure(fn: Callable[[], object], repeat: int = 3) -> dict:
+    """Best wall time over `repeat` untraced runs, then one traced run for the peak allocation."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": int(peak)}
+
+
+def _clean_plan() -> CleaningPlan:
+    return (CleaningPlan().coerce_datetime("date").fill_missing("median").drop_duplicates()
+            .iqr_filter("x_0", k=1.5))
+
+
+def _flow(csv: bytes) -> None:
+    df, _ = compact_dtypes(read_csv_bytes(csv, engine="pyarrow", dtype_backend="pyarrow"))
+    df, _ = _clean_plan().run(df)
+    batch_group_tests.uncached(df, "seg_0", None, "holm")
+    chi_square_independence.uncached(df, "seg_0", "seg_1")
+    correlation_matrix.uncached(df, None, "pearson")
+
+
+def _chunked_flow(path: str) -> None:
+    out, _ = run_plan_chunked(ChunkedDataset.from_csv(path), _clean_plan())
+    try:
+        chunked_group_moments(out, "seg_0", "x_0")
+    finally:
+        out.cleanup()
+
+
+def cases(ctx: dict) -> dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable over the prepared data (memoization bypassed)."""
+    if "csv_path" in ctx:
+        return {"flow:chunked_clean_test": lambda: _chunked_flow(ctx["csv_path"])}
+    csv, df, cdf = ctx["csv"], ctx["df"], ctx["compact"]
+    return {
+        "io:read_csv_bytes[c]": lambda: read_csv_bytes(csv),
+        "io:read_csv_bytes[pyarrow]": lambda: read_csv_bytes(csv, engine="pyarrow", dtype_backend="pyarrow"),
+        "io:compact_dtypes": lambda: compact_dtypes(df),
+        "clean:plan": lambda: _clean_plan().run(df),
+        "clean:fill_missing": lambda: CleaningPlan().fill_missing("median").run(df),
+        "clean:drop_duplicates": lambda: CleaningPlan().drop_duplicates().run(df),
+        "clean:iqr_filter": lambda: CleaningPlan().iqr_filter("x_0").run(df),
+        "stats:group_moments": lambda: group_moments.uncached(cdf["seg_0"], cdf["x_0"]),
+        "stats:batch_group_tests": lambda: batch_group_tests.uncached(cdf, "seg_0", None, "holm"),
+        "stats:batch_binomial_tests": lambda: batch_binomial_tests.uncached(cdf, "seg_0", "flag", 0.05),
+        "stats:correlation_matrix": lambda: correlation_matrix.uncached(cdf, None, "pearson"),
+        "stats:chi_square_independence": lambda: chi_square_independence.uncached(cdf, "seg_0", "seg_1"),
+        "viz:histogram_bins": lambda: histogram_bins.uncached(cdf["x_0"], 20),
+        "viz:pareto_table": lambda: pareto_table.uncached(cdf, "seg_0"),
+        "viz:plot_timeseries": lambda: plot_timeseries(cdf, "date", "x_0", 7, "Time Series", 2000),
+        "flow:upload_clean_test": lambda: _flow(csv),
+    }
+
+
+def run_suite(rows_list: list[int], only: str | None = None, repeat: int = 3, progress=None, **data_kwargs) -> dict:
+    """-> {"<case>[rows=N]": {"seconds", "peak_bytes"}}"""
+    warm_up()
+    results = {}
+    for rows in rows_list:
+        with tempfile.TemporaryDirectory(prefix="stats_dashboard_bench_") as tmp:
+            if rows > IN_MEMORY_MAX_ROWS:
+                ctx = {"csv_path": make_csv(rows, os.path.join(tmp, "bench.csv"), **data_kwargs)}
+            else:
+                csv = make_csv(rows, **data_kwargs)
+                df = read_csv_bytes(csv, engine="pyarrow", dtype_backend="pyarrow")
+                ctx = {"csv": csv, "df": df, "compact": _clean_plan().run(compact_dtypes(df)[0])[0]}
+            for name, fn in cases(ctx).items():
+                if only and only not in name:
+                    continue
+                key = f"{name}[rows={rows}]"
+                results[key] = measure(fn, repeat=1 if rows >= 1_000_000 else repeat)
+                if progress is not None:
+                    progress(key, results[key])
+    return results
+
+
+# runs in a fresh interpreter: time to the end of the first script run, and which heavy modules got loaded
+_COLD_START_CODE = """
+import json, sys, time
+t0 = time.perf_counter()
+try:
+    from streamlit.testing.v1 import AppTest
+except ImportError:
+    AppTest = None
+if AppTest is not None:
+    AppTest.from_file(sys.argv[1], default_timeout=120).run()
+else:
+    # no streamlit: only the script's own imports (a lower bound)
+    import ast
+    tree = ast.parse(open(sys.argv[1], encoding="utf-8").read())
+    imports = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))
+               and "streamlit" not in ast.unparse(n)]
+    exec(compile(ast.Module(imports, []), sys.argv[1], "exec"), {})
+print(json.dumps({"seconds": time.perf_counter() - t0, "streamlit": AppTest is not None,
+                  "loaded": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def cold_start(script: str = "app.py", runs: int = 3, cwd: str | None = None) -> dict:
+    """
+    Time `script` from a fresh interpreter (imports + first run) `runs` times.
+    Pre-warm is disabled so that eagerly imported heavy modules show up in "loaded".
+    """
+    cwd = cwd or os.getcwd()
+    env = {**os.environ, "STATS_DASHBOARD_PREWARM": "0", "PYTHONPATH": cwd}
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", _COLD_START_CODE, script, *HEAVY_MODULES],
+                              cwd=cwd, env=env, capture_output=True, text=True, check=True)
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(s["seconds"] for s in samples),
+        "runs": [s["seconds"] for s in samples],
+        "streamlit": samples[0]["streamlit"],
+        "loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float = DEFAULT_TIME_TOLERANCE,
+            memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE) -> list[str]:
+    """Regressions of results against a baseline, as readable lines (empty = none)."""
+    out = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        dt = cur["seconds"] - base["seconds"]
+        if dt > MIN_TIME_DELTA and cur["seconds"] > base["seconds"] * (1 + time_tolerance):
+            out.append(f"{key}: time {base['seconds']:.3f}s -> {cur['seconds']:.3f}s "
+                       f"(+{cur['seconds'] / base['seconds'] - 1:.0%})")
+        dm = cur["peak_bytes"] - base["peak_bytes"]
+        if dm > MIN_MEMORY_DELTA and cur["peak_bytes"] > base["peak_bytes"] * (1 + memory_tolerance):
+            out.append(f"{key}: peak memory {base['peak_bytes'] / 2**20:.1f} MB -> {cur['peak_bytes'] / 2**20:.1f} MB "
+                       f"(+{cur['peak_bytes'] / max(base['peak_bytes'], 1) - 1:.0%})")
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.bench", description="Benchmark the dashboard functions.")
+    parser.add_argument("--rows", default="1e4,1e5,1e6", help="comma-separated row counts (1e4 .. 1e8)")
+    parser.add_argument("--cols", type=int, default=4, help="numeric columns")
+    parser.add_argument("--cat-cols", type=int, default=2, help="categorical columns (min 2)")
+    parser.add_argument("--cardinality", type=int, default=50, help="levels per categorical column")
+    parser.add_argument("--missing", type=float, default=0.0, help="missing-value rate")
+    parser.add_argument("--encoding", default="utf-8", choices=["utf-8", "utf-8-sig", "cp932"])
+    parser.add_argument("--filter", default=None, help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against (or to write)")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--cold-start", action="store_true", help="only measure the landing page cold start")
+    parser.add_argument("--cold-start-target", type=float, default=COLD_START_TARGET, help="seconds")
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        res = cold_start()
+        print(f"cold start (app.py{'' if res['streamlit'] else ', imports only: streamlit not installed'}): "
+              f"{res['seconds']:.2f}s median of {', '.join(f'{t:.2f}' for t in res['runs'])}")
+        failures = []
+        if res["seconds"] > args.cold_start_target:
+            failures.append(f"cold start {res['seconds']:.2f}s exceeds target {args.cold_start_target:.2f}s")
+        if res["loaded"]:
+            failures.append(f"landing page imports {', '.join(res['loaded'])} eagerly (use src.lazy)")
+        for line in failures:
+            print("COLD START REGRESSION: " + line, file=sys.stderr)
+        return 1 if failures else 0
+
+    rows_list = [int(float(r)) for r in args.rows.split(",") if r.strip()]
+
+    def report(key, res):
+        print(f"{key:<55} {res['seconds']:>9.4f}s {res['peak_bytes'] / 2**20:>10.1f} MB", flush=True)
+
+    results = run_suite(rows_list, args.filter, args.repeat, progress=report, numeric_cols=args.cols,
+                        cat_cols=max(args.cat_cols, 2), cardinality=args.cardinality,
+                        missing_rate=args.missing, encoding=args.encoding)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.baseline and args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Baseline written: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\nPERFORMANCE REGRESSION ({len(regressions)}):", file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import functools
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+# total size of cached results (DataFrames, arrays, bytes; estimated from their buffers)
+DEFAULT_MAX_BYTES = int(os.environ.get("STATS_DASHBOARD_CACHE_MB", "512")) * 1024 * 1024
+
+# digests of immutable (Arrow) columns, valid while the array they were computed for is alive
+_DIGESTS: dict[int, tuple[weakref.ref, str]] = {}
+_DIGESTS_LOCK = threading.Lock()
+
+
+def _content_hash(s: pd.Series) -> str:
+    return hashlib.blake2b(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes(),
+                           digest_size=16).hexdigest()
+
+
+def _arrow_digest(s: pd.Series, chunked) -> str:
+    key = id(chunked)
+    with _DIGESTS_LOCK:
+        entry = _DIGESTS.get(key)
+    if entry is not None and entry[0]() is chunked:
+        return entry[1]
+    digest = _content_hash(s)
+
+    def forget(ref, key=key):
+        with _DIGESTS_LOCK:
+            if _DIGESTS.get(key, (None,))[0] is ref:
+                del _DIGESTS[key]
+
+    with _DIGESTS_LOCK:
+        _DIGESTS[key] = (weakref.ref(chunked, forget), digest)
+    return digest
+
+
+def series_fingerprint(s: pd.Series) -> str:
+    """
+    Content fingerprint of a column: a hash of every value (plus name, dtype and length).
+    Arrow-backed columns (store-backed frames) are immutable, so their hash is computed once per
+    array and reused while that array object is alive; numpy-backed columns can be written in
+    place and are hashed on every call.
+    """
+    arr = s.array
+    chunked = arr.__arrow_array__() if hasattr(arr, "__arrow_array__") else None
+    digest = _content_hash(s) if chunked is None else _arrow_digest(s, chunked)
+    return f"{s.name!r}|{s.dtype}|{len(s)}|{digest}"
+
+
+def fingerprint(obj) -> object:
+    """Hashable cache key for an argument (frames/series by content fingerprint)."""
+    if isinstance(obj, pd.DataFrame):
+        return ("df", len(obj), tuple((str(c), series_fingerprint(obj[c])) for c in obj.columns))
+    if isinstance(obj, pd.Series):
+        return ("s", series_fingerprint(obj))
+    if isinstance(obj, (list, tuple)):
+        return (type(obj).__name__, tuple(fingerprint(x) for x in obj))
+    if isinstance(obj, dict):
+        return ("dict", tuple(sorted((k, fingerprint(v)) for k, v in obj.items())))
+    if isinstance(obj, np.ndarray):
+        return ("nd", obj.dtype.str, obj.shape, hashlib.blake2b(obj.tobytes(), digest_size=16).hexdigest())
+    hash(obj)
+    return obj
+
+
+def nbytes(value) -> int:
+    """Approximate memory held by a cached value (buffers of frames / arrays, containers summed)."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return 64 + sum(nbytes(v) for v in value.values())
+    nb = getattr(value, "nbytes", None)
+    return int(nb) if isinstance(nb, (int, np.integer)) else 64
+
+
+class ResultCache:
+    """LRU of function results shared by every memoized function, bounded by the bytes they hold."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self.bytes = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+
+    def get(self, name: str, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits[name] += 1
+                return True, self._data[key][0]
+            self.misses[name] += 1
+            return False, None
+
+    def put(self, key, value) -> None:
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, n) = self._data.popitem(last=False)
+                self.bytes -= n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits.clear()
+            self.misses.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": int(sum(self.hits.values())),
+                "misses": int(sum(self.misses.values())),
+                "by_function": {n: {"hits": self.hits[n], "misses": self.misses[n]}
+                                for n in sorted(set(self.hits) | set(self.misses))},
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def memoize(func=None, *, cache: ResultCache = RESULT_CACHE):
+    """
+    Cache results keyed on (function, argument fingerprints).
+    Cached results are shared between callers and sessions: treat them as read-only.
+    Exceptions are not cached.
+    """
+    if func is None:
+        return functools.partial(memoize, cache=cache)
+
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key = (name, fingerprint(args), fingerprint(kwargs))
+        except TypeError:
+            return func(*args, **kwargs)
+        hit, value = cache.get(name, key)
+        if hit:
+            return value
+        value = func(*args, **kwargs)
+        cache.put(key, value)
+        return value
+
+    wrapper.uncached = func
+    return wrapper
+
+
+def cache_info() -> dict:
+    return RESULT_CACHE.info()
+
+
+def cache_clear() -> None:
+    RESULT_CACHE.clear()
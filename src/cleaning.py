@@ -1,79 +1,412 @@
 from __future__ import annotations
+import glob
+import hashlib
+import os
+import tempfile
+
 import numpy as np
 import pandas as pd
 
+from src.profiling import traced
+from src.sketches import approx_quantiles
 
-def coerce_datetime(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    out = df.copy()
-    out[col] = pd.to_datetime(out[col], errors="coerce")
-    return out
 
+@traced("cleaning")
+def row_hashes(df: pd.DataFrame, subset: list[str] | None = None) -> np.ndarray:
+    """64-bit hash per row over `subset` (all columns by default); index ignored."""
+    frame = df[subset] if subset else df
+    for c in frame.columns:
+        if pd.api.types.is_float_dtype(frame[c]):
+            x = frame[c].to_numpy(dtype=float, na_value=np.nan)
+            if (np.signbit(x) & (x == 0)).any():
+                # -0.0 == 0.0 for duplicate detection, but they hash differently
+                frame = frame.copy(deep=False)
+                frame[c] = frame[c] + 0.0
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
 
-def coerce_numeric(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    out = df.copy()
-    out[col] = pd.to_numeric(out[col], errors="coerce")
+
+class RowHashSet:
+    """
+    Set of 64-bit row hashes kept as sorted runs (one per add, merged when they pile up),
+    so adding a chunk costs a sort of that chunk, not of everything seen so far.
+    Lookups are binary searches.
+    """
+
+    MAX_RUNS = 8
+
+    def __init__(self, hashes: np.ndarray | None = None):
+        self._runs: list[np.ndarray] = []
+        if hashes is not None and len(hashes):
+            self.add(hashes)
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self._runs)
+
+    @property
+    def hashes(self) -> np.ndarray:
+        self._merge()
+        return self._runs[0] if self._runs else np.empty(0, dtype=np.uint64)
+
+    def _merge(self) -> None:
+        if len(self._runs) > 1:
+            # stable sort of concatenated sorted runs is a merge (timsort finds the runs)
+            merged = np.sort(np.concatenate(self._runs), kind="stable")
+            keep = np.ones(len(merged), dtype=bool)
+            keep[1:] = merged[1:] != merged[:-1]
+            self._runs = [merged[keep]]
+
+    def contains(self, h: np.ndarray) -> np.ndarray:
+        out = np.zeros(len(h), dtype=bool)
+        for run in self._runs:
+            pos = np.minimum(np.searchsorted(run, h), len(run) - 1)
+            out |= run[pos] == h
+        return out
+
+    def add(self, h: np.ndarray) -> None:
+        run = np.unique(np.asarray(h, dtype=np.uint64))
+        if len(run):
+            self._runs.append(run)
+            if len(self._runs) > self.MAX_RUNS:
+                self._merge()
+
+
+class SeenHashes:
+    """
+    Persistent row hashes of earlier data: a directory with one sorted .npy file per source
+    (a dataset's history root, a batch input file), each holding the rows that source's latest
+    committed cleaning kept. A source is never checked against its own file, so re-running a
+    cleaning (or re-applying it after undo) does not drop the source's own rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, source: str) -> str:
+        name = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.path, f"{name}.npy")
+
+    def load(self, exclude: str | None = None) -> RowHashSet:
+        """Hashes recorded by every source except `exclude`."""
+        out = RowHashSet()
+        if not os.path.isdir(self.path):
+            return out
+        skip = self._file(exclude) if exclude is not None else None
+        for f in sorted(glob.glob(os.path.join(self.path, "*.npy"))):
+            if f != skip:
+                out.add(np.load(f, mmap_mode="r"))
+        return out
+
+    def record(self, source: str, hashes: np.ndarray) -> None:
+        """Replace the hashes of `source` (atomic; concurrent writers of other sources never collide)."""
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        os.close(fd)
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, np.unique(np.asarray(hashes, dtype=np.uint64)))
+            os.replace(tmp, self._file(source))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+@traced("cleaning")
+def duplicate_groups(df: pd.DataFrame, subset: list[str] | None = None, max_groups: int = 1000) -> pd.DataFrame:
+    """
+    Groups of duplicate rows (by 64-bit hash over subset), largest first.
+    Columns: count, first_index, indices, plus the key values of the first row.
+    """
+    h = row_hashes(df, subset)
+    codes, uniq = pd.factorize(h)
+    counts = np.bincount(codes, minlength=len(uniq))
+    dup_codes = np.flatnonzero(counts > 1)
+    if not len(dup_codes):
+        return pd.DataFrame(columns=["count", "first_index", "indices"] + list(subset or df.columns))
+
+    dup_codes = dup_codes[np.argsort(-counts[dup_codes], kind="stable")][:max_groups]
+    rows = np.flatnonzero(np.isin(codes, dup_codes))
+    by_group = pd.Series(df.index[rows]).groupby(codes[rows]).agg(list)
+    firsts = by_group.str[0]
+    out = df.loc[firsts.loc[dup_codes].to_numpy(), list(subset or df.columns)].reset_index(drop=True)
+    out.insert(0, "indices", by_group.loc[dup_codes].to_numpy())
+    out.insert(0, "first_index", firsts.loc[dup_codes].to_numpy())
+    out.insert(0, "count", counts[dup_codes])
     return out
 
 
-def drop_duplicates(df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
-    before = len(df)
-    out = df.drop_duplicates()
-    return out, before - len(out)
+def _is_text(s: pd.Series) -> bool:
+    return isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(s)
+
+
+def _fill_text(s: pd.Series, value: str = "Unknown") -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype) and value not in s.cat.categories:
+        s = s.cat.add_categories([value])
+    return s.fillna(value)
 
 
-def fill_missing(df: pd.DataFrame, numeric_strategy: str = "median") -> tuple[pd.DataFrame, dict]:
+class CleaningPlan:
     """
-    numeric_strategy: 'median' or 'mean' or 'zero'
-    categorical: fill with 'Unknown'
+    Records cleaning steps and runs them in one fused pass.
+    Columns are only copied when a step rewrites them (the rest are shared with the input),
+    and row filters (duplicates, outliers) are combined into one mask applied once at the end.
+    Each executed step yields a structured record that replaces the free-text log.
     """
-    out = df.copy()
-    report = {"numeric_filled": 0, "categorical_filled": 0}
-
-    num_cols = out.select_dtypes(include=[np.number]).columns.tolist()
-    cat_cols = [c for c in out.columns if c not in num_cols]
-
-    # numeric
-    for c in num_cols:
-        missing = int(out[c].isna().sum())
-        if missing == 0:
-            continue
-        if numeric_strategy == "mean":
-            val = out[c].mean()
-        elif numeric_strategy == "zero":
-            val = 0
+
+    def __init__(self):
+        self.steps: list[dict] = []
+        self._source: str | None = None
+
+    def coerce_datetime(self, col: str) -> CleaningPlan:
+        self.steps.append({"step": "coerce_datetime", "column": col})
+        return self
+
+    def coerce_numeric(self, cols: str | list[str]) -> CleaningPlan:
+        for c in [cols] if isinstance(cols, str) else cols:
+            self.steps.append({"step": "coerce_numeric", "column": c})
+        return self
+
+    def fill_missing(self, numeric_strategy: str = "median", approx_eps: float | None = None) -> CleaningPlan:
+        """
+        Numeric columns: numeric_strategy ('median', 'mean' or 'zero'); every other column: "Unknown".
+        approx_eps: compute medians with a quantile sketch (rank error ~approx_eps) instead of exactly.
+        """
+        step = {"step": "fill_missing", "numeric_strategy": numeric_strategy}
+        if approx_eps:
+            step["approx_eps"] = float(approx_eps)
+        self.steps.append(step)
+        return self
+
+    def drop_duplicates(self, subset: list[str] | None = None, seen_path: str | None = None) -> CleaningPlan:
+        """
+        Drop repeated rows by 64-bit row hash over subset (all columns by default), keeping the first.
+        seen_path: SeenHashes directory; rows recorded there by other sources are dropped too.
+        The kept rows are recorded only by record_seen, once the result is committed.
+        """
+        step = {"step": "drop_duplicates"}
+        if subset:
+            step["subset"] = list(subset)
+        if seen_path:
+            step["seen_path"] = seen_path
+        self.steps.append(step)
+        return self
+
+    def iqr_filter(self, col: str, k: float = 1.5, approx_eps: float | None = None) -> CleaningPlan:
+        """approx_eps: compute quartiles with a quantile sketch (rank error ~approx_eps) instead of exactly."""
+        step = {"step": "iqr_filter", "column": col, "k": float(k)}
+        if approx_eps:
+            step["approx_eps"] = float(approx_eps)
+        self.steps.append(step)
+        return self
+
+    @traced("cleaning")
+    def run(self, df: pd.DataFrame, source: str | None = None) -> tuple[pd.DataFrame, list[dict]]:
+        """source: id of the data being cleaned, excluded from seen-hash checks (see SeenHashes)."""
+        self._source = source
+        out = df.copy(deep=False)
+        keep = None
+        records = []
+        for step in self.steps:
+            keep, result = getattr(self, "_" + step["step"])(out, keep, step)
+            records.append({**step, **result})
+        if keep is not None and not keep.all():
+            out = out.loc[keep]
+        return out, records
+
+    def seen_hashes(self, chunks) -> dict[str, np.ndarray]:
+        """Row hashes of the final cleaned rows per seen_path (chunks: a DataFrame or an iterable of them)."""
+        steps = [s for s in self.steps if s["step"] == "drop_duplicates" and s.get("seen_path")]
+        if not steps:
+            return {}
+        parts: dict[str, list[np.ndarray]] = {s["seen_path"]: [] for s in steps}
+        for chunk in [chunks] if isinstance(chunks, pd.DataFrame) else chunks:
+            for step in steps:
+                parts[step["seen_path"]].append(row_hashes(chunk, step.get("subset")))
+        return {path: np.concatenate(p) if p else np.empty(0, dtype=np.uint64) for path, p in parts.items()}
+
+    def record_seen(self, chunks, source: str) -> None:
+        """After the cleaned result is committed: record its rows as `source` in the plan's seen-hash sets."""
+        for path, hashes in self.seen_hashes(chunks).items():
+            SeenHashes(path).record(source, hashes)
+
+    @staticmethod
+    def touched_columns(records: list[dict]) -> set[str] | None:
+        """Columns rewritten by an executed plan, or None if rows were dropped (every column changed)."""
+        touched = set()
+        for rec in records:
+            if rec["step"] in ("drop_duplicates", "iqr_filter") and rec.get("removed"):
+                return None
+            if rec["step"] in ("coerce_datetime", "coerce_numeric"):
+                touched.add(rec["column"])
+            elif rec["step"] == "fill_missing":
+                touched.update(rec.get("filled_columns", []))
+        return touched
+
+    # --- step kernels: (frame, live-row mask, step) -> (mask, result) ---
+
+    @staticmethod
+    def _live(s: pd.Series, keep: np.ndarray | None) -> pd.Series:
+        return s if keep is None else s[keep]
+
+    def _coerce_datetime(self, out, keep, step):
+        c = step["column"]
+        before = int(out[c].isna().sum())
+        out[c] = pd.to_datetime(out[c], errors="coerce")
+        return keep, {"coerced_na": int(out[c].isna().sum()) - before}
+
+    def _coerce_numeric(self, out, keep, step):
+        c = step["column"]
+        before = int(out[c].isna().sum())
+        out[c] = pd.to_numeric(out[c], errors="coerce")
+        return keep, {"coerced_na": int(out[c].isna().sum()) - before}
+
+    def _fill_missing(self, out, keep, step):
+        strategy = step["numeric_strategy"]
+        num_cols = set(out.select_dtypes(include=[np.number]).columns)
+        report = {"numeric_filled": 0, "categorical_filled": 0, "filled_columns": []}
+        medians = {}
+        if strategy == "median" and step.get("approx_eps") and "values" not in step:
+            # one streaming sketch pass per column, columns in parallel
+            targets = {c: self._live(out[c], keep) for c in num_cols if out[c].isna().any()}
+            medians = approx_quantiles(targets, [0.5], eps=step["approx_eps"])
+            report["approx_rank_error"] = max((err for _, err in medians.values()), default=0.0)
+        for c in out.columns:
+            live = self._live(out[c], keep)
+            missing = int(live.isna().sum())
+            if missing == 0:
+                continue
+            if c in num_cols:
+                if c in step.get("values", {}):
+                    # precomputed (e.g. global statistics from an out-of-core pass)
+                    val = step["values"][c]
+                elif strategy == "mean":
+                    val = live.mean()
+                elif strategy == "zero":
+                    val = 0
+                elif c in medians:
+                    val = float(medians[c][0][0])
+                else:
+                    val = live.median()
+                out[c] = out[c].fillna(val)
+                report["numeric_filled"] += missing
+                report["filled_columns"].append(c)
+            else:
+                # every non-numeric column gets "Unknown"; datetimes / booleans become object columns
+                out[c] = _fill_text(out[c]) if _is_text(out[c]) else out[c].astype(object).fillna("Unknown")
+                report["categorical_filled"] += missing
+                report["filled_columns"].append(c)
+        return keep, report
+
+    def _drop_duplicates(self, out, keep, step):
+        idx = np.arange(len(out)) if keep is None else np.flatnonzero(keep)
+        h = row_hashes(out.iloc[idx] if keep is not None else out, step.get("subset"))
+        dup = pd.Series(h).duplicated().to_numpy()
+        result = {"removed": int(dup.sum()), "groups": int(pd.Series(h[dup]).nunique())}
+
+        if step.get("seen_path"):
+            old = SeenHashes(step["seen_path"]).load(exclude=self._source).contains(h) & ~dup
+            result["removed_history"] = int(old.sum())
+            result["removed"] += result["removed_history"]
+            dup = dup | old
+
+        if not dup.any():
+            return keep, result
+        keep = np.ones(len(out), dtype=bool) if keep is None else keep.copy()
+        keep[idx[dup]] = False
+        return keep, result
+
+    def _iqr_filter(self, out, keep, step):
+        c, k = step["column"], step["k"]
+        s = pd.to_numeric(out[c], errors="coerce")
+        live = self._live(s, keep)
+        approx = {}
+        if "lower" in step:
+            # precomputed bounds (e.g. from an out-of-core statistics pass)
+            lower, upper = step["lower"], step["upper"]
+            if lower is None:
+                return keep, {"removed": 0}
+            in_range = ((s >= lower) & (s <= upper)).fillna(False).to_numpy(dtype=bool)
+            new_keep = in_range if keep is None else keep & in_range
+            return new_keep, {"removed": int(len(live) - new_keep.sum())}
+        if step.get("approx_eps"):
+            (q1, q3), err = approx_quantiles({c: live}, [0.25, 0.75], eps=step["approx_eps"])[c]
+            approx = {"approx_rank_error": err}
         else:
-            val = out[c].median()
-        out[c] = out[c].fillna(val)
-        report["numeric_filled"] += missing
+            q1 = live.quantile(0.25)
+            q3 = live.quantile(0.75)
+        iqr = q3 - q1
+        if pd.isna(iqr) or iqr == 0:
+            return keep, {"removed": 0, "lower": None, "upper": None, **approx}
 
-    # categorical
-    for c in cat_cols:
-        missing = int(out[c].isna().sum())
-        if missing == 0:
-            continue
-        out[c] = out[c].fillna("Unknown")
-        report["categorical_filled"] += missing
+        lower = q1 - k * iqr
+        upper = q3 + k * iqr
+        in_range = ((s >= lower) & (s <= upper)).fillna(False).to_numpy(dtype=bool)
+        new_keep = in_range if keep is None else keep & in_range
+        removed = len(live) - int(new_keep.sum())
+        return new_keep, {"removed": int(removed), "lower": float(lower), "upper": float(upper), **approx}
 
-    return out, report
+
+def format_step(record: dict | str) -> str:
+    """Human-readable line for a plan record (plain strings pass through)."""
+    if isinstance(record, str):
+        return record
+    text = _format_step(record)
+    if record.get("approx_rank_error") is not None and record.get("approx_eps"):
+        text += f" [approximate quantiles, rank error ≤ {record['approx_rank_error']:.2%}]"
+    return text
+
+
+def _format_step(record: dict) -> str:
+    step = record.get("step")
+    if step == "coerce_datetime":
+        return f"Coerced to datetime: {record['column']} (unparseable -> NaT: {record.get('coerced_na', 0)})"
+    if step == "coerce_numeric":
+        return f"Coerced to numeric: {record['column']} (unparseable -> NaN: {record.get('coerced_na', 0)})"
+    if step == "fill_missing":
+        return (f"Filled missing (numeric={record['numeric_strategy']}): numeric={record.get('numeric_filled')}, "
+                f"categorical={record.get('categorical_filled')}")
+    if step == "drop_duplicates":
+        text = f"Dropped duplicates: {record.get('removed')}"
+        if record.get("subset"):
+            text += f" (key: {', '.join(map(str, record['subset']))})"
+        if record.get("removed_history") is not None:
+            text += f", of which {record['removed_history']} seen in earlier data"
+        return text
+    if step == "iqr_filter":
+        return (f"IQR outlier filter on {record['column']}: removed={record.get('removed')} "
+                f"(lower={record.get('lower')}, upper={record.get('upper')})")
+    return str(record)
+
+
+def coerce_datetime(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    return CleaningPlan().coerce_datetime(col).run(df)[0]
+
+
+def coerce_numeric(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    return CleaningPlan().coerce_numeric(col).run(df)[0]
+
+
+def drop_duplicates(df: pd.DataFrame, subset: list[str] | None = None,
+                    seen_path: str | None = None) -> tuple[pd.DataFrame, int]:
+    out, (rec,) = CleaningPlan().drop_duplicates(subset, seen_path=seen_path).run(df)
+    return out, rec["removed"]
+
+
+def fill_missing(df: pd.DataFrame, numeric_strategy: str = "median",
+                 approx_eps: float | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    numeric_strategy: 'median' or 'mean' or 'zero'
+    categorical: fill with 'Unknown' (datetime columns are left as missing)
+    approx_eps: for 'median', use a streaming quantile sketch (rank error ~approx_eps)
+    """
+    out, (rec,) = CleaningPlan().fill_missing(numeric_strategy, approx_eps=approx_eps).run(df)
+    return out, {"numeric_filled": rec["numeric_filled"], "categorical_filled": rec["categorical_filled"]}
 
 
-def iqr_filter(df: pd.DataFrame, col: str, k: float = 1.5) -> tuple[pd.DataFrame, dict]:
+def iqr_filter(df: pd.DataFrame, col: str, k: float = 1.5, approx_eps: float | None = None) -> tuple[pd.DataFrame, dict]:
     """
     Remove outliers using IQR rule.
     Returns filtered df and stats.
+    approx_eps: use a streaming quantile sketch for the quartiles (rank error ~approx_eps).
     """
-    out = df.copy()
-    s = pd.to_numeric(out[col], errors="coerce")
-    before = len(out)
-    q1 = s.quantile(0.25)
-    q3 = s.quantile(0.75)
-    iqr = q3 - q1
-    if pd.isna(iqr) or iqr == 0:
-        return out, {"removed": 0, "lower": None, "upper": None}
-
-    lower = q1 - k * iqr
-    upper = q3 + k * iqr
-    mask = (s >= lower) & (s <= upper)
-    out = out.loc[mask].copy()
-    removed = before - len(out)
-    return out, {"removed": int(removed), "lower": float(lower), "upper": float(upper)}
+    out, (rec,) = CleaningPlan().iqr_filter(col, k, approx_eps=approx_eps).run(df)
+    return out, {"removed": rec["removed"], "lower": rec["lower"], "upper": rec["upper"]}
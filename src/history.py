@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from src.store import SESSION_KEY, get_store
+
+# session_state key holding the History of the current dataset
+HISTORY_KEY = "history"
+
+
+class History:
+    """
+    Undo/redo stack of dataset versions.
+    Versions are stored as column manifests in the dataset store, so a version only costs
+    the columns it actually changed; unchanged columns point at the same column files.
+    The history itself holds only keys and step records.
+    """
+
+    def __init__(self, key: str, label: str):
+        self.versions: list[dict] = [{"key": key, "label": label, "records": []}]
+        self.pos = 0
+        # every version stays on disk while the history is alive (undo / redo)
+        get_store().hold(self)
+
+    def held_keys(self) -> list[str]:
+        return [v["key"] for v in self.versions]
+
+    @property
+    def current(self) -> dict:
+        return self.versions[self.pos]
+
+    @property
+    def can_undo(self) -> bool:
+        return self.pos > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.pos < len(self.versions) - 1
+
+    def commit(self, df: pd.DataFrame, label: str, records: list[dict], touched: set[str] | None = None) -> str:
+        """
+        Store df as a new version after the current one (dropping any redo tail).
+        touched: columns changed relative to the current version, or None if unknown / rows changed.
+        """
+        store = get_store()
+        reuse = None
+        if touched is not None:
+            base = store.columns_of(self.current["key"]) or {}
+            reuse = {c: k for c, k in base.items() if c not in touched and c in df.columns}
+        key = store.put_columns(df, reuse=reuse)
+
+        del self.versions[self.pos + 1:]
+        self.versions.append({"key": key, "label": label, "records": list(records)})
+        self.pos = len(self.versions) - 1
+        return key
+
+    def goto(self, pos: int) -> str:
+        if not 0 <= pos < len(self.versions):
+            raise IndexError(f"No version {pos}")
+        self.pos = pos
+        return self.current["key"]
+
+    def undo(self) -> str:
+        return self.goto(self.pos - 1) if self.can_undo else self.current["key"]
+
+    def redo(self) -> str:
+        return self.goto(self.pos + 1) if self.can_redo else self.current["key"]
+
+
+def start_history(state, key: str, label: str) -> History:
+    """Begin a new history rooted at key (kept as is if it is already rooted there)."""
+    hist = state.get(HISTORY_KEY)
+    if hist is None or hist.versions[0]["key"] != key:
+        hist = History(key, label)
+        state[HISTORY_KEY] = hist
+        state[SESSION_KEY] = key
+    return hist
+
+
+def commit_version(state, df: pd.DataFrame, label: str, records: list[dict],
+                   touched: set[str] | None = None) -> str:
+    """
+    History.commit on the session's history and point the session at the new version.
+    The session log drops the records of the discarded redo tail, as the history does.
+    """
+    hist = state[HISTORY_KEY]
+    dropped = {id(r) for v in hist.versions[hist.pos + 1:] for r in v["records"]}
+    log = state.setdefault("log", [])
+    log[:] = [item for item in log if id(item) not in dropped]
+    key = hist.commit(df, label, records, touched)
+    log.extend(hist.current["records"])
+    state[SESSION_KEY] = key
+    return key
+
+
+def checkout(state, pos: int) -> str:
+    """Point the session at version pos of its history."""
+    key = state[HISTORY_KEY].goto(pos)
+    state[SESSION_KEY] = key
+    return key
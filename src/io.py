@@ -1,19 +1,233 @@
 from __future__ import annotations
+import codecs
+import io
+import os
+from typing import Callable, Iterator
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from src.profiling import traced
+
+# bytes inspected to guess the encoding; the full upload is never decoded twice
+SNIFF_BYTES = 1 << 20
+CANDIDATE_ENCODINGS = ("utf-8", "cp932")
 
+# text columns with at most this share of distinct values (and at most MAX_CATEGORIES of them)
+# become categoricals; above that the codes plus the category index no longer save memory reliably
+MAX_CATEGORY_RATIO = 0.05
+MAX_CATEGORIES = 10_000
 
-def read_csv_bytes(file_bytes: bytes, encoding: str | None = None) -> pd.DataFrame:
+
+def detect_encoding(file_bytes: bytes, sample_size: int = SNIFF_BYTES, total_size: int | None = None) -> str | None:
+    """
+    Guess the encoding from a bounded prefix of the file.
+    total_size: size of the whole file when only a prefix is passed in.
+    Returns None when no candidate decodes the prefix (caller should read lossy).
     """
-    Read CSV bytes safely. Try utf-8-sig first, then fallback to cp932 (common in JP CSV).
+    if file_bytes.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+
+    head = file_bytes[:sample_size]
+    truncated = max(len(file_bytes), total_size or 0) > len(head)
+    for enc in CANDIDATE_ENCODINGS:
+        try:
+            head.decode(enc)
+            return enc
+        except UnicodeDecodeError as e:
+            # a multibyte character cut in half at the end of the prefix is fine
+            if truncated and e.start >= len(head) - 3:
+                try:
+                    head[: e.start].decode(enc)
+                    return enc
+                except UnicodeDecodeError:
+                    pass
+    return None
+
+
+def iter_csv_chunks(
+    source: bytes | str | os.PathLike,
+    chunksize: int = 100_000,
+    encoding: str | None = None,
+    progress: Callable[[float], None] | None = None,
+    **read_kwargs,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parse CSV bytes or a CSV file path in chunks of `chunksize` rows (single pass, unless a byte past
+    the sniffed prefix does not decode: the stream then restarts with the next candidate encoding).
+    Files are streamed from disk, so memory is bounded by the chunk size, not the file size.
+    progress(fraction) is called as the parser consumes the input.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buf, total = io.BytesIO(source), len(source)
+        sniff = bytes(source[:SNIFF_BYTES])
+    else:
+        buf, total = open(source, "rb"), os.path.getsize(source)
+        sniff = buf.read(SNIFF_BYTES)
+        buf.seek(0)
+
+    attempts = _attempts(encoding, detect_encoding(sniff, total_size=total) if encoding is None else None)
+    total = max(total, 1)
+    yielded = 0
+    try:
+        for i, (enc, extra) in enumerate(attempts):
+            # a later attempt re-parses from the start and skips the rows already handed out
+            buf.seek(0)
+            skip = yielded
+            try:
+                with pd.read_csv(buf, encoding=enc, chunksize=chunksize, **read_kwargs, **extra) as reader:
+                    for chunk in reader:
+                        if skip:
+                            if len(chunk) <= skip:
+                                skip -= len(chunk)
+                                continue
+                            chunk, skip = chunk.iloc[skip:], 0
+                        yielded += len(chunk)
+                        if progress is not None:
+                            progress(min(buf.tell() / total, 1.0))
+                        yield chunk
+                return
+            except UnicodeDecodeError:
+                if i == len(attempts) - 1:
+                    raise
+    finally:
+        buf.close()
+
+
+def _attempts(encoding: str | None, sniffed: str | None) -> list[tuple[str, dict]]:
+    """
+    (encoding, extra read_csv options) to try in order.
+    An explicit encoding is used as is. A sniffed one only saw a prefix of the file, so the later
+    candidates follow it, then a lossy read (keep the data, lose the glyphs).
     """
     if encoding:
-        return pd.read_csv(pd.io.common.BytesIO(file_bytes), encoding=encoding)
+        return [(encoding, {})]
+    if sniffed is None:
+        return [("utf-8", {"encoding_errors": "replace"})]
+    later = []
+    if sniffed in CANDIDATE_ENCODINGS:
+        later = list(CANDIDATE_ENCODINGS[CANDIDATE_ENCODINGS.index(sniffed) + 1:])
+    return [(e, {}) for e in [sniffed, *later]] + [(sniffed, {"encoding_errors": "replace"})]
+
+
+def _has_binary_columns(df: pd.DataFrame) -> bool:
+    return any(isinstance(t, pd.ArrowDtype) and pa.types.is_binary(t.pyarrow_dtype) for t in df.dtypes)
 
-    # try common encodings
-    for enc in ("utf-8-sig", "utf-8", "cp932"):
+
+@traced("io")
+def read_csv_bytes(
+    file_bytes: bytes,
+    encoding: str | None = None,
+    engine: str = "c",
+    dtype_backend: str | None = None,
+    chunksize: int | None = None,
+    progress: Callable[[float], None] | None = None,
+) -> pd.DataFrame:
+    """
+    Read CSV bytes in a single parse.
+    The encoding is sniffed from a bounded prefix (BOM -> utf-8-sig, then utf-8, then cp932); if a
+    byte past the prefix does not decode, the later candidates are tried, then a lossy read.
+
+    engine: 'c' or 'pyarrow' (multithreaded, requires pyarrow)
+    dtype_backend: None (numpy) or 'pyarrow' for Arrow-backed columns
+    chunksize: parse in row chunks and report progress(fraction) (c engine only)
+    """
+    opts = {}
+    if dtype_backend:
+        opts["dtype_backend"] = dtype_backend
+
+    if chunksize:
+        chunks = iter_csv_chunks(file_bytes, chunksize, encoding=encoding, progress=progress, **opts)
+        return pd.concat(chunks, ignore_index=True)
+
+    attempts = _attempts(encoding, detect_encoding(file_bytes) if encoding is None else None)
+    for i, (enc, extra) in enumerate(attempts):
+        # pyarrow has no encoding_errors: lossy reads use the c engine
+        eng = "c" if extra else engine
         try:
-            return pd.read_csv(pd.io.common.BytesIO(file_bytes), encoding=enc)
-        except Exception:
-            pass
-    # last resort
-    return pd.read_csv(pd.io.common.BytesIO(file_bytes), encoding="utf-8", errors="replace")
+            df = pd.read_csv(io.BytesIO(file_bytes), encoding=enc, engine=eng, **opts, **extra)
+            if _has_binary_columns(df):
+                # pyarrow keeps undecodable text as raw bytes instead of raising
+                raise UnicodeDecodeError(enc, b"", 0, 0, "undecodable bytes in a text column")
+            break
+        except (UnicodeDecodeError, pa.ArrowInvalid):
+            # the prefix looked clean but a later byte did not: try the next candidate
+            if i == len(attempts) - 1:
+                raise
+    if progress is not None:
+        progress(1.0)
+    return df
+
+
+def _smallest_int(s: pd.Series):
+    lo, hi = s.min(), s.max()
+    if pd.isna(lo):
+        return None
+    for t in (np.int8, np.int16, np.int32):
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return t
+    return None
+
+
+def _compact_column(s: pd.Series, max_category_ratio: float, max_categories: int):
+    """Smaller dtype for one column, or None to keep it (only lossless changes)."""
+    dtype = s.dtype
+    arrow = dtype.pyarrow_dtype if isinstance(dtype, pd.ArrowDtype) else None
+    numpy_kind = dtype.kind if isinstance(dtype, np.dtype) else None
+
+    if (arrow is not None and pa.types.is_integer(arrow)) or numpy_kind == "i":
+        width = arrow.bit_width // 8 if arrow is not None else dtype.itemsize
+        t = _smallest_int(s)
+        if t is None or np.dtype(t).itemsize >= width:
+            return None
+        return pd.ArrowDtype(pa.from_numpy_dtype(t)) if arrow is not None else t
+
+    if (arrow is not None and pa.types.is_float64(arrow)) or dtype == np.float64:
+        x = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(over="ignore"):
+            lossless = np.array_equal(x.astype(np.float32).astype(np.float64), x, equal_nan=True)
+        if not lossless:
+            return None
+        return pd.ArrowDtype(pa.float32()) if arrow is not None else np.float32
+
+    if arrow is not None:
+        is_text = pa.types.is_string(arrow) or pa.types.is_large_string(arrow)
+    else:
+        is_text = isinstance(dtype, pd.StringDtype) or (
+            dtype == object and pd.api.types.infer_dtype(s, skipna=True) == "string")
+    if not is_text:
+        return None
+    n_valid = int(s.count())
+    if n_valid and s.nunique(dropna=True) <= min(max_categories, max(1, max_category_ratio * n_valid)):
+        return "category"
+    return pd.ArrowDtype(pa.string()) if dtype == object else None
+
+
+@traced("io")
+def compact_dtypes(df: pd.DataFrame, max_category_ratio: float = MAX_CATEGORY_RATIO,
+                   max_categories: int = MAX_CATEGORIES) -> tuple[pd.DataFrame, dict]:
+    """
+    Shrink dtypes at ingest: integers to the smallest int type that holds them, float64 to float32
+    when no value changes, low-cardinality text to category (integer codes) and other text to Arrow strings.
+    Returns (df, report) with memory before/after in bytes and the per-column dtype changes.
+    """
+    before = df.memory_usage(index=False, deep=True)
+    out = df.copy(deep=False)
+    changes = {}
+    for c in df.columns:
+        target = _compact_column(df[c], max_category_ratio, max_categories)
+        if target is None:
+            continue
+        out[c] = df[c].astype(target)
+        changes[c] = (str(df[c].dtype), str(out[c].dtype))
+    after = out.memory_usage(index=False, deep=True)
+    report = {
+        "before_bytes": int(before.sum()),
+        "after_bytes": int(after.sum()),
+        "columns": {c: {"from": a, "to": b, "before_bytes": int(before[c]), "after_bytes": int(after[c])}
+                    for c, (a, b) in changes.items()},
+    }
+    report["saved_bytes"] = report["before_bytes"] - report["after_bytes"]
+    return out, report
@@ -0,0 +1,54 @@
+from __future__ import annotations
+import importlib
+import os
+import threading
+
+# heavy modules the pages use; scipy.stats alone costs ~1 s of import time
+HEAVY_MODULES = ("scipy.stats", "matplotlib.figure")
+
+PREWARM = os.environ.get("STATS_DASHBOARD_PREWARM", "1") != "0"
+
+
+class LazyModule:
+    """Module proxy that imports on first attribute access (the import lock makes this thread-safe)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+# import these instead of the real modules: `from src.lazy import stats`
+stats = LazyModule("scipy.stats")
+mpl_figure = LazyModule("matplotlib.figure")
+
+_prewarm_thread: threading.Thread | None = None
+
+
+def prewarm(modules: tuple[str, ...] = HEAVY_MODULES) -> threading.Thread | None:
+    """
+    Import the heavy modules in a background daemon thread (once per process), so the first page
+    that needs them does not pay the import. No-op when STATS_DASHBOARD_PREWARM=0.
+    """
+    global _prewarm_thread
+    if not PREWARM or _prewarm_thread is not None:
+        return _prewarm_thread
+
+    def run():
+        for name in modules:
+            importlib.import_module(name)
+
+    _prewarm_thread = threading.Thread(target=run, name="stats-dashboard-prewarm", daemon=True)
+    _prewarm_thread.start()
+    return _prewarm_thread
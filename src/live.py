@@ -0,0 +1,228 @@
+from __future__ import annotations
+import glob
+import os
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.history import start_history
+from src.profiling import traced
+from src.stats_tests import group_moments, merge_group_moments
+from src.store import SESSION_KEY, get_store
+from src.viz import time_index
+
+# session_state key holding the session's LiveDataset
+LIVE_KEY = "live"
+
+# aggregates kept per live dataset (least recently used dropped first)
+MAX_AGGREGATES = 32
+
+# files modified more recently than this are assumed to be still being written
+SETTLE_SECONDS = 2.0
+
+
+class GroupMoments:
+    """Per-group n / mean / m2 (t-test, F-test), as group_moments."""
+
+    def __init__(self, group_col: str, value_col: str):
+        self.group_col, self.value_col = group_col, value_col
+        self.moments = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        m = group_moments.uncached(df[self.group_col], df[self.value_col])
+        self.moments = m if self.moments is None else merge_group_moments(self.moments, m)
+
+    def result(self) -> pd.DataFrame:
+        if self.moments is None:
+            return pd.DataFrame({"n": [], "mean": [], "m2": []})
+        return self.moments.sort_index()
+
+
+class Contingency:
+    """Observed counts of (row, column) category pairs (chi-square); missing values dropped."""
+
+    def __init__(self, row_col: str, col_col: str):
+        self.row_col, self.col_col = row_col, col_col
+        self.counts = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        c = df.groupby([self.row_col, self.col_col], dropna=True, observed=True).size()
+        self.counts = c if self.counts is None else self.counts.add(c, fill_value=0)
+
+    def result(self) -> pd.DataFrame:
+        if self.counts is None:
+            return pd.DataFrame()
+        return self.counts.unstack(fill_value=0).astype(np.int64).sort_index().sort_index(axis=1)
+
+
+class CategoryCounts:
+    """Category counts (Pareto); missing values counted as 'Unknown', as in pareto_table."""
+
+    def __init__(self, col: str):
+        self.col = col
+        self.counts = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        vc = df[self.col].astype("string").fillna("Unknown").value_counts()
+        self.counts = vc if self.counts is None else self.counts.add(vc, fill_value=0)
+
+    def result(self) -> pd.DataFrame:
+        """Same columns as pareto_table."""
+        counts = self.counts if self.counts is not None else pd.Series(dtype=np.int64)
+        out = counts.astype(np.int64).sort_values(ascending=False, kind="stable").rename("count").to_frame()
+        out["ratio"] = out["count"] / out["count"].sum()
+        out["cum_ratio"] = out["ratio"].cumsum()
+        out.index.name = self.col
+        return out.reset_index()
+
+
+def _resample(ts: pd.Series, freq: str):
+    try:
+        return ts.resample(freq)
+    except ValueError:
+        # pandas >= 2.2 spells month/quarter/year end as "ME"/"QE"/"YE"
+        return ts.resample(freq + "E")
+
+
+class ResampleBuckets:
+    """Per-period sum and count of a value over a datetime column (resampled mean)."""
+
+    def __init__(self, date_col: str, value_col: str, freq: str):
+        self.date_col, self.value_col, self.freq = date_col, value_col, freq
+        self.buckets = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        ts = time_index.uncached(df[self.date_col], df[self.value_col])
+        b = _resample(ts, self.freq).agg(["sum", "count"])
+        self.buckets = b if self.buckets is None else self.buckets.add(b, fill_value=0)
+
+    def result(self) -> pd.Series:
+        """Mean per period, as resample_mean (periods without values are NaN)."""
+        if self.buckets is None:
+            return pd.Series(dtype=float, name=self.value_col)
+        # batches can leave gaps between their periods: re-bin to get every period
+        b = _resample(self.buckets, self.freq).sum()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = b["sum"] / b["count"].where(b["count"] > 0)
+        return mean.rename(self.value_col)
+
+
+AGGREGATES = {
+    "group_moments": GroupMoments,
+    "contingency": Contingency,
+    "category_counts": CategoryCounts,
+    "resample": ResampleBuckets,
+}
+
+
+class LiveDataset:
+    """
+    A dataset that grows by appended batches (upload or watched directory).
+    Each batch is stored once in the dataset store and the dataset is a manifest of batch keys, so an
+    append writes only the new rows. Aggregates are built over the history once, when first asked
+    for, and then updated from each new batch only.
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.schema: pa.Schema | None = None
+        self.rows = 0
+        self.key: str | None = None
+        self.seen: set[str] = set()
+        self._aggs: OrderedDict[tuple, object] = OrderedDict()
+        get_store().hold(self)
+
+    def held_keys(self) -> list[str]:
+        return [*self.parts, self.key]
+
+    def _check_schema(self, df: pd.DataFrame) -> pa.Schema:
+        schema = pa.Schema.from_pandas(df, preserve_index=False).remove_metadata()
+        if self.schema is None:
+            return schema
+        if schema.names != self.schema.names:
+            raise ValueError(f"Columns differ from the live dataset: {schema.names} vs {self.schema.names}")
+        try:
+            return pa.unify_schemas([self.schema, schema], promote_options="permissive")
+        except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
+            raise ValueError(f"Column types are incompatible with the live dataset: {e}") from e
+
+    @traced("io")
+    def append(self, df: pd.DataFrame) -> int:
+        """Store a batch and update the aggregates from it; returns rows added (0 if the batch is already in)."""
+        schema = self._check_schema(df)
+        store = get_store()
+        part = store.put(df)
+        if part in self.parts:
+            return 0
+        for agg in self._aggs.values():
+            agg.update(df)
+        self.parts.append(part)
+        self.schema = schema
+        self.rows += len(df)
+        self.key = store.put_parts(self.parts)
+        return len(df)
+
+    def new_files(self, directory: str, pattern: str = "*.csv") -> list[str]:
+        """Files in directory not ingested yet and not modified within SETTLE_SECONDS, oldest first."""
+        now = time.time()
+        paths = [p for p in glob.glob(os.path.join(directory, pattern))
+                 if p not in self.seen and now - os.path.getmtime(p) >= SETTLE_SECONDS]
+        return sorted(paths, key=os.path.getmtime)
+
+    def scan(self, directory: str, read: Callable[[bytes], pd.DataFrame], pattern: str = "*.csv") -> dict:
+        """Append every new file of a watched directory; files that fail to read are reported and skipped."""
+        out = {"files": [], "rows": 0, "errors": {}}
+        for path in self.new_files(directory, pattern):
+            try:
+                with open(path, "rb") as f:
+                    rows = self.append(read(f.read()))
+            except Exception as e:
+                out["errors"][path] = str(e)
+                continue
+            finally:
+                self.seen.add(path)
+            out["files"].append(path)
+            out["rows"] += rows
+        return out
+
+    def aggregate(self, kind: str, *args):
+        """Current value of an aggregate (see AGGREGATES), built over the stored batches on first use."""
+        key = (kind, *args)
+        agg = self._aggs.get(key)
+        if agg is None:
+            if kind not in AGGREGATES:
+                raise ValueError(f"Unknown aggregate: {kind}")
+            agg = AGGREGATES[kind](*args)
+            store = get_store()
+            for part in self.parts:
+                agg.update(store.get(part))
+            self._aggs[key] = agg
+            while len(self._aggs) > MAX_AGGREGATES:
+                self._aggs.popitem(last=False)
+        self._aggs.move_to_end(key)
+        return agg.result()
+
+
+def start_live(state) -> LiveDataset:
+    """Replace the session's live dataset with an empty one."""
+    live = LiveDataset()
+    state[LIVE_KEY] = live
+    return live
+
+
+def live_dataset(state) -> LiveDataset | None:
+    """The session's live dataset, if the session currently looks at its latest version (not a cleaned one)."""
+    live = state.get(LIVE_KEY)
+    if live is None or live.key is None or state.get(SESSION_KEY) != live.key:
+        return None
+    return live
+
+
+def publish(state, live: LiveDataset, label: str) -> None:
+    """Point the session at the live dataset's latest version."""
+    if live.key is not None:
+        start_history(state, live.key, label)
@@ -0,0 +1,317 @@
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src.cleaning import CleaningPlan, RowHashSet, SeenHashes, row_hashes
+from src.io import iter_csv_chunks
+from src.lazy import stats
+from src.sketches import DEFAULT_CAPACITY, HeavyHitters, QuantileSketch
+from src.stats_tests import chi_square_from_table, group_moments, merge_group_moments
+from src.store import to_arrow_table
+
+# rows per chunk: peak memory is a small multiple of one chunk
+DEFAULT_CHUNK_ROWS = 500_000
+
+# rank error of the sketches used for out-of-core medians / quartiles (exact ones need the full column)
+DEFAULT_SKETCH_EPS = 0.001
+
+_COUNT_KEYS = ("numeric_filled", "categorical_filled", "removed", "coerced_na")
+
+
+class ChunkedDataset:
+    """
+    A dataset that is only ever materialized one chunk at a time.
+    Backed either by a CSV file (re-parsed per pass) or by spilled Arrow IPC part files
+    (memory-mapped per chunk).
+    """
+
+    def __init__(self, chunks: Callable[[], Iterator[pd.DataFrame]], parts: list[str] | None = None,
+                 spill_dir: str | None = None):
+        self._chunks = chunks
+        self.parts = parts
+        self.spill_dir = spill_dir
+
+    @classmethod
+    def from_csv(cls, path: str | os.PathLike, chunksize: int = DEFAULT_CHUNK_ROWS, encoding: str | None = None,
+                 **read_kwargs) -> ChunkedDataset:
+        return cls(lambda: iter_csv_chunks(path, chunksize, encoding=encoding, **read_kwargs))
+
+    @classmethod
+    def from_parts(cls, parts: list[str], spill_dir: str | None = None) -> ChunkedDataset:
+        def chunks():
+            for p in parts:
+                with pa.memory_map(p, "r") as source:
+                    yield pa.ipc.open_file(source).read_all().to_pandas()
+        return cls(chunks, parts=list(parts), spill_dir=spill_dir)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return self._chunks()
+
+    @property
+    def num_rows(self) -> int:
+        if self.parts is not None:
+            return sum(feather.read_table(p, memory_map=True).num_rows for p in self.parts)
+        return sum(len(c) for c in self)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Materialize (only for results known to fit in memory)."""
+        return pd.concat(list(self), ignore_index=True)
+
+    def cleanup(self) -> None:
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def spill(chunks: Iterable[pd.DataFrame], spill_dir: str | None = None) -> ChunkedDataset:
+    """Write chunks to local Arrow IPC part files and return them as a ChunkedDataset."""
+    spill_dir = spill_dir or tempfile.mkdtemp(prefix="stats_dashboard_spill_")
+    os.makedirs(spill_dir, exist_ok=True)
+    parts = []
+    for i, chunk in enumerate(chunks):
+        path = os.path.join(spill_dir, f"part-{i:05d}.arrow")
+        feather.write_feather(to_arrow_table(chunk), path, compression="uncompressed")
+        parts.append(path)
+    return ChunkedDataset.from_parts(parts, spill_dir=spill_dir)
+
+
+# --- out-of-core cleaning ---
+
+def _needs_global_stats(step: dict) -> bool:
+    if step["step"] == "fill_missing":
+        return step["numeric_strategy"] in ("mean", "median") and "values" not in step
+    return step["step"] == "iqr_filter" and "lower" not in step
+
+
+class _StatsCollector:
+    """Accumulates, chunk by chunk, what a global step needs (means, medians or quartiles)."""
+
+    def __init__(self, step: dict):
+        self.step = step
+        self.eps = step.get("approx_eps") or DEFAULT_SKETCH_EPS
+        self.sums: dict[str, list[float]] = {}
+        self.sketches: dict[str, QuantileSketch] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if self.step["step"] == "iqr_filter":
+            cols = [self.step["column"]]
+        else:
+            cols = chunk.select_dtypes(include=[np.number]).columns
+        for c in cols:
+            if self.step["step"] == "fill_missing" and self.step["numeric_strategy"] == "mean":
+                x = pd.to_numeric(chunk[c], errors="coerce")
+                acc = self.sums.setdefault(c, [0.0, 0])
+                acc[0] += float(x.sum())
+                acc[1] += int(x.count())
+            else:
+                self.sketches.setdefault(c, QuantileSketch(self.eps, seed=0)).update(chunk[c])
+
+    def resolve(self) -> tuple[dict, dict]:
+        """-> (step with fixed parameters, extra record fields)"""
+        err = max((sk.rank_error for sk in self.sketches.values()), default=0.0)
+        extra = {"approx_eps": self.eps, "approx_rank_error": err} if self.sketches else {}
+        if self.step["step"] == "iqr_filter":
+            sk = self.sketches.get(self.step["column"])
+            q1, q3 = sk.quantile([0.25, 0.75]) if sk is not None else (np.nan, np.nan)
+            iqr = q3 - q1
+            if np.isnan(iqr) or iqr == 0:
+                bounds = {"lower": None, "upper": None}
+            else:
+                k = self.step["k"]
+                bounds = {"lower": float(q1 - k * iqr), "upper": float(q3 + k * iqr)}
+            return {**self.step, **bounds}, {**bounds, **extra}
+        if self.sums:
+            values = {c: s / n for c, (s, n) in self.sums.items() if n}
+        else:
+            values = {c: sk.quantile(0.5) for c, sk in self.sketches.items() if sk.n}
+        return {**self.step, "values": values}, extra
+
+
+def _drop_seen(chunk: pd.DataFrame, seen: RowHashSet, subset: list[str] | None = None) -> tuple[pd.DataFrame, int]:
+    """Drop rows whose 64-bit hash was seen in this or an earlier chunk."""
+    h = row_hashes(chunk, subset)
+    dup = pd.Series(h).duplicated().to_numpy() | seen.contains(h)
+    seen.add(h[~dup])
+    return (chunk.loc[~dup] if dup.any() else chunk), int(dup.sum())
+
+
+def _merge_record(acc: dict, rec: dict) -> None:
+    for key, value in rec.items():
+        if key in _COUNT_KEYS:
+            acc[key] = acc.get(key, 0) + int(value or 0)
+        elif key == "filled_columns":
+            acc[key] = sorted(set(acc.get(key, [])) | set(value))
+        elif key not in acc or acc[key] is None:
+            acc[key] = value
+
+
+def run_plan_chunked(source: ChunkedDataset, plan: CleaningPlan, spill_dir: str | None = None,
+                     progress: Callable[[str], None] | None = None,
+                     seen_source: str | None = None) -> tuple[ChunkedDataset, list[dict]]:
+    """
+    Run a CleaningPlan over a chunked dataset with memory bounded by the chunk size.
+    Row-wise steps run per chunk. Steps that need whole-column statistics (median/mean fill, IQR bounds)
+    end a pass: the statistics are accumulated (medians/quartiles with a quantile sketch) while the
+    pending steps are applied, the result is spilled to Arrow files, and the step then runs row-wise
+    with fixed parameters on the next pass. Duplicates are found across chunks with 64-bit row hashes
+    (the hash set grows by 8 bytes per distinct row). seen_source: as `source` of CleaningPlan.run;
+    the kept rows are recorded with plan.record_seen(result, seen_source) once the result is kept.
+    """
+    spill_root = spill_dir or tempfile.mkdtemp(prefix="stats_dashboard_spill_")
+    records = [dict(step) for step in plan.steps]
+    pending: list[tuple[int, dict]] = []
+    seen: dict[int, RowHashSet] = {}
+    current = source
+    n_pass = 0
+
+    def apply(chunk: pd.DataFrame) -> pd.DataFrame:
+        for i, step in pending:
+            if step["step"] == "drop_duplicates":
+                if i not in seen:
+                    # a persistent set also drops rows ingested from other sources
+                    seen[i] = (SeenHashes(step["seen_path"]).load(exclude=seen_source)
+                               if step.get("seen_path") else RowHashSet())
+                chunk, removed = _drop_seen(chunk, seen[i], step.get("subset"))
+                rec = {"removed": removed}
+            else:
+                single = CleaningPlan()
+                single.steps = [step]
+                chunk, (rec,) = single.run(chunk)
+            _merge_record(records[i], rec)
+        return chunk
+
+    def run_pass(collector: _StatsCollector | None) -> ChunkedDataset:
+        nonlocal n_pass
+        n_pass += 1
+        if progress is not None:
+            progress(f"pass {n_pass}")
+
+        def chunks():
+            for chunk in current:
+                chunk = apply(chunk)
+                if collector is not None:
+                    collector.update(chunk)
+                yield chunk
+
+        out = spill(chunks(), os.path.join(spill_root, f"pass-{n_pass}"))
+        if current.spill_dir and current is not source:
+            current.cleanup()
+        return out
+
+    for i, step in enumerate(plan.steps):
+        if _needs_global_stats(step):
+            collector = _StatsCollector(step)
+            current = run_pass(collector)
+            pending = []
+            fixed, extra = collector.resolve()
+            records[i].update(extra)
+            pending.append((i, fixed))
+        else:
+            pending.append((i, step))
+    current = run_pass(None)
+    if spill_dir is None:
+        # cleanup() of the result removes every pass directory we created
+        current.spill_dir = spill_root
+    return current, records
+
+
+# --- tests from accumulated sufficient statistics ---
+
+def chunked_summary(source: Iterable[pd.DataFrame], col: str, eps: float = DEFAULT_SKETCH_EPS) -> dict:
+    """
+    count / mean / median of a numeric column over all chunks (missing values dropped).
+    The median comes from a quantile sketch: exact for small columns, otherwise within
+    `median_rank_error` (normalized rank) of the true median.
+    """
+    n, total = 0, 0.0
+    sk = QuantileSketch(eps, seed=0)
+    for chunk in source:
+        x = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        x = x[~np.isnan(x)]
+        n += len(x)
+        total += float(x.sum())
+        sk.update(x)
+    return {"count": int(n), "mean": total / n if n else np.nan, "median": sk.quantile(0.5),
+            "median_rank_error": sk.rank_error}
+
+
+def chunked_group_moments(source: Iterable[pd.DataFrame], group_col: str, value_col: str) -> pd.DataFrame:
+    """group_moments over all chunks, merged (for t-test / F-test via *_from_moments)."""
+    out = None
+    for chunk in source:
+        m = group_moments.uncached(chunk[group_col], chunk[value_col])
+        out = m if out is None else merge_group_moments(out, m)
+    if out is None:
+        return pd.DataFrame({"n": [], "mean": [], "m2": []})
+    return out.sort_index()
+
+
+def chunked_value_counts(source: Iterable[pd.DataFrame], col: str) -> pd.Series:
+    """Category counts over all chunks (missing values counted as 'Unknown', as in pareto_table)."""
+    total = None
+    for chunk in source:
+        vc = chunk[col].astype("string").fillna("Unknown").value_counts()
+        total = vc if total is None else total.add(vc, fill_value=0)
+    if total is None:
+        return pd.Series(dtype=np.int64, name="count")
+    return total.astype(np.int64).sort_values(ascending=False, kind="stable").rename("count")
+
+
+def chunked_heavy_hitters(source: Iterable[pd.DataFrame], col: str, capacity: int = DEFAULT_CAPACITY) -> HeavyHitters:
+    """Top categories over all chunks in bounded memory (chunked_value_counts counts every distinct value)."""
+    hh = HeavyHitters(capacity)
+    for chunk in source:
+        hh.update(chunk[col])
+    return hh
+
+
+def chunked_contingency(source: Iterable[pd.DataFrame], row_col: str, col_col: str) -> pd.DataFrame:
+    """Contingency counts over all chunks (rows with a missing value in either column dropped)."""
+    total = None
+    for chunk in source:
+        counts = chunk.groupby([row_col, col_col], dropna=True, observed=True).size()
+        total = counts if total is None else total.add(counts, fill_value=0)
+    if total is None:
+        return pd.DataFrame()
+    return total.unstack(fill_value=0).astype(np.int64).sort_index().sort_index(axis=1)
+
+
+def chunked_chi_square(source: Iterable[pd.DataFrame], row_col: str, col_col: str) -> dict:
+    return chi_square_from_table(chunked_contingency(source, row_col, col_col))
+
+
+def chunked_pearson(source: Iterable[pd.DataFrame], x_col: str, y_col: str) -> dict:
+    """Pearson correlation from accumulated co-moments (Spearman needs global ranks and is not supported)."""
+    n = 0
+    mx = my = cxy = mxx = myy = 0.0
+    for chunk in source:
+        x = pd.to_numeric(chunk[x_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        y = pd.to_numeric(chunk[y_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        ok = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[ok], y[ok]
+        if not len(x):
+            continue
+        # parallel update of means and centered co-moments
+        nb = len(x)
+        bx, by = x.mean(), y.mean()
+        dx, dy = x - bx, y - by
+        n_new = n + nb
+        ddx, ddy = bx - mx, by - my
+        cxy += (dx * dy).sum() + ddx * ddy * n * nb / n_new
+        mxx += (dx * dx).sum() + ddx * ddx * n * nb / n_new
+        myy += (dy * dy).sum() + ddy * ddy * n * nb / n_new
+        mx += ddx * nb / n_new
+        my += ddy * nb / n_new
+        n = n_new
+    if n < 3:
+        raise ValueError("Need at least 3 paired observations.")
+
+    r = float(np.clip(cxy / np.sqrt(mxx * myy), -1.0, 1.0))
+    t = r * np.sqrt((n - 2) / max(1 - r ** 2, 1e-300))
+    return {"n": int(n), "r": r, "pvalue": float(2 * stats.t.sf(abs(t), n - 2)), "method": "pearson"}
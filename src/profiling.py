@@ -0,0 +1,175 @@
+from __future__ import annotations
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# session_state key holding the session's Profiler
+PROFILE_KEY = "profiler"
+
+# spans kept per profiler (oldest dropped first)
+MAX_SPANS = int(os.environ.get("STATS_DASHBOARD_PROFILE_SPANS", "20000"))
+ENABLED = os.environ.get("STATS_DASHBOARD_PROFILE", "1") != "0"
+
+
+def _allocated() -> int:
+    """Bytes currently held by Arrow's memory pool, plus Python allocations when tracemalloc is tracing."""
+    n = pa.total_allocated_bytes()
+    if tracemalloc.is_tracing():
+        n += tracemalloc.get_traced_memory()[0]
+    return n
+
+
+def set_memory_tracing(enabled: bool) -> None:
+    """Also count Python heap allocations in spans (tracemalloc: process-wide, slows every allocation)."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _rows(obj) -> int | None:
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(obj)
+    return None
+
+
+class Profiler:
+    """
+    Bounded buffer of timing spans: name, category, start, duration, rows processed and
+    net memory allocated (Arrow pool, plus Python heap while tracemalloc is on).
+    Exportable as Chrome trace JSON (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, maxlen: int = MAX_SPANS):
+        self.spans: deque[dict] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._open_rerun: dict | None = None
+
+    def record(self, span: dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def frame(self) -> pd.DataFrame:
+        """All spans, newest last (start relative to the first span, in ms)."""
+        with self._lock:
+            spans = list(self.spans)
+        cols = ["name", "cat", "page", "start_ms", "dur_ms", "rows", "alloc_bytes", "tid"]
+        if not spans:
+            return pd.DataFrame(columns=cols)
+        df = pd.DataFrame(spans)
+        t0 = df["ts"].min()
+        return df.assign(start_ms=(df["ts"] - t0) / 1e6, dur_ms=df["dur"] / 1e6)[cols]
+
+    def summary(self) -> pd.DataFrame:
+        """Per function: calls, total / mean / max ms, rows and allocated bytes (slowest first)."""
+        df = self.frame()
+        if df.empty:
+            return pd.DataFrame(columns=["calls", "total_ms", "mean_ms", "max_ms", "rows", "alloc_bytes"])
+        out = df.groupby(["cat", "name"]).agg(calls=("dur_ms", "size"), total_ms=("dur_ms", "sum"),
+                                              mean_ms=("dur_ms", "mean"), max_ms=("dur_ms", "max"),
+                                              rows=("rows", "sum"), alloc_bytes=("alloc_bytes", "sum"))
+        return out.sort_values("total_ms", ascending=False)
+
+    def chrome_trace(self) -> dict:
+        """Trace Event Format (complete events, microseconds)."""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = [{
+            "name": s["name"], "cat": s["cat"], "ph": "X", "pid": pid, "tid": s["tid"],
+            "ts": s["ts"] / 1e3, "dur": s["dur"] / 1e3,
+            "args": {k: s[k] for k in ("rows", "alloc_bytes", "page") if s.get(k) is not None},
+        } for s in spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# spans outside a Streamlit rerun (CLI, benchmarks) go to the process-wide profiler
+GLOBAL_PROFILER = Profiler()
+_active: contextvars.ContextVar[Profiler | None] = contextvars.ContextVar("profiler", default=None)
+_page: contextvars.ContextVar[str | None] = contextvars.ContextVar("page", default=None)
+
+
+def current_profiler() -> Profiler:
+    return _active.get() or GLOBAL_PROFILER
+
+
+@contextmanager
+def span(name: str, cat: str = "app", rows: int | None = None):
+    """Time a block. Yields a dict; set "rows" on it when the count is only known inside the block."""
+    if not ENABLED:
+        yield {}
+        return
+    info = {"rows": rows}
+    a0 = _allocated()
+    t0 = time.perf_counter_ns()
+    try:
+        yield info
+    finally:
+        current_profiler().record({
+            "name": name, "cat": cat, "page": _page.get(), "ts": t0, "dur": time.perf_counter_ns() - t0,
+            "rows": info.get("rows"), "alloc_bytes": _allocated() - a0, "tid": threading.get_ident(),
+        })
+
+
+def traced(cat: str):
+    """Record a span per call; rows = length of the first DataFrame/Series/array argument (or of the result)."""
+    def decorate(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            rows = next((n for n in map(_rows, list(args) + list(kwargs.values())) if n is not None), None)
+            with span(name, cat, rows) as info:
+                result = func(*args, **kwargs)
+                if info["rows"] is None:
+                    info["rows"] = _rows(result[0] if isinstance(result, tuple) and result else result)
+                return result
+
+        return wrapper
+    return decorate
+
+
+def _close_rerun(prof: Profiler, end_ns: int, stopped: bool) -> None:
+    r = prof._open_rerun
+    prof._open_rerun = None
+    prof.record({"name": r["page"] + (" (stopped)" if stopped else ""), "cat": "rerun", "page": r["page"],
+                 "ts": r["ts"], "dur": max(end_ns - r["ts"], 0), "rows": None,
+                 "alloc_bytes": _allocated() - r["alloc"], "tid": r["tid"]})
+
+
+def begin_rerun(state, page: str) -> Profiler:
+    """
+    Start the span of one page rerun and route spans of this thread to the session's profiler.
+    A previous rerun that never reached end_rerun (st.stop) is closed at its last recorded span.
+    """
+    prof = state.setdefault(PROFILE_KEY, Profiler())
+    if prof._open_rerun is not None:
+        r = prof._open_rerun
+        last = max((s["ts"] + s["dur"] for s in list(prof.spans) if s["ts"] >= r["ts"]), default=r["ts"])
+        _close_rerun(prof, last, stopped=True)
+    _active.set(prof)
+    _page.set(page)
+    prof._open_rerun = {"page": page, "ts": time.perf_counter_ns(), "alloc": _allocated(),
+                        "tid": threading.get_ident()}
+    return prof
+
+
+def end_rerun(state) -> None:
+    prof = state.get(PROFILE_KEY)
+    if prof is not None and prof._open_rerun is not None:
+        _close_rerun(prof, time.perf_counter_ns(), stopped=False)
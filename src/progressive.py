@@ -0,0 +1,167 @@
+from __future__ import annotations
+import contextvars
+import os
+import threading
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.cache import memoize
+from src.profiling import span, traced
+
+# from this many rows on, pages answer from a sample first and compute the exact result in the background
+PROGRESSIVE_MIN_ROWS = int(os.environ.get("STATS_DASHBOARD_PROGRESSIVE_MIN_ROWS", "2000000"))
+SAMPLE_ROWS = int(os.environ.get("STATS_DASHBOARD_SAMPLE_ROWS", "200000"))
+# rows kept per stratum when a uniform draw would leave it with fewer
+MIN_PER_STRATUM = 200
+# rows per slice of chunked exact computations (cancellation is checked between slices)
+CHUNK_ROWS = 1_000_000
+
+# session_state key holding the session's {slot: ExactJob}
+JOBS_KEY = "progressive_jobs"
+
+
+class Cancelled(Exception):
+    """The inputs of an exact job changed before it finished."""
+
+
+def is_large(df: pd.DataFrame) -> bool:
+    return len(df) >= PROGRESSIVE_MIN_ROWS
+
+
+@traced("stats")
+@memoize
+def stratified_sample(df: pd.DataFrame, strata: str | None = None, n: int = SAMPLE_ROWS,
+                      min_per_stratum: int = MIN_PER_STRATUM, seed: int = 0) -> pd.DataFrame:
+    """
+    About n rows drawn uniformly without replacement, plus up to min_per_stratum rows of every
+    value of `strata` (missing included) the uniform draw would under-represent.
+    Sampling within strata keeps each stratum's distribution, so per-group and conditional
+    statistics stay unbiased. Rows keep their original order and index.
+    """
+    total = len(df)
+    if total <= n:
+        return df
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(total, size=n, replace=False)
+    if strata is not None:
+        codes, _ = pd.factorize(df[strata], use_na_sentinel=False)
+        rare = np.bincount(codes) * (n / total) < min_per_stratum
+        if rare.any():
+            cand = np.flatnonzero(rare[codes])
+            cand = cand[rng.permutation(len(cand))]
+            cand = cand[np.argsort(codes[cand], kind="stable")]
+            c = codes[cand]
+            rank = np.arange(len(c)) - np.searchsorted(c, c)
+            idx = np.concatenate([idx, cand[rank < min_per_stratum]])
+    return df.take(np.unique(idx))
+
+
+def cancellable_chunks(df: pd.DataFrame, cancel: threading.Event,
+                       chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Row slices of df (for the chunked_* accumulators in src.ooc); raises Cancelled once `cancel` is set."""
+    for start in range(0, len(df), chunk_rows):
+        if cancel.is_set():
+            raise Cancelled()
+        yield df.iloc[start:start + chunk_rows]
+
+
+class ExactJob:
+    """
+    fn(cancel) on a daemon thread, keyed by the inputs it was started for.
+    fn should raise Cancelled once `cancel` is set (iterating cancellable_chunks does); one that
+    never checks runs to the end and its result is simply not shown.
+    """
+
+    def __init__(self, key, fn: Callable[[threading.Event], object], name: str):
+        self.key = key
+        self.cancel_event = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self._done = threading.Event()
+        # run in the caller's context so profiling spans land in the session's profiler
+        ctx = contextvars.copy_context()
+        self._thread = threading.Thread(target=ctx.run, args=(self._run, fn, name),
+                                        name=f"exact:{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, name):
+        try:
+            with span(f"exact:{name}", "stats"):
+                self.result = fn(self.cancel_event)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def value(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_exact(state, slot: str, key, fn: Callable[[threading.Event], object]) -> ExactJob:
+    """
+    The session's job for `slot` (one per widget group): reused while `key` is unchanged,
+    otherwise the old one is cancelled and fn starts on a new thread.
+    """
+    jobs = state.setdefault(JOBS_KEY, {})
+    job = jobs.get(slot)
+    if job is not None and job.key == key and not job.cancelled:
+        return job
+    if job is not None:
+        job.cancel()
+    jobs[slot] = job = ExactJob(key, fn, slot)
+    return job
+
+
+def cancel_stale(state, slot: str, key) -> None:
+    """Cancel the slot's job if it was started for other inputs (call on every rerun)."""
+    job = state.get(JOBS_KEY, {}).get(slot)
+    if job is not None and job.key != key:
+        job.cancel()
+
+
+def wait_exact(job: ExactJob, tick: Callable[[], None] | None = None, poll: float = 0.1):
+    """
+    Wait for the job, calling tick() every `poll` seconds (in Streamlit: touch a placeholder, which
+    is where a rerun triggered by a widget change interrupts the wait, as in render.wait_rendered).
+    """
+    while not job.wait(poll):
+        if tick is not None:
+            tick()
+    return job.value()
+
+
+def show_progressive(note, job: ExactJob, provisional: Callable[[], object],
+                     display: Callable[[object, bool], None], sample_rows: int, total_rows: int) -> None:
+    """
+    display(provisional(), True) marked as provisional in the `note` placeholder, then
+    display(exact, False) once the job finishes. display should draw into a placeholder so the
+    second call replaces the first.
+    """
+    if not job.done:
+        display(provisional(), True)
+        msg = (f"Provisional: computed on a stratified sample of {sample_rows:,} of {total_rows:,} rows. "
+               "The exact result replaces it when ready…")
+        note.warning(msg, icon="⏳")
+        exact = wait_exact(job, lambda: note.warning(msg, icon="⏳"))
+        note.empty()
+    else:
+        exact = job.value()
+    display(exact, False)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import contextvars
+import io
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable
+
+from src.cache import ResultCache, fingerprint
+from src.profiling import span
+
+RENDER_WORKERS = int(os.environ.get("STATS_DASHBOARD_RENDER_WORKERS", "2"))
+# total size of encoded images kept (a PNG is typically 20-100 KB)
+IMAGE_CACHE_BYTES = int(os.environ.get("STATS_DASHBOARD_IMAGE_CACHE_MB", "64")) * 1024 * 1024
+DEFAULT_DPI = 100
+
+# session_state key holding the session's render slot prefix
+RENDER_SLOT_KEY = "render_slot"
+
+IMAGE_CACHE = ResultCache(IMAGE_CACHE_BYTES)
+
+
+class StaleRender(Exception):
+    """A newer request for the same slot arrived before this one started."""
+
+
+class RenderPool:
+    """
+    Renders plots to PNG bytes on worker threads (matplotlib Figure + Agg, no pyplot state),
+    cached by (plot function, argument fingerprints, dpi).
+    Requests are grouped by slot (one per session and widget): a new request cancels the slot's
+    queued one, and a request that is no longer the latest when a worker picks it up is dropped.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, cache: ResultCache = IMAGE_CACHE):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+        self._latest: dict[str, int] = {}
+        self._pending: dict[str, Future] = {}
+
+    def submit(self, slot: str, plot: Callable, *args, dpi: int = DEFAULT_DPI, **kwargs) -> Future:
+        """
+        Render plot(*args, **kwargs) -> PNG bytes (or (png, *rest) when plot returns (fig, *rest)).
+        Figures are encoded and dropped: only the bytes are cached (figures are mutable and never shared).
+        """
+        name = getattr(plot, "__qualname__", repr(plot))
+        key = ("render", name, fingerprint(args), fingerprint(kwargs), dpi)
+        hit, value = self.cache.get(name, key)
+        if hit:
+            done = Future()
+            done.set_result(value)
+            return done
+
+        with self._lock:
+            gen = self._latest.get(slot, 0) + 1
+            self._latest[slot] = gen
+            old = self._pending.pop(slot, None)
+            if old is not None:
+                old.cancel()
+            # run in the caller's context so profiling spans land in the session's profiler
+            ctx = contextvars.copy_context()
+            fut = self._pool.submit(ctx.run, self._render, slot, gen, key, name, plot, args, kwargs, dpi)
+            self._pending[slot] = fut
+        return fut
+
+    def _render(self, slot, gen, key, name, plot, args, kwargs, dpi):
+        with self._lock:
+            if self._latest.get(slot) != gen:
+                raise StaleRender(slot)
+        try:
+            with span(f"render:{name}", "viz"):
+                out = plot(*args, **kwargs)
+                fig, rest = (out[0], tuple(out[1:])) if isinstance(out, tuple) else (out, ())
+                buf = io.BytesIO()
+                fig.savefig(buf, format="png", dpi=dpi)
+            value = (buf.getvalue(), *rest) if rest else buf.getvalue()
+            self.cache.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                if self._latest.get(slot) == gen:
+                    self._pending.pop(slot, None)
+
+
+RENDER_POOL = RenderPool()
+
+
+def render_slot(state, widget: str) -> str:
+    """Slot id for one widget of one session (a new request replaces the slot's older ones)."""
+    return f"{state.setdefault(RENDER_SLOT_KEY, uuid.uuid4().hex)}:{widget}"
+
+
+def wait_rendered(future: Future, tick: Callable[[], None] | None = None, poll: float = 0.1):
+    """
+    Wait for a render, calling tick() every `poll` seconds.
+    In Streamlit, tick should touch a placeholder: that is where a rerun triggered by a newer
+    widget value interrupts this (now stale) wait.
+    """
+    while True:
+        try:
+            return future.result(timeout=poll)
+        except FutureTimeout:
+            if tick is not None:
+                tick()
+
+
+def show_plot(placeholder, state, widget: str, plot: Callable, *args, **kwargs):
+    """Render off-thread into a Streamlit placeholder; returns what plot returned besides the figure."""
+    fut = RENDER_POOL.submit(render_slot(state, widget), plot, *args, **kwargs)
+    value = wait_rendered(fut, lambda: placeholder.caption("Rendering…"))
+    png, rest = (value[0], value[1:]) if isinstance(value, tuple) else (value, ())
+    placeholder.image(png)
+    return rest[0] if len(rest) == 1 else rest or None
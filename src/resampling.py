@@ -0,0 +1,255 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.cache import memoize
+from src.lazy import stats
+from src.profiling import traced
+
+# float64 values generated per block (~16 MB); the block size in resamples follows from the sample size
+BLOCK_ELEMENTS = 2_000_000
+MAX_BLOCK = 1000
+
+# below this many generated values in total, a process pool costs more than it saves
+PARALLEL_MIN_ELEMENTS = 50_000_000
+
+TWO_SAMPLE_STATISTICS = ("welch_t", "pooled_t", "mean_diff", "var_ratio")
+PAIRED_STATISTICS = ("pearson", "spearman")
+
+# process pool shared by all sessions (spawn: forking the multithreaded server is unsafe)
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _values(s) -> np.ndarray:
+    x = pd.to_numeric(pd.Series(s), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return x[~np.isnan(x)]
+
+
+def _two_sample_stat(a: np.ndarray, b: np.ndarray, statistic: str) -> np.ndarray:
+    """Statistic per row of a (resamples x n1) and b (resamples x n2)."""
+    n1, n2 = a.shape[1], b.shape[1]
+    diff = a.mean(axis=1) - b.mean(axis=1)
+    if statistic == "mean_diff":
+        return diff
+    v1, v2 = a.var(axis=1, ddof=1), b.var(axis=1, ddof=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if statistic == "welch_t":
+            return diff / np.sqrt(v1 / n1 + v2 / n2)
+        if statistic == "pooled_t":
+            sp2 = ((n1 - 1) * v1 + (n2 - 1) * v2) / (n1 + n2 - 2)
+            return diff / np.sqrt(sp2 * (1 / n1 + 1 / n2))
+        # log variance ratio: symmetric around 0, so |stat| gives a two-sided test
+        return np.log(v1 / v2)
+
+
+def _corr_stat(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson r per row of x and y (resamples x n)."""
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (xc * yc).sum(axis=1) / np.sqrt((xc * xc).sum(axis=1) * (yc * yc).sum(axis=1))
+
+
+def _observed(a: np.ndarray, b: np.ndarray, statistic: str) -> float:
+    if statistic in PAIRED_STATISTICS:
+        return float(_corr_stat(a[None, :], b[None, :])[0])
+    return float(_two_sample_stat(a[None, :], b[None, :], statistic)[0])
+
+
+def _prepare(x, y, statistic: str) -> tuple[np.ndarray, np.ndarray]:
+    if statistic in PAIRED_STATISTICS:
+        xs = pd.to_numeric(pd.Series(x).reset_index(drop=True), errors="coerce")
+        ys = pd.to_numeric(pd.Series(y).reset_index(drop=True), errors="coerce")
+        d = pd.DataFrame({"x": xs, "y": ys}).dropna()
+        if len(d) < 3:
+            raise ValueError("Need at least 3 paired observations.")
+        a, b = d["x"].to_numpy(dtype=float), d["y"].to_numpy(dtype=float)
+        if statistic == "spearman":
+            a, b = stats.rankdata(a), stats.rankdata(b)
+        return a, b
+    if statistic not in TWO_SAMPLE_STATISTICS:
+        raise ValueError(f"statistic must be one of {TWO_SAMPLE_STATISTICS + PAIRED_STATISTICS}")
+    a, b = _values(x), _values(y)
+    if len(a) < 2 or len(b) < 2:
+        raise ValueError("Need at least 2 observations per group.")
+    return a, b
+
+
+def _block(data: tuple, task: tuple[np.random.SeedSequence, int]):
+    """
+    One block of resamples with its own seed; data = (kind, statistic, a, b, observed).
+    Permutation: number of resampled |stat| >= |observed|. Bootstrap: the resampled statistics.
+    """
+    kind, statistic, a, b, observed = data
+    seed, size = task
+    rng = np.random.default_rng(seed)
+    paired = statistic in PAIRED_STATISTICS
+
+    if kind == "permutation":
+        if paired:
+            # permuting y against fixed x breaks the pairing
+            s = _corr_stat(np.broadcast_to(a, (size, len(a))), rng.permuted(np.tile(b, (size, 1)), axis=1))
+        else:
+            pooled = rng.permuted(np.tile(np.concatenate([a, b]), (size, 1)), axis=1)
+            s = _two_sample_stat(pooled[:, :len(a)], pooled[:, len(a):], statistic)
+        # tolerance so resamples equal to the observed value (ties) are counted
+        return int((np.abs(s) >= abs(observed) * (1 - 1e-12)).sum())
+
+    if paired:
+        idx = rng.integers(0, len(a), (size, len(a)))
+        return _corr_stat(a[idx], b[idx])
+    return _two_sample_stat(a[rng.integers(0, len(a), (size, len(a)))],
+                            b[rng.integers(0, len(b), (size, len(b)))], statistic)
+
+
+def _shared_block(ref: tuple, task: tuple[np.random.SeedSequence, int]):
+    """_block in a pool worker: the samples are read from shared memory, not sent with each task."""
+    name, kind, statistic, n1, n, observed = ref
+    shm = shared_memory.SharedMemory(name=name)
+    values = np.ndarray((n,), dtype=float, buffer=shm.buf)
+    try:
+        return _block((kind, statistic, values[:n1], values[n1:], observed), task)
+    finally:
+        # views of the buffer must be gone before it can be closed
+        del values
+        shm.close()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def _tasks(n_resamples: int, n_values: int, seed: int) -> list[tuple[np.random.SeedSequence, int]]:
+    size = int(np.clip(BLOCK_ELEMENTS // max(n_values, 1), 1, MAX_BLOCK))
+    sizes = [size] * (n_resamples // size) + ([n_resamples % size] if n_resamples % size else [])
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _run(kind: str, statistic: str, a: np.ndarray, b: np.ndarray, observed: float, tasks: list,
+         workers: int | None):
+    """
+    Yield block results in block order. Blocks are seeded from one SeedSequence, so results
+    depend on (seed, data) only, not on the number of workers; stopping the generator cancels the rest.
+    """
+    n_values = len(a) + len(b)
+    if workers is None:
+        big = n_values * sum(size for _, size in tasks) >= PARALLEL_MIN_ELEMENTS
+        workers = min(os.cpu_count() or 1, len(tasks)) if big else 1
+    if workers <= 1 or len(tasks) <= 1:
+        data = (kind, statistic, a, b, observed)
+        for task in tasks:
+            yield _block(data, task)
+        return
+    # the samples go to the workers once, through shared memory; tasks carry only a seed and a size
+    shm = shared_memory.SharedMemory(create=True, size=max(n_values, 1) * 8)
+    values = np.ndarray((n_values,), dtype=float, buffer=shm.buf)
+    values[:len(a)], values[len(a):] = a, b
+    del values
+    ref = (shm.name, kind, statistic, len(a), n_values, observed)
+    # at most `workers` blocks in flight: the pool is shared, and early stopping wastes little
+    pool, pending, todo = _pool(), deque(), iter(tasks)
+    try:
+        for task in todo:
+            pending.append(pool.submit(_shared_block, ref, task))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+        # blocks already running still read the segment
+        wait(pending)
+        shm.close()
+        shm.unlink()
+
+
+def _pvalue_interval(count: int, done: int, confidence: float) -> tuple[float, float]:
+    # Clopper-Pearson interval for the exceedance probability behind count / done
+    lo = stats.beta.ppf((1 - confidence) / 2, count, done - count + 1) if count else 0.0
+    hi = stats.beta.ppf(1 - (1 - confidence) / 2, count + 1, done - count) if count < done else 1.0
+    return float(lo), float(hi)
+
+
+@traced("stats")
+@memoize
+def permutation_test(x, y, statistic: str = "welch_t", n_resamples: int = 9999, alpha: float | None = 0.05,
+                     confidence: float = 0.99, seed: int = 0, workers: int | None = None) -> dict:
+    """
+    Two-sided permutation test, no distributional assumptions.
+    Two-sample statistics (x, y = the two groups): welch_t, pooled_t, mean_diff, var_ratio (log F).
+    Paired statistics (x, y = the two columns): pearson, spearman.
+
+    Resamples are generated in batched NumPy blocks (in a process pool for large problems).
+    With alpha set, sampling stops early once the `confidence` interval of the p-value lies
+    entirely above or below alpha. Same seed and data -> same result for any number of workers.
+    """
+    a, b = _prepare(x, y, statistic)
+    observed = _observed(a, b, statistic)
+    if np.isnan(observed):
+        raise ValueError("Statistic is undefined for this data (zero variance?).")
+
+    tasks = _tasks(n_resamples, len(a) + len(b), seed)
+    blocks = _run("permutation", statistic, a, b, observed, tasks, workers)
+    count = done = 0
+    stopped_early = False
+    for (_, size), c in zip(tasks, blocks):
+        count += c
+        done += size
+        if alpha is not None and done < n_resamples:
+            lo, hi = _pvalue_interval(count, done, confidence)
+            if hi < alpha or lo > alpha:
+                stopped_early = True
+                break
+    blocks.close()
+
+    lo, hi = _pvalue_interval(count, done, confidence)
+    return {
+        "statistic": statistic,
+        "observed": observed,
+        # add-one estimate: never 0, valid at any number of resamples
+        "pvalue": (count + 1) / (done + 1),
+        "pvalue_ci": (lo, hi),
+        "n_resamples": int(done),
+        "stopped_early": stopped_early,
+        "n1": int(len(a)),
+        "n2": int(len(b)),
+    }
+
+
+@traced("stats")
+@memoize
+def bootstrap_ci(x, y, statistic: str = "mean_diff", n_resamples: int = 2000, ci: float = 0.95,
+                 seed: int = 0, workers: int | None = None) -> dict:
+    """
+    Percentile bootstrap confidence interval of a statistic (same statistics as permutation_test).
+    Two-sample statistics resample each group separately; paired statistics resample rows.
+    """
+    a, b = _prepare(x, y, statistic)
+    tasks = _tasks(n_resamples, len(a) + len(b), seed)
+    boot = np.concatenate(list(_run("bootstrap", statistic, a, b, np.nan, tasks, workers)))
+    boot = boot[~np.isnan(boot)]
+    if statistic == "var_ratio":
+        boot = np.exp(boot)
+    lo, hi = np.quantile(boot, [(1 - ci) / 2, 1 - (1 - ci) / 2]) if len(boot) else (np.nan, np.nan)
+    observed = _observed(a, b, statistic)
+    return {
+        "statistic": statistic,
+        "observed": float(np.exp(observed)) if statistic == "var_ratio" else observed,
+        "ci": (float(lo), float(hi)),
+        "level": ci,
+        "n_resamples": int(len(boot)),
+    }
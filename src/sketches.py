@@ -0,0 +1,200 @@
+from __future__ import annotations
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# rows fed to a sketch per update when streaming a materialized column
+STREAM_CHUNK_ROWS = 1_000_000
+
+# counters kept by a HeavyHitters summary (memory does not grow with the number of distinct values)
+DEFAULT_CAPACITY = 10_000
+
+
+def _k_for(eps: float) -> int:
+    # empirical KLL bound (Apache DataSketches): normalized rank error ~ 2.296 / k^0.9723 at ~99% confidence
+    return max(8, int(math.ceil((2.296 / eps) ** (1 / 0.9723))))
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: approximate quantiles in O(k log(n/k)) memory with rank error ~eps.
+    Mergeable, so chunks / columns / files can be sketched independently and combined.
+    Exact while fewer than k values have been seen.
+    """
+
+    def __init__(self, eps: float = 0.01, seed: int | None = None):
+        if not 0 < eps < 1:
+            raise ValueError("eps must be in (0, 1)")
+        self.eps = float(eps)
+        self.k = _k_for(eps)
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        """Normalized rank error bound (0 while the sketch is still exact)."""
+        return 0.0 if len(self._levels) == 1 else self.eps
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self._levels) - h - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self._levels):
+            level = self._levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                buf = np.sort(level)
+                # an odd element out stays at this level
+                keep = buf[-1:] if len(buf) % 2 else buf[:0]
+                buf = buf[: len(buf) - len(keep)]
+                promoted = buf[int(self._rng.integers(2))::2]
+                self._levels[h] = keep
+                self._levels[h + 1] = np.concatenate([self._levels[h + 1], promoted])
+            h += 1
+
+    def update(self, values) -> QuantileSketch:
+        x = np.asarray(pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan))
+        x = x[~np.isnan(x)]
+        if len(x):
+            self.n += len(x)
+            self.min = min(self.min, float(x.min()))
+            self.max = max(self.max, float(x.max()))
+            self._levels[0] = np.concatenate([self._levels[0], x])
+            self._compress()
+        return self
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for h, level in enumerate(other._levels):
+            self._levels[h] = np.concatenate([self._levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate quantile(s) for q in [0, 1] (NaN if empty)."""
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.n == 0:
+            out = np.full(len(qs), np.nan)
+        elif len(self._levels) == 1:
+            out = np.quantile(self._levels[0], qs)
+        else:
+            values = np.concatenate(self._levels)
+            weights = np.concatenate([np.full(len(lv), 2.0 ** h) for h, lv in enumerate(self._levels)])
+            order = np.argsort(values, kind="stable")
+            values, cum = values[order], np.cumsum(weights[order])
+            pos = np.searchsorted(cum, qs * cum[-1], side="left")
+            out = values[np.clip(pos, 0, len(values) - 1)]
+            out = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, out))
+        return out if np.ndim(q) else float(out[0])
+
+
+def sketch_series(s: pd.Series, eps: float = 0.01, chunk_rows: int = STREAM_CHUNK_ROWS) -> QuantileSketch:
+    """Stream a column through a sketch chunk by chunk."""
+    sk = QuantileSketch(eps, seed=0)
+    for start in range(0, len(s), chunk_rows):
+        sk.update(s.iloc[start:start + chunk_rows])
+    return sk
+
+
+def _value_counts(s: pd.Series) -> pd.Series:
+    """Counts per value, labels as strings and missing as 'Unknown' (as pareto_table); hashes only distinct values."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, uniques = pd.factorize(s)
+    n = np.bincount(codes + 1, minlength=len(uniques) + 1)
+    counts = pd.Series(n[1:], index=pd.Index(uniques).astype("string"))
+    counts = counts[counts > 0]
+    if n[0]:
+        counts["Unknown"] = counts.get("Unknown", 0) + n[0]
+    if not counts.index.is_unique:
+        # distinct raw values that print the same (e.g. 1 and "1")
+        counts = counts.groupby(level=0).sum()
+    return counts.astype(np.int64)
+
+
+class HeavyHitters:
+    """
+    Misra-Gries frequent-items summary with at most `capacity` counters.
+    Counts are lower bounds, low by at most max_error; every value occurring more than
+    n / (capacity + 1) times is kept. Mergeable (sum counters, then subtract the (capacity+1)-th
+    largest), so chunks / files can be summarized independently and combined.
+    Exact while the number of distinct values stays within capacity.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = int(capacity)
+        self.n = 0
+        self.max_error = 0
+        self.counts = pd.Series(dtype=np.int64)
+
+    @property
+    def exact(self) -> bool:
+        return self.max_error == 0
+
+    def _add(self, counts: pd.Series) -> None:
+        self.counts = counts if self.counts.empty else self.counts.add(counts, fill_value=0).astype(np.int64)
+        if len(self.counts) > self.capacity:
+            v = self.counts.to_numpy()
+            i = len(v) - self.capacity - 1
+            cut = int(np.partition(v, i)[i])
+            self.counts = self.counts[v > cut] - cut
+            self.max_error += cut
+
+    def update(self, values) -> HeavyHitters:
+        s = values if isinstance(values, pd.Series) else pd.Series(values)
+        self.n += len(s)
+        self._add(_value_counts(s))
+        return self
+
+    def merge(self, other: HeavyHitters) -> HeavyHitters:
+        self.n += other.n
+        self.max_error += other.max_error
+        self._add(other.counts)
+        return self
+
+    def top(self, k: int | None = None) -> pd.Series:
+        """Largest counts first (ties in label order)."""
+        out = self.counts.sort_index().sort_values(ascending=False, kind="stable")
+        return out if k is None else out.head(k)
+
+
+def heavy_hitters_series(s: pd.Series, capacity: int = DEFAULT_CAPACITY,
+                         chunk_rows: int = STREAM_CHUNK_ROWS) -> HeavyHitters:
+    """Stream a column through a HeavyHitters summary chunk by chunk (one chunk's hash table at a time)."""
+    hh = HeavyHitters(capacity)
+    for start in range(0, len(s), chunk_rows):
+        hh.update(s.iloc[start:start + chunk_rows])
+    return hh
+
+
+def approx_quantiles(columns: dict[str, pd.Series], qs: list[float], eps: float = 0.01,
+                     max_workers: int | None = None) -> dict[str, tuple[np.ndarray, float]]:
+    """
+    Approximate quantiles for several columns, sketched in parallel (numpy sorts release the GIL).
+    Returns {column: (quantile values, rank error)}.
+    """
+    def run(item):
+        name, s = item
+        sk = sketch_series(s, eps)
+        return name, (sk.quantile(qs), sk.rank_error)
+
+    if len(columns) <= 1:
+        return dict(map(run, columns.items()))
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(columns), os.cpu_count() or 1)) as pool:
+        return dict(pool.map(run, columns.items()))
@@ -1,17 +1,86 @@
+import os
 import streamlit as st
 import pandas as pd
-from src.io import read_csv_bytes
+from src.io import compact_dtypes, read_csv_bytes
+from src.history import start_history
+from src.live import LIVE_KEY, publish, start_live
+from src.store import NOTICE_KEY, bytes_key, get_store, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "01 Data Upload")
 
 st.title("01) Data Upload")
-st.caption("Upload CSV and keep it in session_state.")
+st.caption("Upload CSV into the shared dataset store (identical uploads are stored once).")
+
+live_on = st.toggle("Live / append mode", value=LIVE_KEY in st.session_state,
+                    help="Add new CSV drops to the dataset instead of replacing it: only the new rows are parsed and "
+                         "stored, and the aggregates of the test pages are updated from them.")
+if live_on:
+    uploaded, use_sample = None, False
+else:
+    st.session_state.pop(LIVE_KEY, None)
+    uploaded = st.file_uploader("CSV file", type=["csv"])
+    use_sample = st.toggle("Use sample.csv (data/sample.csv)", value=False)
+
+with st.expander("Read options"):
+    encoding = st.selectbox("Encoding", ["auto", "utf-8-sig", "utf-8", "cp932"], index=0)
+    fast_parser = st.toggle("Multithreaded parser + Arrow dtypes (pyarrow)", value=True)
+    chunk_mb = st.number_input("Show progress for files larger than (MB)", min_value=1, value=200, step=50)
+    compact = st.toggle("Compact dtypes (downcast numbers, low-cardinality text as category)", value=True,
+                        disabled=live_on, help="Off in live mode: batches must keep the same column types.")
+
+
+def read_batch(raw: bytes) -> pd.DataFrame:
+    enc = None if encoding == "auto" else encoding
+    if fast_parser:
+        return read_csv_bytes(raw, encoding=enc, engine="pyarrow", dtype_backend="pyarrow")
+    return read_csv_bytes(raw, encoding=enc)
+
 
-uploaded = st.file_uploader("CSV file", type=["csv"])
-use_sample = st.toggle("Use sample.csv (data/sample.csv)", value=False)
+if live_on:
+    st.session_state["ingest_report"] = None
+    live = st.session_state.get(LIVE_KEY) or start_live(st.session_state)
+    batches = st.file_uploader("Append CSV batches", type=["csv"], accept_multiple_files=True)
+    for f in batches or []:
+        name = f"upload:{f.name}:{f.size}"
+        if name in live.seen:
+            continue
+        try:
+            rows = live.append(read_batch(f.getvalue()))
+            st.session_state.setdefault("log", []).append(f"Appended {f.name}: {rows} rows")
+        except Exception as e:
+            st.error(f"Failed to append {f.name}: {e}")
+        live.seen.add(name)
+
+    watch_dir = st.text_input("Watched directory (new *.csv files are appended)")
+    every = st.number_input("Check every (seconds, 0 = only on click)", min_value=0, value=0, step=30)
+
+    def check_directory():
+        res = live.scan(watch_dir, read_batch)
+        for path, err in res["errors"].items():
+            st.error(f"Failed to append {os.path.basename(path)}: {err}")
+        if res["files"]:
+            st.session_state.setdefault("log", []).append(f"Appended {len(res['files'])} files: {res['rows']} rows")
+            publish(st.session_state, live, f"Live: {live.rows:,} rows in {len(live.parts)} batches")
+            st.rerun()
+
+    if watch_dir and not os.path.isdir(watch_dir):
+        st.error(f"Not a directory: {watch_dir}")
+    elif watch_dir and every and hasattr(st, "fragment"):
+        st.fragment(run_every=every)(check_directory)()
+    elif watch_dir and st.button("Check for new files"):
+        check_directory()
+
+    publish(st.session_state, live, f"Live: {live.rows:,} rows in {len(live.parts)} batches")
+    st.caption(f"Live dataset: {live.rows:,} rows in {len(live.parts)} batches.")
 
 if use_sample:
     try:
         df = pd.read_csv("data/sample.csv")
-        st.session_state["df"] = df
+        st.session_state["ingest_report"] = None
+        if compact:
+            df, st.session_state["ingest_report"] = compact_dtypes(df)
+        start_history(st.session_state, get_store().put_columns(df), "Loaded sample.csv")
         st.session_state.setdefault("log", []).append("Loaded sample.csv")
         st.success("Loaded sample.csv into session.")
     except Exception as e:
@@ -20,20 +89,53 @@ if use_sample:
 if uploaded:
     try:
         raw = uploaded.getvalue()
-        df = read_csv_bytes(raw)
-        st.session_state["df"] = df
+        enc = None if encoding == "auto" else encoding
+        key = bytes_key(raw, encoding=enc, fast_parser=fast_parser, compact=compact)
+        # the report describes this upload only (a store hit from another session has none)
+        if (st.session_state.get("ingest_report") or {}).get("key") != key:
+            st.session_state["ingest_report"] = None
+        if key not in get_store():
+            if len(raw) > chunk_mb * 1024 * 1024:
+                bar = st.progress(0.0, text="Parsing CSV...")
+                df = read_csv_bytes(raw, encoding=enc, chunksize=500_000,
+                                    dtype_backend="pyarrow" if fast_parser else None,
+                                    progress=lambda f: bar.progress(f, text=f"Parsing CSV... {f:.0%}"))
+                bar.empty()
+            elif fast_parser:
+                df = read_csv_bytes(raw, encoding=enc, engine="pyarrow", dtype_backend="pyarrow")
+            else:
+                df = read_csv_bytes(raw, encoding=enc)
+            if compact:
+                df, report = compact_dtypes(df)
+                st.session_state["ingest_report"] = {**report, "key": key}
+            # per-column manifest, so cleaned versions share the columns they leave unchanged
+            get_store().put_columns(df, key=key)
+        start_history(st.session_state, key, f"Uploaded CSV: {uploaded.name}")
         st.session_state.setdefault("log", []).append(f"Uploaded CSV: {uploaded.name}")
         st.success("Uploaded data loaded into session.")
     except Exception as e:
         st.error(f"Failed to read CSV: {e}")
 
-if "df" in st.session_state:
-    df = st.session_state["df"]
+df = session_df(st.session_state)
+if df is not None:
     st.write("Preview")
     st.dataframe(df.head(20), use_container_width=True)
     st.write("Shape:", df.shape)
 
+    report = st.session_state.get("ingest_report")
+    if report and report["columns"]:
+        mb = 1024 * 1024
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Memory before", f"{report['before_bytes'] / mb:,.1f} MB")
+        c2.metric("Memory after", f"{report['after_bytes'] / mb:,.1f} MB")
+        c3.metric("Saved", f"{report['saved_bytes'] / mb:,.1f} MB",
+                  f"-{report['saved_bytes'] / max(report['before_bytes'], 1):.0%}", delta_color="inverse")
+        with st.expander("Compacted columns"):
+            st.dataframe(pd.DataFrame.from_dict(report["columns"], orient="index"), use_container_width=True)
+
     with st.expander("Column dtypes"):
         st.dataframe(df.dtypes.astype(str).to_frame("dtype"), use_container_width=True)
 else:
-    st.info("Upload a CSV or toggle sample.")
+    st.info(st.session_state.pop(NOTICE_KEY, None) or "Upload a CSV or toggle sample.")
+
+end_rerun(st.session_state)
@@ -1,16 +1,24 @@
+import os
 import streamlit as st
 import numpy as np
 import pandas as pd
-from src.cleaning import coerce_datetime, coerce_numeric, drop_duplicates, fill_missing, iqr_filter
+from src.cleaning import CleaningPlan, duplicate_groups, format_step
+from src.history import HISTORY_KEY, checkout, commit_version, start_history
+from src.store import NOTICE_KEY, SESSION_KEY, get_store, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "02 Cleaning")
 
 st.title("02) Cleaning")
-st.caption("Minimal, practical cleaning with a simple log.")
+st.caption("Minimal, practical cleaning: steps are planned, then applied in one pass.")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
-
-df = st.session_state["df"]
+if HISTORY_KEY not in st.session_state:
+    start_history(st.session_state, st.session_state[SESSION_KEY], "Initial dataset")
+history = st.session_state[HISTORY_KEY]
 
 st.subheader("1) Type coercion")
 cols = df.columns.tolist()
@@ -23,48 +31,60 @@ with colA:
 with colB:
     do_drop_dup = st.toggle("Drop duplicates", value=True)
 
+with st.expander("Duplicate options"):
+    dup_keys = st.multiselect("Key columns (empty = whole row)", cols)
+    use_seen = st.toggle("Also drop rows seen in earlier uploads (persistent hash set)", value=False)
+    seen_name = st.text_input("Hash set name", value="default", disabled=not use_seen)
+    seen_path = os.path.join(get_store().root, f"rowhashes-{seen_name}") if use_seen else None
+    if st.button("Show duplicate groups"):
+        groups = duplicate_groups(df, dup_keys or None)
+        st.write(f"{len(groups)} duplicate groups (largest first).")
+        st.dataframe(groups, use_container_width=True)
+
 st.subheader("2) Outlier removal (IQR)")
 outlier_col = st.selectbox("Outlier filter column (optional)", ["(none)"] + cols)
 iqr_k = st.slider("IQR k", min_value=1.0, max_value=3.0, value=1.5, step=0.1)
 
-if st.button("Apply cleaning", type="primary"):
-    out = df.copy()
-    log = st.session_state.setdefault("log", [])
+approx = st.toggle("Approximate quantiles for median fill / IQR (streaming sketch, for large data)",
+                   value=len(df) > 5_000_000)
+approx_eps = st.select_slider("Sketch rank error", options=[0.001, 0.005, 0.01, 0.02], value=0.01) if approx else None
 
-    # coerce
+if st.button("Apply cleaning", type="primary"):
+    plan = CleaningPlan()
     if date_col != "(none)":
-        out = coerce_datetime(out, date_col)
-        log.append(f"Coerced to datetime: {date_col}")
-
-    for c in num_cols:
-        out = coerce_numeric(out, c)
-        log.append(f"Coerced to numeric: {c}")
-
-    # fill missing
-    before_missing = int(out.isna().sum().sum())
-    out, rep = fill_missing(out, numeric_strategy=numeric_strategy)
-    after_missing = int(out.isna().sum().sum())
-    log.append(f"Filled missing (numeric={numeric_strategy}): numeric={rep['numeric_filled']}, categorical={rep['categorical_filled']} (remaining NA {after_missing})")
-
-    # drop duplicates
+        plan.coerce_datetime(date_col)
+    plan.coerce_numeric(num_cols)
+    plan.fill_missing(numeric_strategy=numeric_strategy, approx_eps=approx_eps)
     if do_drop_dup:
-        out, removed = drop_duplicates(out)
-        log.append(f"Dropped duplicates: {removed}")
-
-    # iqr outliers
+        plan.drop_duplicates(dup_keys or None, seen_path=seen_path)
     if outlier_col != "(none)":
-        out2, info = iqr_filter(out, outlier_col, k=iqr_k)
-        out = out2
-        log.append(f"IQR outlier filter on {outlier_col}: removed={info['removed']} (lower={info['lower']}, upper={info['upper']})")
+        plan.iqr_filter(outlier_col, k=iqr_k, approx_eps=approx_eps)
 
-    st.session_state["df"] = out
+    # the upload this history started from; its own rows are never "seen in earlier uploads"
+    source = history.versions[0]["key"]
+    out, records = plan.run(df, source=source)
+    commit_version(st.session_state, out, f"Cleaning ({len(records)} steps)", records,
+                   CleaningPlan.touched_columns(records))
+    plan.record_seen(out, source)
     st.success("Cleaning applied.")
 
+u1, u2, u3 = st.columns([1, 1, 4])
+if u1.button("↶ Undo", disabled=not history.can_undo):
+    checkout(st.session_state, history.pos - 1)
+    st.rerun()
+if u2.button("↷ Redo", disabled=not history.can_redo):
+    checkout(st.session_state, history.pos + 1)
+    st.rerun()
+u3.caption(f"Version {history.pos} of {len(history.versions) - 1}: {history.current['label']}")
+
 st.markdown("---")
 st.subheader("Current dataset")
-st.write("Shape:", st.session_state["df"].shape)
-st.dataframe(st.session_state["df"].head(30), use_container_width=True)
+current = session_df(st.session_state)
+st.write("Shape:", current.shape)
+st.dataframe(current.head(30), use_container_width=True)
 
 with st.expander("Log"):
     for item in st.session_state.get("log", []):
-        st.write("•", item)
+        st.write("•", format_step(item))
+
+end_rerun(st.session_state)
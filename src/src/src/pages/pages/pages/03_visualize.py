@@ -1,15 +1,23 @@
 import streamlit as st
 import numpy as np
-from src.viz import plot_histogram, pareto_table, plot_pareto
+from src.cache import fingerprint
+from src.live import live_dataset
+from src.ooc import chunked_summary
+from src.progressive import cancellable_chunks, is_large, run_exact, show_progressive, stratified_sample
+from src.render import RENDER_POOL, render_slot, show_plot, wait_rendered
+from src.viz import plot_histogram, pareto_table, pareto_top, plot_pareto
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "03 Visualize")
 
 st.title("03) Visualize")
 st.caption("Histogram (numeric) and Pareto (category).")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
-
-df = st.session_state["df"]
 cols = df.columns.tolist()
 
 tab1, tab2 = st.tabs(["Histogram", "Pareto"])
@@ -21,26 +29,65 @@ with tab1:
     else:
         col = st.selectbox("Numeric column", numeric_cols)
         bins = st.slider("Bins", 5, 80, 20)
-        fig = plot_histogram(df[col], bins=bins, title=f"Histogram: {col}")
-        st.pyplot(fig, clear_figure=True)
+        title = f"Histogram: {col}"
+        plot, note, box = st.empty(), st.empty(), st.empty()
+
+        def summary(values):
+            return chunked_summary([values.to_frame()], values.name)
 
-        s = df[col].dropna()
-        c1, c2, c3 = st.columns(3)
-        c1.metric("count", int(s.shape[0]))
-        c2.metric("mean", float(s.mean()))
-        c3.metric("median", float(s.median()))
+        def display(res, provisional):
+            with box.container():
+                c1, c2, c3 = st.columns(3)
+                c1.metric("count" + (" (sample)" if provisional else ""), res["count"])
+                c2.metric("mean", res["mean"])
+                err = res["median_rank_error"]
+                c3.metric("median" + (" (approx.)" if err else ""), res["median"],
+                          help=f"Quantile sketch: within {err:.1%} of the median's rank." if err else None)
+
+        if is_large(df):
+            # sample histogram and summary first; the exact ones replace them when ready
+            exact_plot = RENDER_POOL.submit(render_slot(st.session_state, "histogram"), plot_histogram,
+                                            df[col], bins=bins, title=title)
+            sample = stratified_sample(df[[col]])
+            if not exact_plot.done():
+                show_plot(plot, st.session_state, "histogram-sample", plot_histogram, sample[col], bins=bins,
+                          title=f"{title} (sample of {len(sample):,} rows)")
+            job = run_exact(st.session_state, "histogram", fingerprint(df[col]),
+                            lambda cancel: chunked_summary(cancellable_chunks(df[[col]], cancel), col))
+            show_progressive(note, job, lambda: summary(sample[col]), display, len(sample), len(df))
+            plot.image(wait_rendered(exact_plot, lambda: note.caption("Rendering exact histogram…")))
+            note.empty()
+        else:
+            show_plot(plot, st.session_state, "histogram", plot_histogram, df[col], bins=bins, title=title)
+            display(summary(df[col]), False)
 
 with tab2:
     cat_col = st.selectbox("Category column", cols)
-    p_df = pareto_table(df, cat_col)
+    live = live_dataset(st.session_state)
+    sketch = live is None and st.radio(
+        "Counting", ["Exact", "Top 50 (bounded memory)"], index=1 if is_large(df) else 0, horizontal=True,
+        help="Bounded memory keeps at most 10,000 counters (Misra-Gries), so many distinct values (IDs) stay "
+             "cheap; categories more frequent than 1/10,000 of rows are always found.",
+    ).startswith("Top")
+    if live is not None:
+        # live mode: counts maintained across appended batches
+        p_df = live.aggregate("category_counts", cat_col)
+    elif sketch:
+        p_df = pareto_top(df, cat_col, top_n=50)
+    else:
+        p_df = pareto_table(df, cat_col)
 
     top_n = st.slider("Show top N categories", 5, min(50, len(p_df)), min(20, len(p_df)))
     show_df = p_df.head(top_n).copy()
 
-    fig = plot_pareto(show_df, cat_col, title=f"Pareto: {cat_col} (top {top_n})")
-    st.pyplot(fig, clear_figure=True)
+    show_plot(st.empty(), st.session_state, "pareto", plot_pareto, show_df, cat_col,
+              title=f"Pareto: {cat_col} (top {top_n})")
     st.dataframe(show_df, use_container_width=True)
+    if sketch and (show_df["count_max"] > show_df["count"]).any():
+        st.caption(f"Approximate: each count may be low by up to {int(show_df['count_max'].iat[0] - show_df['count'].iat[0]):,}.")
 
     # quick 80/20 insight
     hit = show_df[show_df["cum_ratio"] <= 0.8].shape[0]
     st.info(f"Top ~{hit} categories cover ~80% (within displayed top N).")
+
+end_rerun(st.session_state)
@@ -1,6 +1,11 @@
 import streamlit as st
 import numpy as np
-from src.stats_tests import binomial_test
+import pandas as pd
+from src.stats_tests import batch_binomial_tests, binomial_test
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "04 Binomial test")
 
 st.title("04) Binomial Test (2-choice success rate)")
 st.caption("Test whether success rate differs from p0.")
@@ -27,3 +32,45 @@ if st.button("Run binomial test", type="primary"):
             st.info("Result: not statistically significant (fail to reject H0).")
     except Exception as e:
         st.error(str(e))
+
+st.markdown("---")
+st.subheader("Per segment (from dataset)")
+st.caption("k and n per group from a group column and a success column, all segments tested at once.")
+
+df = session_df(st.session_state)
+if df is None:
+    st.info(st.session_state.pop(NOTICE_KEY, None) or "Upload a dataset (01 Data Upload) to test conversion rates per segment.")
+    st.stop()
+cols = df.columns.tolist()
+c1, c2 = st.columns(2)
+with c1:
+    gcol = st.selectbox("Segment column", cols)
+with c2:
+    scol = st.selectbox("Success column", cols, index=min(1, len(cols) - 1))
+s = df[scol]
+if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+    success_value = None
+    st.caption("Non-zero / True counts as a success.")
+else:
+    levels = s.dropna().astype("string").value_counts().index[:1000].tolist()
+    success_value = st.selectbox("Success value", levels) if levels else None
+
+c3, c4 = st.columns(2)
+with c3:
+    method = st.selectbox("p-value", ["exact", "midp"], index=0,
+                          help="midp counts half the probability of the observed k (less conservative).")
+with c4:
+    correction = st.selectbox("Multiple-comparison correction", ["holm", "bh", "none"], index=0,
+                              help="holm controls family-wise error; bh (Benjamini-Hochberg) controls false discovery rate.")
+
+if st.button("Run per-segment binomial tests"):
+    try:
+        res = batch_binomial_tests(df, gcol, scol, float(p0), success_value=success_value,
+                                   alternative=alternative, method=method, correction=correction)
+        n_sig = int((res["pvalue_adj"] < alpha).sum())
+        st.write(f"{len(res)} segments, {n_sig} significant after {correction} correction (alpha={alpha}).")
+        st.dataframe(res, use_container_width=True)
+    except Exception as e:
+        st.error(str(e))
+
+end_rerun(st.session_state)
@@ -1,16 +1,21 @@
 import streamlit as st
 import numpy as np
-from src.stats_tests import f_test_variance
+from src.live import live_dataset
+from src.resampling import bootstrap_ci, permutation_test
+from src.stats_tests import batch_group_tests, f_test_from_moments, group_codes, group_moments
+from src.store import NOTICE_KEY, session_df
+from src.profiling import begin_rerun, end_rerun
+
+begin_rerun(st.session_state, "05 F-test")
 
 st.title("05) F-test (Variance comparison)")
 st.caption("Check whether variability differs between two groups (normality assumed).")
 
-if "df" not in st.session_state:
-    st.warning("No dataset. Go to 01 Data Upload.")
+df = session_df(st.session_state)
+if df is None:
+    st.warning(st.session_state.pop(NOTICE_KEY, None) or "No dataset. Go to 01 Data Upload.")
     st.stop()
 
-df = st.session_state["df"]
-
 alpha = st.slider("Significance level (alpha)", 0.001, 0.2, 0.05, 0.001)
 
 group_cols = df.columns.tolist()
@@ -23,8 +28,14 @@ if not numeric_cols:
 gcol = st.selectbox("Group column (A/B, Before/After)", group_cols)
 vcol = st.selectbox("Numeric value column", numeric_cols)
 
-groups = df[gcol].dropna().astype("string").unique().tolist()
-groups = sorted(groups)
+# per-group n / mean / m2, built once per (group column, value column) and cached
+live = live_dataset(st.session_state)
+if live is not None:
+    # live mode: moments maintained across appended batches (each append only merges its own rows)
+    idx = live.aggregate("group_moments", gcol, vcol)
+else:
+    idx = group_moments(df[gcol], df[vcol])
+groups = idx.index.tolist()
 
 if len(groups) < 2:
     st.info("Need at least 2 groups in group column.")
@@ -33,16 +44,49 @@ if len(groups) < 2:
 g1 = st.selectbox("Group 1", groups, index=0)
 g2 = st.selectbox("Group 2", groups, index=1 if len(groups) > 1 else 0)
 
+with st.expander("Resampling (no normality assumption)"):
+    use_perm = st.toggle("Also run a permutation test and bootstrap CI", value=False)
+    n_resamples = st.select_slider("Max permutations", options=[999, 4999, 9999, 49999, 99999], value=9999,
+                                   help="Stops early once the p-value is clearly above or below alpha.")
+
 if st.button("Run F-test", type="primary"):
     try:
-        x = df.loc[df[gcol].astype("string") == g1, vcol]
-        y = df.loc[df[gcol].astype("string") == g2, vcol]
-        res = f_test_variance(x, y)
+        res = f_test_from_moments(idx.loc[g1], idx.loc[g2])
         st.write(res)
         st.metric("p-value", f"{res['pvalue']:.6f}")
         if res["pvalue"] < alpha:
             st.success("Result: variances differ (significant).")
         else:
             st.info("Result: no evidence variances differ.")
+
+        if use_perm:
+            # cached factorization of the group column: integer compares, no string conversion per click
+            codes, labels = group_codes(df[gcol])
+            x, y = df.loc[codes == labels.get_loc(g1), vcol], df.loc[codes == labels.get_loc(g2), vcol]
+            with st.spinner("Resampling..."):
+                perm = permutation_test(x, y, "var_ratio", n_resamples=n_resamples, alpha=alpha)
+                boot = bootstrap_ci(x, y, "var_ratio")
+            p1, p2 = st.columns(2)
+            p1.metric("Permutation p-value", f"{perm['pvalue']:.6f}")
+            p2.metric("Bootstrap 95% CI (variance ratio)", f"[{boot['ci'][0]:.4f}, {boot['ci'][1]:.4f}]")
+            note = " (stopped early: p-value clearly on one side of alpha)" if perm["stopped_early"] else ""
+            st.caption(f"{perm['n_resamples']} permutations{note}, {boot['n_resamples']} bootstrap resamples.")
     except Exception as e:
         st.error(str(e))
+
+st.markdown("---")
+st.subheader("All group pairs × all numeric columns")
+correction = st.selectbox("Multiple-comparison correction", ["holm", "bh", "none"], index=0,
+                          help="holm controls family-wise error; bh (Benjamini-Hochberg) controls false discovery rate.")
+if st.button("Run batch F-test"):
+    try:
+        res = batch_group_tests(df, gcol, [c for c in numeric_cols if c != gcol], correction=correction)
+        show = res[["value_col", "group1", "group2", "n1", "n2", "var1", "var2", "F", "f_p", "f_p_adj"]]
+        show = show.sort_values("f_p_adj")
+        n_sig = int((show["f_p_adj"] < alpha).sum())
+        st.write(f"{len(show)} comparisons, {n_sig} significant after {correction} correction (alpha={alpha}).")
+        st.dataframe(show, use_container_width=True)
+    except ValueError as e:
+        st.error(str(e))
+
+end_rerun(st.session_state)
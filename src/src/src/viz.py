@@ -1,13 +1,60 @@
 from __future__ import annotations
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
+from src.cache import memoize
+from src.lazy import mpl_figure
+from src.profiling import traced
+from src.sketches import DEFAULT_CAPACITY, heavy_hitters_series
 
+# above this many points plot_scatter draws a 2D density instead of individual markers
+SCATTER_MAX_POINTS = 50_000
+
+
+def _numeric_values(series: pd.Series) -> np.ndarray:
+    x = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return x[~np.isnan(x)]
+
+
+@traced("viz")
+@memoize
+def histogram_bins(series: pd.Series, bins: int = 20) -> tuple[np.ndarray, np.ndarray]:
+    """(counts, edges) via np.histogram; the renderer only ever sees `bins` values."""
+    return np.histogram(_numeric_values(series), bins=bins)
+
+
+@traced("viz")
+@memoize
+def density_2d(x: pd.Series, y: pd.Series, gridsize: int = 200) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """2D histogram of complete (x, y) pairs -> (counts, x_edges, y_edges, n_points)."""
+    xv = pd.to_numeric(x, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    yv = pd.to_numeric(y, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    ok = ~(np.isnan(xv) | np.isnan(yv))
+    xv, yv = xv[ok], yv[ok]
+    if len(xv) == 0:
+        counts, xe, ye = np.histogram2d(xv, yv, bins=gridsize)
+        return counts, xe, ye, 0
+
+    # uniform bins via integer bin indices + bincount (much faster than np.histogram2d)
+    def bin_index(v):
+        lo, hi = float(v.min()), float(v.max())
+        if hi == lo:
+            lo, hi = lo - 0.5, hi + 0.5
+        idx = ((v - lo) * (gridsize / (hi - lo))).astype(np.int64)
+        return np.minimum(idx, gridsize - 1), np.linspace(lo, hi, gridsize + 1)
+
+    ix, xe = bin_index(xv)
+    iy, ye = bin_index(yv)
+    counts = np.bincount(ix * gridsize + iy, minlength=gridsize * gridsize).reshape(gridsize, gridsize)
+    return counts.astype(float), xe, ye, len(xv)
+
+
+@traced("viz")
 def plot_histogram(series: pd.Series, bins: int = 20, title: str = "Histogram"):
-    s = pd.to_numeric(series, errors="coerce").dropna()
-    fig, ax = plt.subplots()
-    ax.hist(s, bins=bins)
+    counts, edges = histogram_bins(series, bins=bins)
+    fig = mpl_figure.Figure()
+    ax = fig.subplots()
+    ax.hist(edges[:-1], bins=edges, weights=counts)
     ax.set_title(title)
     ax.set_xlabel("value")
     ax.set_ylabel("count")
@@ -15,8 +62,20 @@ def plot_histogram(series: pd.Series, bins: int = 20, title: str = "Histogram"):
     return fig
 
 
+@traced("viz")
+@memoize
 def pareto_table(df: pd.DataFrame, category_col: str) -> pd.DataFrame:
-    counts = df[category_col].astype("string").fillna("Unknown").value_counts(dropna=False)
+    s = df[category_col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # count the integer codes instead of materializing strings (code -1 = missing)
+        n = np.bincount(s.cat.codes.to_numpy() + 1, minlength=len(s.cat.categories) + 1)
+        counts = pd.Series(n[1:], index=s.cat.categories.astype("string"))
+        counts = counts[counts > 0]
+        if n[0]:
+            counts["Unknown"] = counts.get("Unknown", 0) + n[0]
+        counts = counts.sort_values(ascending=False, kind="stable")
+    else:
+        counts = s.astype("string").fillna("Unknown").value_counts(dropna=False)
     out = counts.rename("count").to_frame()
     out["ratio"] = out["count"] / out["count"].sum()
     out["cum_ratio"] = out["ratio"].cumsum()
@@ -24,8 +83,33 @@ def pareto_table(df: pd.DataFrame, category_col: str) -> pd.DataFrame:
     return out.reset_index()
 
 
+@traced("viz")
+@memoize
+def pareto_top(df: pd.DataFrame, category_col: str, top_n: int = 50, capacity: int = DEFAULT_CAPACITY) -> pd.DataFrame:
+    """
+    First top_n rows of pareto_table in bounded memory: exact from the codes of categorical columns,
+    otherwise from a HeavyHitters summary streamed over the column.
+    Sketched counts are lower bounds and count_max upper bounds (equal when exact); ratios are
+    over all rows, so cum_ratio is a lower bound too.
+    """
+    s = df[category_col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        out = pareto_table(df, category_col).head(top_n)
+        return out.assign(count_max=out["count"])
+
+    hh = heavy_hitters_series(s, max(capacity, top_n))
+    out = hh.top(top_n).rename("count").to_frame()
+    out["ratio"] = out["count"] / max(hh.n, 1)
+    out["cum_ratio"] = out["ratio"].cumsum()
+    out["count_max"] = out["count"] + hh.max_error
+    out.index.name = category_col
+    return out.reset_index()
+
+
+@traced("viz")
 def plot_pareto(pareto_df: pd.DataFrame, category_col: str, title: str = "Pareto"):
-    fig, ax1 = plt.subplots()
+    fig = mpl_figure.Figure()
+    ax1 = fig.subplots()
     ax2 = ax1.twinx()
 
     x = np.arange(len(pareto_df))
@@ -43,11 +127,25 @@ def plot_pareto(pareto_df: pd.DataFrame, category_col: str, title: str = "Pareto
     return fig
 
 
-def plot_scatter(x: pd.Series, y: pd.Series, title: str = "Scatter"):
-    df = pd.DataFrame({"x": pd.to_numeric(x, errors="coerce"),
-                       "y": pd.to_numeric(y, errors="coerce")}).dropna()
-    fig, ax = plt.subplots()
-    ax.scatter(df["x"], df["y"])
+@traced("viz")
+def plot_scatter(x: pd.Series, y: pd.Series, title: str = "Scatter",
+                 max_points: int = SCATTER_MAX_POINTS, gridsize: int = 200):
+    """
+    Scatter plot; above max_points the pairs are binned into a gridsize x gridsize
+    density (log color scale) so render cost does not depend on row count.
+    """
+    fig = mpl_figure.Figure()
+    ax = fig.subplots()
+    if len(x) > max_points:
+        counts, xe, ye, n = density_2d(x, y, gridsize=gridsize)
+        masked = np.ma.masked_equal(counts.T, 0)
+        mesh = ax.pcolormesh(xe, ye, masked, norm="log" if masked.count() else None, cmap="viridis")
+        fig.colorbar(mesh, ax=ax, label="points per cell")
+        title = f"{title} (density of {n:,} points)"
+    else:
+        df = pd.DataFrame({"x": pd.to_numeric(x, errors="coerce"),
+                           "y": pd.to_numeric(y, errors="coerce")}).dropna()
+        ax.scatter(df["x"], df["y"])
     ax.set_title(title)
     ax.set_xlabel("x")
     ax.set_ylabel("y")
@@ -55,21 +153,110 @@ def plot_scatter(x: pd.Series, y: pd.Series, title: str = "Scatter"):
     return fig
 
 
-def plot_timeseries(df: pd.DataFrame, date_col: str, value_col: str, ma_window: int = 7, title: str = "Time Series"):
-    tmp = df.copy()
-    tmp[date_col] = pd.to_datetime(tmp[date_col], errors="coerce")
-    tmp[value_col] = pd.to_numeric(tmp[value_col], errors="coerce")
-    tmp = tmp.dropna(subset=[date_col, value_col]).sort_values(date_col)
-    tmp = tmp.set_index(date_col)
+# points drawn per line in plot_timeseries (roughly the pixel width of the chart)
+TIMESERIES_MAX_POINTS = 2000
+
+
+@traced("viz")
+@memoize
+def time_index(dates: pd.Series, values: pd.Series) -> pd.Series:
+    """
+    Numeric values indexed by parsed, sorted datetimes (rows missing either are dropped).
+    Built once per (date column, value column) and reused across MA windows / resample frequencies.
+    """
+    d = pd.to_datetime(dates, errors="coerce")
+    v = pd.to_numeric(values, errors="coerce")
+    ts = pd.Series(v.to_numpy(dtype=float, na_value=np.nan), index=pd.DatetimeIndex(d), name=values.name)
+    ts = ts[ts.index.notna() & ts.notna().to_numpy()]
+    ts.index.name = dates.name
+    return ts.sort_index(kind="stable")
 
-    fig, ax = plt.subplots()
-    ax.plot(tmp.index, tmp[value_col], label="value")
+
+@traced("viz")
+@memoize
+def moving_average(ts: pd.Series, window: int) -> pd.Series:
+    return ts.rolling(window).mean()
+
+
+@traced("viz")
+@memoize
+def resample_mean(ts: pd.Series, freq: str) -> pd.Series:
+    try:
+        return ts.resample(freq).mean()
+    except ValueError:
+        # pandas >= 2.2 spells month/quarter/year end as "ME"/"QE"/"YE"
+        return ts.resample(freq + "E").mean()
+
+
+@traced("viz")
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of n_out points that keep the visual shape.
+    x must be sorted; returns all indices when n_out >= len(x).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def _downsample(s: pd.Series, n_out: int) -> pd.Series:
+    s = s.dropna()
+    idx = lttb(s.index.asi8, s.to_numpy(dtype=float), n_out)
+    return s.iloc[idx]
+
+
+@traced("viz")
+def plot_timeseries(df: pd.DataFrame, date_col: str, value_col: str, ma_window: int = 7, title: str = "Time Series",
+                    max_points: int = TIMESERIES_MAX_POINTS):
+    """
+    Line chart of value_col over date_col with an optional moving average.
+    Each line is LTTB-downsampled to max_points; the returned frame holds the full sorted series.
+    """
+    ts = time_index(df[date_col], df[value_col])
+
+    fig = mpl_figure.Figure()
+    ax = fig.subplots()
+    shown = _downsample(ts, max_points)
+    ax.plot(shown.index, shown.to_numpy(), label="value")
     if ma_window and ma_window >= 2:
-        ax.plot(tmp.index, tmp[value_col].rolling(ma_window).mean(), label=f"MA({ma_window})")
-    ax.set_title(title)
+        ma = _downsample(moving_average(ts, ma_window), max_points)
+        ax.plot(ma.index, ma.to_numpy(), label=f"MA({ma_window})")
+    ax.set_title(title if len(shown) == len(ts) else f"{title} ({len(shown):,} of {len(ts):,} points)")
     ax.set_xlabel("date")
     ax.set_ylabel(value_col)
     ax.legend()
     fig.autofmt_xdate()
     fig.tight_layout()
-    return fig, tmp
+    return fig, ts.to_frame(value_col)
+
+
+@traced("viz")
+def plot_heatmap(matrix: pd.DataFrame, title: str = "Heatmap", vmin: float = -1.0, vmax: float = 1.0,
+                 max_labels: int = 50):
+    fig = mpl_figure.Figure(figsize=(7, 6))
+    ax = fig.subplots()
+    im = ax.imshow(matrix.to_numpy(dtype=float), cmap="coolwarm", vmin=vmin, vmax=vmax, interpolation="nearest")
+    fig.colorbar(im, ax=ax)
+    ax.set_title(title)
+    if len(matrix) <= max_labels:
+        ax.set_xticks(np.arange(len(matrix.columns)))
+        ax.set_xticklabels(matrix.columns.astype(str), rotation=90)
+        ax.set_yticks(np.arange(len(matrix.index)))
+        ax.set_yticklabels(matrix.index.astype(str))
+    fig.tight_layout()
+    return fig
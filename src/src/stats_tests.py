@@ -1,9 +1,19 @@
 from __future__ import annotations
+import os
+
 import numpy as np
 import pandas as pd
-from scipy import stats
 
+from src.cache import memoize
+from src.lazy import stats
+from src.profiling import traced
+
+# largest table batch_group_tests builds (group pairs x value columns)
+MAX_BATCH_PAIRS = int(os.environ.get("STATS_DASHBOARD_MAX_BATCH_PAIRS", "200000"))
 
+
+@traced("stats")
+@memoize
 def binomial_test(k: int, n: int, p0: float, alternative: str = "two-sided") -> dict:
     """
     alternative: 'two-sided', 'greater', 'less'
@@ -25,28 +35,100 @@ def binomial_test(k: int, n: int, p0: float, alternative: str = "two-sided") ->
     }
 
 
-def f_test_variance(x: pd.Series, y: pd.Series) -> dict:
+def _moments(x: np.ndarray) -> dict:
+    n = len(x)
+    mean = float(x.mean()) if n else np.nan
+    return {"n": n, "mean": mean, "m2": float(((x - mean) ** 2).sum()) if n else 0.0}
+
+
+def merge_moments(a, b) -> dict:
+    """Combine (n, mean, m2) of two disjoint samples (Chan et al. parallel update)."""
+    n = a["n"] + b["n"]
+    if n == 0:
+        return {"n": 0, "mean": np.nan, "m2": 0.0}
+    if a["n"] == 0 or b["n"] == 0:
+        src = a if a["n"] else b
+        return {"n": int(src["n"]), "mean": float(src["mean"]), "m2": float(src["m2"])}
+    delta = b["mean"] - a["mean"]
+    mean = a["mean"] + delta * b["n"] / n
+    m2 = a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / n
+    return {"n": int(n), "mean": float(mean), "m2": float(m2)}
+
+
+@traced("stats")
+def merge_group_moments(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Combine two group_moments tables (groups may differ), vectorized over groups."""
+    idx = a.index.union(b.index)
+    a = a.reindex(idx).fillna({"n": 0, "m2": 0.0})
+    b = b.reindex(idx).fillna({"n": 0, "m2": 0.0})
+    na, nb = a["n"].to_numpy(dtype=float), b["n"].to_numpy(dtype=float)
+    ma, mb = a["mean"].to_numpy(dtype=float), b["mean"].to_numpy(dtype=float)
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = np.where(nb > 0, mb, 0.0) - np.where(na > 0, ma, 0.0)
+        mean = np.where(na == 0, mb, np.where(nb == 0, ma, ma + delta * nb / n))
+        m2 = a["m2"].to_numpy() + b["m2"].to_numpy() + np.where((na > 0) & (nb > 0), delta ** 2 * na * nb / n, 0.0)
+    return pd.DataFrame({"n": n.astype(np.int64), "mean": mean, "m2": m2}, index=idx)
+
+
+@traced("stats")
+@memoize
+def group_codes(groups: pd.Series) -> tuple[np.ndarray, pd.Index]:
     """
-    Classical F-test for equality of variances (assumes normality).
-    Returns two-sided p-value.
+    Group code per row (-1 = missing) and the group labels as sorted strings, as group_moments groups them.
+    Distinct raw values that print the same (e.g. 1 and "1") share a code, as with astype("string").
+    """
+    codes, uniques = pd.factorize(groups, sort=True)
+    remap, labels = pd.factorize(pd.Index(uniques).astype("string"), sort=True)
+    codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1) if len(remap) else codes
+    return codes, pd.Index(labels, dtype="string", name=groups.name)
+
+
+@traced("stats")
+@memoize
+def group_moments(groups: pd.Series, values: pd.Series) -> pd.DataFrame:
+    """
+    Sufficient statistics per group: count n, mean and m2 (sum of squared deviations from the mean).
+    Built in one vectorized pass over factorized (categorical) codes; missing groups/values are dropped.
+    Index: group labels as strings, sorted (see group_codes).
     """
-    x = pd.to_numeric(x, errors="coerce").dropna()
-    y = pd.to_numeric(y, errors="coerce").dropna()
-    if len(x) < 2 or len(y) < 2:
+    codes, uniques = group_codes.uncached(groups)
+    x = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    ok = (codes >= 0) & ~np.isnan(x)
+    k = len(uniques)
+    c, v = codes[ok], x[ok]
+
+    n = np.bincount(c, minlength=k)
+    sums = np.bincount(c, weights=v, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / n
+    m2 = np.bincount(c, weights=(v - mean[c]) ** 2, minlength=k)
+
+    return pd.DataFrame({"n": n.astype(np.int64), "mean": mean, "m2": m2}, index=uniques)
+
+
+@traced("stats")
+def f_test_from_moments(a, b) -> dict:
+    """
+    F-test for equality of variances from group sufficient statistics (n, mean, m2).
+    O(1): no pass over the rows.
+    """
+    n1, n2 = int(a["n"]), int(b["n"])
+    if n1 < 2 or n2 < 2:
         raise ValueError("Need at least 2 observations per group.")
 
-    vx = x.var(ddof=1)
-    vy = y.var(ddof=1)
+    vx = a["m2"] / (n1 - 1)
+    vy = b["m2"] / (n2 - 1)
     if vx == 0 or vy == 0:
         raise ValueError("Variance is zero in one group; F-test not meaningful.")
 
     # F = larger variance / smaller variance for stability
     if vx >= vy:
         f = vx / vy
-        dfn, dfd = len(x) - 1, len(y) - 1
+        dfn, dfd = n1 - 1, n2 - 1
     else:
         f = vy / vx
-        dfn, dfd = len(y) - 1, len(x) - 1
+        dfn, dfd = n2 - 1, n1 - 1
 
     # two-sided p-value
     p_one_tail = 1 - stats.f.cdf(f, dfn, dfd)
@@ -54,8 +136,8 @@ def f_test_variance(x: pd.Series, y: pd.Series) -> dict:
     p_two = max(0.0, min(1.0, float(p_two)))
 
     return {
-        "n1": int(len(x)),
-        "n2": int(len(y)),
+        "n1": n1,
+        "n2": n2,
         "var1": float(vx),
         "var2": float(vy),
         "F": float(f),
@@ -65,28 +147,283 @@ def f_test_variance(x: pd.Series, y: pd.Series) -> dict:
     }
 
 
-def t_test_independent(x: pd.Series, y: pd.Series, equal_var: bool = False) -> dict:
+@traced("stats")
+def t_test_from_moments(a, b, equal_var: bool = False) -> dict:
     """
-    Independent two-sample t-test.
+    Independent two-sample t-test from group sufficient statistics (n, mean, m2).
     equal_var=False uses Welch's t-test (recommended in practice).
     """
-    x = pd.to_numeric(x, errors="coerce").dropna()
-    y = pd.to_numeric(y, errors="coerce").dropna()
-    if len(x) < 2 or len(y) < 2:
+    n1, n2 = int(a["n"]), int(b["n"])
+    if n1 < 2 or n2 < 2:
         raise ValueError("Need at least 2 observations per group.")
 
-    t, p = stats.ttest_ind(x, y, equal_var=equal_var, nan_policy="omit")
+    sd1 = np.sqrt(a["m2"] / (n1 - 1))
+    sd2 = np.sqrt(b["m2"] / (n2 - 1))
+    t, p = stats.ttest_ind_from_stats(a["mean"], sd1, n1, b["mean"], sd2, n2, equal_var=equal_var)
     return {
-        "n1": int(len(x)),
-        "n2": int(len(y)),
-        "mean1": float(x.mean()),
-        "mean2": float(y.mean()),
+        "n1": n1,
+        "n2": n2,
+        "mean1": float(a["mean"]),
+        "mean2": float(b["mean"]),
         "t": float(t),
         "pvalue": float(p),
         "equal_var": bool(equal_var),
     }
 
 
+def _series_moments(s: pd.Series) -> dict:
+    x = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return _moments(x[~np.isnan(x)])
+
+
+@traced("stats")
+@memoize
+def f_test_variance(x: pd.Series, y: pd.Series) -> dict:
+    """
+    Classical F-test for equality of variances (assumes normality).
+    Returns two-sided p-value.
+    """
+    return f_test_from_moments(_series_moments(x), _series_moments(y))
+
+
+@traced("stats")
+@memoize
+def t_test_independent(x: pd.Series, y: pd.Series, equal_var: bool = False) -> dict:
+    """
+    Independent two-sample t-test.
+    equal_var=False uses Welch's t-test (recommended in practice).
+    """
+    return t_test_from_moments(_series_moments(x), _series_moments(y), equal_var=equal_var)
+
+
+@traced("stats")
+def adjust_pvalues(p, method: str = "holm") -> np.ndarray:
+    """
+    Multiple-comparison correction, vectorized. NaNs are ignored (and kept as NaN).
+    method: 'holm' (family-wise error) or 'bh' (Benjamini-Hochberg false discovery rate) or 'none'
+    """
+    p = np.asarray(p, dtype=float)
+    out = np.full_like(p, np.nan)
+    ok = ~np.isnan(p)
+    m = int(ok.sum())
+    if m == 0 or method == "none":
+        out[ok] = p[ok]
+        return out
+
+    order = np.argsort(p[ok])
+    ps = p[ok][order]
+    rank = np.arange(1, m + 1)
+    if method == "holm":
+        adj = np.maximum.accumulate((m - rank + 1) * ps)
+    elif method == "bh":
+        adj = np.minimum.accumulate((ps * m / rank)[::-1])[::-1]
+    else:
+        raise ValueError("method must be 'holm', 'bh' or 'none'")
+
+    res = np.empty(m)
+    res[order] = np.minimum(adj, 1.0)
+    out[ok] = res
+    return out
+
+
+@traced("stats")
+@memoize
+def batch_group_tests(df: pd.DataFrame, group_col: str, value_cols: list[str] | None = None,
+                      correction: str = "holm", max_pairs: int = MAX_BATCH_PAIRS) -> pd.DataFrame:
+    """
+    Welch t, classical t and F tests for every pair of groups x every numeric column at once.
+    Statistics are computed as array operations over the per-group moments (see group_moments);
+    p-values are adjusted across the whole table with `correction` (holm / bh / none).
+    Pairs with fewer than 2 observations or zero variance get NaN.
+    Raises ValueError if the table would exceed max_pairs rows (k groups give k(k-1)/2 pairs per column).
+    """
+    if value_cols is None:
+        value_cols = [c for c in df.select_dtypes(include=[np.number]).columns if c != group_col]
+    k = int(df[group_col].nunique())
+    n_pairs = k * (k - 1) // 2 * len(value_cols)
+    if n_pairs > max_pairs:
+        raise ValueError(f"{k} groups x {len(value_cols)} columns give {n_pairs:,} comparisons "
+                         f"(limit {max_pairs:,}); pick a grouping column with fewer groups")
+
+    frames = []
+    for vcol in value_cols:
+        m = group_moments(df[group_col], df[vcol])
+        if len(m) < 2:
+            continue
+        i, j = np.triu_indices(len(m), k=1)
+        n = m["n"].to_numpy(dtype=float)
+        mean = m["mean"].to_numpy(dtype=float)
+        m2 = m["m2"].to_numpy(dtype=float)
+        frames.append(pd.DataFrame({
+            "value_col": vcol,
+            "group1": m.index.to_numpy()[i],
+            "group2": m.index.to_numpy()[j],
+            "n1": n[i], "n2": n[j],
+            "mean1": mean[i], "mean2": mean[j],
+            "m2_1": m2[i], "m2_2": m2[j],
+        }))
+
+    cols = ["value_col", "group1", "group2", "n1", "n2", "mean1", "mean2", "diff", "var1", "var2",
+            "welch_t", "welch_df", "welch_p", "t", "t_p", "F", "f_p"]
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    out = pd.concat(frames, ignore_index=True)
+
+    n1, n2 = out["n1"].to_numpy(), out["n2"].to_numpy()
+    valid = (n1 >= 2) & (n2 >= 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        v1 = np.where(valid, out["m2_1"].to_numpy() / (n1 - 1), np.nan)
+        v2 = np.where(valid, out["m2_2"].to_numpy() / (n2 - 1), np.nan)
+        diff = out["mean1"].to_numpy() - out["mean2"].to_numpy()
+
+        # Welch
+        a, b = v1 / n1, v2 / n2
+        welch_t = diff / np.sqrt(a + b)
+        welch_df = (a + b) ** 2 / (a ** 2 / (n1 - 1) + b ** 2 / (n2 - 1))
+        welch_p = 2 * stats.t.sf(np.abs(welch_t), welch_df)
+
+        # classical (pooled variance)
+        dfp = n1 + n2 - 2
+        sp2 = (out["m2_1"].to_numpy() + out["m2_2"].to_numpy()) / dfp
+        t = np.where(valid, diff / np.sqrt(sp2 * (1 / n1 + 1 / n2)), np.nan)
+        t_p = 2 * stats.t.sf(np.abs(t), dfp)
+
+        # F = larger variance / smaller variance, two-sided
+        swap = v1 < v2
+        f = np.where(swap, v2 / v1, v1 / v2)
+        f[(v1 == 0) | (v2 == 0)] = np.nan
+        dfn = np.where(swap, n2 - 1, n1 - 1)
+        dfd = np.where(swap, n1 - 1, n2 - 1)
+        f_p = np.clip(2 * np.minimum(stats.f.sf(f, dfn, dfd), stats.f.cdf(f, dfn, dfd)), 0.0, 1.0)
+
+    out = out.assign(diff=diff, var1=v1, var2=v2, welch_t=welch_t, welch_df=welch_df, welch_p=welch_p,
+                     t=t, t_p=t_p, F=f, f_p=f_p)[cols]
+    out = out.astype({"n1": np.int64, "n2": np.int64})
+    for c in ("welch_p", "t_p", "f_p"):
+        out[c + "_adj"] = adjust_pvalues(out[c], correction)
+    return out
+
+
+def _bisect_int(pred, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Smallest j in [lo, hi] with pred(j) true, element-wise (pred monotone; hi = "none found")."""
+    lo, hi = lo.astype(np.int64), hi.astype(np.int64)
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        ok = pred(mid)
+        hi = np.where(ok, mid, hi)
+        lo = np.where(ok | (lo >= hi), lo, mid + 1)
+    return lo
+
+
+def _bisect_p(func, target: np.ndarray, increasing: bool, iters: int = 60) -> np.ndarray:
+    """p in [0, 1] with func(p) = target element-wise (func monotone in p)."""
+    lo, hi = np.zeros_like(target), np.ones_like(target)
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        below = (func(mid) < target) == increasing
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    return (lo + hi) / 2
+
+
+@traced("stats")
+def binomial_pvalues(k, n, p0: float, alternative: str = "two-sided", method: str = "exact") -> np.ndarray:
+    """
+    Binomial test p-values for arrays of (k, n), vectorized over all pairs.
+    method 'exact': two-sided sums outcomes no more likely than k (as scipy.stats.binomtest);
+    'midp': counts half the probability of the observed k (less conservative), two-sided = doubled smaller tail.
+    """
+    k, n = np.asarray(k, dtype=np.int64), np.asarray(n, dtype=np.int64)
+    binom = stats.binom
+    if method not in ("exact", "midp"):
+        raise ValueError("method must be 'exact' or 'midp'")
+    half = 0.5 * binom.pmf(k, n, p0) if method == "midp" else 0.0
+    greater = binom.sf(k - 1, n, p0) - half
+    less = binom.cdf(k, n, p0) - half
+    if alternative == "greater":
+        return np.clip(greater, 0.0, 1.0)
+    if alternative == "less":
+        return np.clip(less, 0.0, 1.0)
+    if alternative != "two-sided":
+        raise ValueError("alternative must be 'two-sided', 'greater' or 'less'")
+    if method == "midp":
+        return np.clip(2 * np.minimum(greater, less), 0.0, 1.0)
+
+    # other tail: outcomes across the mode with pmf <= pmf(k) (pmf is monotone on each side)
+    d = binom.pmf(k, n, p0) * (1 + 1e-7)
+    mode = n * p0
+    below = k < mode
+    j_hi = _bisect_int(lambda j: binom.pmf(j, n, p0) <= d, np.ceil(mode), n + 1)
+    j_lo = _bisect_int(lambda j: binom.pmf(j, n, p0) > d, np.zeros_like(n), np.floor(mode) + 1) - 1
+    p = np.where(below, less + binom.sf(j_hi - 1, n, p0), binom.cdf(j_lo, n, p0) + greater)
+    return np.clip(np.where(k == mode, 1.0, p), 0.0, 1.0)
+
+
+@traced("stats")
+def binomial_ci(k, n, level: float = 0.95, method: str = "exact") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Two-sided confidence interval of the success rate for arrays of (k, n).
+    'exact': Clopper-Pearson; 'midp': mid-p interval (inverts the mid-p tails).
+    """
+    k, n = np.asarray(k, dtype=float), np.asarray(n, dtype=float)
+    a = (1 - level) / 2
+    if method == "exact":
+        with np.errstate(invalid="ignore"):
+            lo = np.where(k > 0, stats.beta.ppf(a, k, n - k + 1), 0.0)
+            hi = np.where(k < n, stats.beta.ppf(1 - a, k + 1, n - k), 1.0)
+        return lo, hi
+    binom = stats.binom
+    target = np.full(np.broadcast(k, n).shape, a)
+    lo = _bisect_p(lambda p: binom.sf(k, n, p) + 0.5 * binom.pmf(k, n, p), target, increasing=True)
+    hi = _bisect_p(lambda p: binom.cdf(k - 1, n, p) + 0.5 * binom.pmf(k, n, p), target, increasing=False)
+    return np.where(k > 0, lo, 0.0), np.where(k < n, hi, 1.0)
+
+
+@traced("stats")
+@memoize
+def batch_binomial_tests(df: pd.DataFrame, group_col: str, success_col: str, p0: float,
+                         success_value=None, alternative: str = "two-sided", method: str = "exact",
+                         ci_level: float = 0.95, correction: str = "holm") -> pd.DataFrame:
+    """
+    Binomial test of the success rate against p0 for every group at once.
+    k and n per group are counted in one pass over factorized group codes; rows with a missing
+    group or success value are dropped. success_value: value counted as a success
+    (default: non-zero / True, for boolean or 0/1 columns).
+    Columns: group, n, k, rate, ci_low, ci_high, pvalue, pvalue_adj (sorted by pvalue).
+    """
+    if not (0 <= p0 <= 1):
+        raise ValueError("p0 must be in [0, 1]")
+    s = df[success_col]
+    if success_value is not None:
+        success = (s.astype("string") == str(success_value)).to_numpy(dtype=bool, na_value=False)
+    elif pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+        success = (pd.to_numeric(s, errors="coerce").fillna(0) != 0).to_numpy(dtype=bool)
+    else:
+        raise ValueError("success_value is required for a non-numeric success column")
+
+    codes, uniques = pd.factorize(df[group_col], sort=True)
+    ok = (codes >= 0) & s.notna().to_numpy()
+    n = np.bincount(codes[ok], minlength=len(uniques))
+    k = np.bincount(codes[ok], weights=success[ok], minlength=len(uniques)).astype(np.int64)
+    has = n > 0
+    n, k = n[has], k[has]
+
+    lo, hi = binomial_ci(k, n, ci_level, method)
+    p = binomial_pvalues(k, n, p0, alternative, method)
+    out = pd.DataFrame({
+        "group": pd.Index(uniques).astype("string")[has],
+        "n": n.astype(np.int64),
+        "k": k,
+        "rate": k / np.maximum(n, 1),
+        "ci_low": lo,
+        "ci_high": hi,
+        "pvalue": p,
+        "pvalue_adj": adjust_pvalues(p, correction),
+    })
+    return out.sort_values("pvalue", kind="stable", ignore_index=True)
+
+
+@traced("stats")
+@memoize
 def correlation(x: pd.Series, y: pd.Series, method: str = "pearson") -> dict:
     """
     method: pearson or spearman
@@ -110,15 +447,245 @@ def correlation(x: pd.Series, y: pd.Series, method: str = "pearson") -> dict:
     }
 
 
-def chi_square_independence(df: pd.DataFrame, row_col: str, col_col: str) -> dict:
+def _correlation_pvalues(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dof = n - 2
+        t = r * np.sqrt(dof / np.clip(1 - r ** 2, 1e-300, None))
+        p = 2 * stats.t.sf(np.abs(t), dof)
+    p[n < 3] = np.nan
+    return np.clip(p, 0.0, 1.0)
+
+
+def _numeric_block(block: pd.DataFrame) -> np.ndarray:
+    """Rows x columns float array of a frame slice, non-numeric values as NaN."""
+    out = np.empty((len(block), block.shape[1]))
+    for j in range(block.shape[1]):
+        out[:, j] = pd.to_numeric(block.iloc[:, j], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return out
+
+
+@traced("stats")
+@memoize
+def correlation_matrix(df: pd.DataFrame, cols: list[str] | None = None, method: str = "pearson",
+                       block_rows: int = 262_144) -> dict:
+    """
+    Pearson / Spearman correlation and p-value matrices over many numeric columns.
+    Computed as matrix products accumulated over row blocks, each coerced to numeric on its own
+    (memory ~ block_rows x columns for Pearson; Spearman first ranks a float copy of the columns).
+    Missing data is handled pairwise (each pair uses rows where both values are present).
+    Spearman ranks each column once over its own non-missing values; with missing data this
+    differs slightly from ranking each pair separately.
+    Returns {"r", "pvalue", "n"} as DataFrames indexed by column.
+    """
+    if cols is None:
+        cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    cols = list(cols)
+    if len(cols) < 2:
+        raise ValueError("Need at least 2 numeric columns.")
+
+    data = df[cols]
+    if method == "spearman":
+        # ranks need whole columns: the one full (float) copy of the selected columns
+        data = data.apply(pd.to_numeric, errors="coerce").rank(method="average")
+
+    k = len(cols)
+    n = np.zeros((k, k))
+    sx = np.zeros((k, k))
+    sxx = np.zeros((k, k))
+    sxy = np.zeros((k, k))
+    any_missing = False
+    center = None
+    for start in range(0, len(data), block_rows):
+        x = _numeric_block(data.iloc[start:start + block_rows])
+        if center is None:
+            # centering by the first block's means keeps the accumulated moments well conditioned
+            present = (~np.isnan(x)).sum(axis=0)
+            center = np.divide(np.nansum(x, axis=0), present, out=np.zeros(k), where=present > 0)
+        x -= center
+        miss = np.isnan(x)
+        if miss.any():
+            any_missing = True
+            m = (~miss).astype(float)
+            x = np.where(miss, 0.0, x)
+            n += m.T @ m
+            sx += x.T @ m       # sum of x_i over rows where x_j is present
+            sxx += (x * x).T @ m
+        else:
+            n += len(x)
+            col_sum = x.sum(axis=0)
+            sx += col_sum[:, None]
+            sxx += (x * x).sum(axis=0)[:, None]
+        sxy += x.T @ x
+
+    # sy / syy are the transposes of sx / sxx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sx.T
+        var_x = n * sxx - sx ** 2
+        r = cov / np.sqrt(var_x * var_x.T)
+    r = np.clip(r, -1.0, 1.0)
+    np.fill_diagonal(r, np.where(np.diag(var_x) > 0, 1.0, np.nan))
+
+    p = _correlation_pvalues(r, n)
+    np.fill_diagonal(p, 0.0)
+    idx = pd.Index(cols)
+    return {
+        "r": pd.DataFrame(r, index=idx, columns=idx),
+        "pvalue": pd.DataFrame(p, index=idx, columns=idx),
+        "n": pd.DataFrame(n.astype(np.int64), index=idx, columns=idx),
+        "method": method,
+        "pairwise_missing": any_missing,
+    }
+
+
+# above this many cells contingency tables are kept sparse (only observed pairs are stored)
+MAX_DENSE_CELLS = 10_000_000
+
+
+def _table_from_codes(ca: np.ndarray, cb: np.ndarray, max_dense_cells: int = MAX_DENSE_CELLS):
+    """bincount table from two code arrays (-1 = missing); returns (table, kept row codes, kept col codes)."""
+    ok = (ca >= 0) & (cb >= 0)
+    ca, cb = ca[ok], cb[ok]
+
+    def compact(codes):
+        # keep only levels that occur in complete pairs (as pd.crosstab does): presence by bincount, no sort
+        present = np.bincount(codes, minlength=1) > 0
+        kept = np.flatnonzero(present)
+        remap = np.cumsum(present) - 1
+        return kept, remap[codes]
+
+    ra, ca = compact(ca)
+    rb, cb = compact(cb)
+    shape = (len(ra), len(rb))
+    if shape[0] * shape[1] <= max_dense_cells:
+        table = np.bincount(ca * shape[1] + cb, minlength=shape[0] * shape[1]).reshape(shape)
+    else:
+        from scipy import sparse
+        table = sparse.csr_matrix((np.ones(len(ca), dtype=np.int64), (ca, cb)), shape=shape)
+        table.sum_duplicates()
+    return table, ra, rb
+
+
+@traced("stats")
+def contingency_table(a: pd.Series, b: pd.Series, max_dense_cells: int = MAX_DENSE_CELLS):
+    """
+    Contingency table of two categorical columns built from factorized codes with bincount.
+    Returns (table, row_labels, col_labels); table is a dense ndarray, or a scipy.sparse CSR
+    matrix when the number of cells exceeds max_dense_cells.
+    """
+    ca, la = pd.factorize(a, sort=True)
+    cb, lb = pd.factorize(b, sort=True)
+    table, ra, rb = _table_from_codes(ca, cb, max_dense_cells)
+    return table, la[ra], lb[rb]
+
+
+def _chi2_statistic(table) -> tuple[float, int, int]:
+    """Pearson chi-square (no continuity correction) from a dense or sparse table -> (chi2, dof, N)."""
+    total = int(table.sum())
+    rows = np.asarray(table.sum(axis=1)).ravel().astype(float)
+    cols = np.asarray(table.sum(axis=0)).ravel().astype(float)
+    if hasattr(table, "tocoo"):
+        coo = table.tocoo()
+        obs, r, c = coo.data.astype(float), coo.row, coo.col
+    else:
+        r, c = np.nonzero(table)
+        obs = table[r, c].astype(float)
+    # sum (O - E)^2 / E == sum O^2 / E - N, and only observed (non-zero) cells contribute to the first term
+    chi2 = float((obs ** 2 / (rows[r] * cols[c] / total)).sum() - total)
+    dof = (len(rows) - 1) * (len(cols) - 1)
+    return max(chi2, 0.0), dof, total
+
+
+def _cramers_v(chi2: float, n: int, shape: tuple[int, int]) -> float:
+    k = min(shape) - 1
+    return float(np.sqrt(chi2 / (n * k))) if n > 0 and k > 0 else np.nan
+
+
+@traced("stats")
+@memoize
+def association_matrix(df: pd.DataFrame, cols: list[str] | None = None, max_levels: int = 1000) -> dict:
+    """
+    Chi-square / Cramer's V for every pair of categorical columns.
+    Each column is factorized once; each pair is one bincount over the codes.
+    Default columns: non-numeric columns with at most max_levels distinct values.
+    p-values are uncorrected (no Yates correction, no multiple-comparison adjustment).
+    Returns {"cramers_v", "pvalue", "chi2"} as DataFrames indexed by column.
+    """
+    if cols is None:
+        num = set(df.select_dtypes(include=[np.number]).columns)
+        cols = [c for c in df.columns if c not in num and df[c].nunique(dropna=True) <= max_levels]
+    cols = list(cols)
+    if len(cols) < 2:
+        raise ValueError("Need at least 2 categorical columns.")
+
+    codes = {c: pd.factorize(df[c])[0] for c in cols}
+    k = len(cols)
+    v = np.eye(k)
+    p = np.zeros((k, k))
+    chi = np.zeros((k, k))
+    for i in range(k):
+        for j in range(i + 1, k):
+            table, _, _ = _table_from_codes(codes[cols[i]], codes[cols[j]])
+            if min(table.shape) < 2:
+                v[i, j] = v[j, i] = p[i, j] = p[j, i] = chi[i, j] = chi[j, i] = np.nan
+                continue
+            c2, dof, n = _chi2_statistic(table)
+            v[i, j] = v[j, i] = _cramers_v(c2, n, table.shape)
+            p[i, j] = p[j, i] = stats.chi2.sf(c2, dof)
+            chi[i, j] = chi[j, i] = c2
+
+    idx = pd.Index(cols)
+    return {
+        "cramers_v": pd.DataFrame(v, index=idx, columns=idx),
+        "pvalue": pd.DataFrame(p, index=idx, columns=idx),
+        "chi2": pd.DataFrame(chi, index=idx, columns=idx),
+    }
+
+
+@traced("stats")
+@memoize
+def chi_square_independence(df: pd.DataFrame, row_col: str, col_col: str,
+                            max_dense_cells: int = MAX_DENSE_CELLS) -> dict:
+    """
+    Chi-square test of independence using contingency table (Yates' continuity correction on
+    2x2 tables, as scipy's chi2_contingency).
+    The table is built from factorized codes; above max_dense_cells it stays sparse and
+    "table"/"expected" are None (statistics are computed from the observed cells only).
+    """
+    table, la, lb = contingency_table(df[row_col], df[col_col], max_dense_cells=max_dense_cells)
+    if table.shape[0] < 2 or table.shape[1] < 2:
+        raise ValueError("Contingency table must be at least 2x2.")
+    if table.shape == (2, 2) and hasattr(table, "tocoo"):
+        # corrected like the dense path (Yates applies to 2x2 only, and such a table is tiny)
+        table = table.toarray()
+
+    if hasattr(table, "tocoo"):
+        chi2, dof, n = _chi2_statistic(table)
+        return {
+            "table": None,
+            "expected": None,
+            "chi2": chi2,
+            "pvalue": float(stats.chi2.sf(chi2, dof)),
+            "dof": int(dof),
+            "cramers_v": _cramers_v(chi2, n, table.shape),
+            "shape": table.shape,
+        }
+
+    ct = pd.DataFrame(table, index=pd.Index(la, name=row_col), columns=pd.Index(lb, name=col_col))
+    return chi_square_from_table(ct)
+
+
+@traced("stats")
+def chi_square_from_table(ct: pd.DataFrame) -> dict:
     """
-    Chi-square test of independence using contingency table.
+    Chi-square test of independence from an observed contingency table (counts).
+    2x2 tables get Yates' continuity correction (chi2 / pvalue); Cramér's V uses the uncorrected
+    statistic, as association_matrix does.
     """
-    ct = pd.crosstab(df[row_col], df[col_col])
     if ct.shape[0] < 2 or ct.shape[1] < 2:
         raise ValueError("Contingency table must be at least 2x2.")
 
-    chi2, p, dof, expected = stats.chi2_contingency(ct.values)
+    table = ct.to_numpy()
+    chi2, p, dof, expected = stats.chi2_contingency(table)
     expected_df = pd.DataFrame(expected, index=ct.index, columns=ct.columns)
 
     return {
@@ -127,4 +694,6 @@ def chi_square_independence(df: pd.DataFrame, row_col: str, col_col: str) -> dic
         "chi2": float(chi2),
         "pvalue": float(p),
         "dof": int(dof),
+        "cramers_v": _cramers_v(_chi2_statistic(table)[0], int(table.sum()), table.shape),
+        "shape": table.shape,
     }
@@ -0,0 +1,358 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# session_state key holding the dataset handle (content hash), not the data itself
+SESSION_KEY = "dataset"
+# session_state key holding a message for the user when the session's dataset was lost
+NOTICE_KEY = "dataset_notice"
+
+DEFAULT_ROOT = os.environ.get("STATS_DASHBOARD_STORE", os.path.join(tempfile.gettempdir(), "stats_dashboard_store"))
+DEFAULT_MEMORY_MB = int(os.environ.get("STATS_DASHBOARD_MEMORY_MB", "2048"))
+# disk budget of the store; least recently used datasets are deleted beyond it
+DEFAULT_DISK_MB = int(os.environ.get("STATS_DASHBOARD_STORE_MB", "20480"))
+
+
+def bytes_key(file_bytes: bytes, **read_options) -> str:
+    """Content hash of an upload plus the options used to parse it."""
+    h = hashlib.blake2b(file_bytes, digest_size=16)
+    h.update(repr(sorted(read_options.items())).encode())
+    return h.hexdigest()
+
+
+def frame_key(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (column names, dtypes and values; index ignored)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def column_key(s: pd.Series) -> str:
+    """Content hash of a single column (dtype and values; name and index ignored)."""
+    h = hashlib.blake2b(str(s.dtype).encode(), digest_size=16)
+    h.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _arrow_or_category(t: pa.DataType):
+    # dictionary columns come back as pandas categoricals, everything else stays Arrow (zero-copy)
+    return None if pa.types.is_dictionary(t) else pd.ArrowDtype(t)
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """DataFrame -> Arrow table (index dropped); mixed-type object columns are stored as strings."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # e.g. datetimes filled with "Unknown"
+        out = df.copy()
+        for c in out.columns:
+            if out[c].dtype == object:
+                try:
+                    pa.array(out[c], from_pandas=True)
+                except (pa.ArrowTypeError, pa.ArrowInvalid):
+                    out[c] = out[c].astype("string")
+        return pa.Table.from_pandas(out, preserve_index=False)
+
+
+class DatasetStore:
+    """
+    Content-addressed dataset store.
+    Each dataset is written once as an uncompressed Arrow IPC (Feather v2) file and
+    memory-mapped on read, so every session asking for the same key shares one zero-copy view.
+    Mapped datasets are kept in an LRU bounded by memory_budget bytes. On disk, datasets not read or
+    written recently are deleted once the store exceeds disk_budget bytes (see cleanup).
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, memory_budget: int = DEFAULT_MEMORY_MB * 1024 * 1024,
+                 disk_budget: int = DEFAULT_DISK_MB * 1024 * 1024):
+        self.root = root
+        self.memory_budget = int(memory_budget)
+        self.disk_budget = int(disk_budget)
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mapped: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        # objects whose held_keys() cleanup must not delete (histories, live datasets); weak, so a
+        # closed session releases its datasets when its state is collected
+        self._holders: weakref.WeakSet = weakref.WeakSet()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.arrow")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._mapped or os.path.exists(self.path(key)) or os.path.exists(self._manifest_path(key))
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _write_atomic(self, path: str, write) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def put(self, df: pd.DataFrame, key: str | None = None) -> str:
+        """Write df under key (content hash by default) unless it already exists; return the key."""
+        key = key or frame_key(df)
+        path = self.path(key)
+        if not os.path.exists(path):
+            table = to_arrow_table(df)
+            self._write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression="uncompressed"))
+            self.cleanup(keep={key})
+        else:
+            self._touch(key)
+        return key
+
+    def put_columns(self, df: pd.DataFrame, reuse: dict[str, str] | None = None, key: str | None = None) -> str:
+        """
+        Write df as a manifest of per-column files (each column stored once by content).
+        reuse maps column name -> column key for columns known to be unchanged, which skips hashing them.
+        key: manifest key (hash of the column keys by default), e.g. the bytes_key of an upload.
+        """
+        reuse = reuse or {}
+        entries = []
+        for c in df.columns:
+            ckey = reuse.get(c)
+            if ckey is None or not os.path.exists(self.path(f"col-{ckey}")):
+                ckey = column_key(df[c])
+                cpath = self.path(f"col-{ckey}")
+                if not os.path.exists(cpath):
+                    table = to_arrow_table(df[[c]].rename(columns={c: "v"}))
+                    self._write_atomic(cpath, lambda tmp: feather.write_feather(table, tmp, compression="uncompressed"))
+            entries.append([c, ckey])
+
+        key = key or hashlib.blake2b(json.dumps(entries).encode(), digest_size=16).hexdigest()
+        mpath = self._manifest_path(key)
+        if not os.path.exists(mpath):
+            def write(tmp):
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"columns": entries}, f)
+
+            self._write_atomic(mpath, write)
+            self.cleanup(keep={key})
+        else:
+            self._touch(key)
+        return key
+
+    def put_parts(self, parts: list[str]) -> str:
+        """
+        Write a manifest of row parts (dataset keys, concatenated in order) and return its key.
+        Appending a part writes only that part; the parts already stored are shared.
+        """
+        key = hashlib.blake2b(json.dumps(["parts", parts]).encode(), digest_size=16).hexdigest()
+        mpath = self._manifest_path(key)
+        if not os.path.exists(mpath):
+            def write(tmp):
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"parts": parts}, f)
+
+            self._write_atomic(mpath, write)
+            self.cleanup(keep={key})
+        else:
+            self._touch(key)
+        return key
+
+    def _manifest(self, key: str) -> dict | None:
+        mpath = self._manifest_path(key)
+        if not os.path.exists(mpath):
+            return None
+        with open(mpath, encoding="utf-8") as f:
+            return json.load(f)
+
+    def columns_of(self, key: str) -> dict[str, str] | None:
+        """Column name -> column key for manifest datasets (None for single-file and row-part datasets)."""
+        manifest = self._manifest(key)
+        if manifest is None or "columns" not in manifest:
+            return None
+        return dict(manifest["columns"])
+
+    def _map(self, path: str) -> pa.Table:
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _table(self, key: str) -> pa.Table:
+        path = self.path(key)
+        if os.path.exists(path):
+            return self._map(path)
+        manifest = self._manifest(key)
+        if manifest is None:
+            raise KeyError(f"Dataset not found in store: {key}")
+        if "parts" in manifest:
+            # int64 + double -> double, all-null columns take the other parts' type
+            return pa.concat_tables([self._table(k) for k in manifest["parts"]], promote_options="permissive")
+        return pa.table({c: self._map(self.path(f"col-{ckey}")).column(0) for c, ckey in manifest["columns"]})
+
+    def get(self, key: str) -> pd.DataFrame:
+        self._touch(key)
+        with self._lock:
+            if key in self._mapped:
+                self._mapped.move_to_end(key)
+                return self._mapped[key][0]
+
+        table = self._table(key)
+        df = table.to_pandas(types_mapper=_arrow_or_category)
+
+        with self._lock:
+            self._mapped[key] = (df, table.nbytes)
+            self._mapped.move_to_end(key)
+            self._evict()
+        return df
+
+    def _evict(self) -> None:
+        used = sum(n for _, n in self._mapped.values())
+        # always keep the most recently used dataset, even if it alone exceeds the budget
+        while used > self.memory_budget and len(self._mapped) > 1:
+            _, (_, n) = self._mapped.popitem(last=False)
+            used -= n
+
+    def hold(self, holder) -> None:
+        """Protect holder.held_keys() from cleanup for as long as holder is alive."""
+        with self._lock:
+            self._holders.add(holder)
+
+    def held_keys(self) -> set[str]:
+        with self._lock:
+            holders = list(self._holders)
+        return {k for h in holders for k in h.held_keys() if k is not None}
+
+    def _touch(self, key: str) -> None:
+        # the modification time of a dataset's file or manifest is its last use (cleanup order)
+        for path in (self.path(key), self._manifest_path(key)):
+            try:
+                os.utime(path)
+                return
+            except FileNotFoundError:
+                continue
+
+    def _scan(self) -> tuple[dict, set, dict]:
+        """({key: (mtime, bytes)} of datasets, keys of manifests, {column file key: bytes})."""
+        datasets, manifests, columns = {}, set(), {}
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if ext == ".arrow" and stem.startswith("col-"):
+                    columns[stem] = st.st_size
+                elif ext == ".arrow":
+                    datasets[stem] = (st.st_mtime, st.st_size)
+                elif ext == ".json":
+                    datasets[stem] = (st.st_mtime, st.st_size)
+                    manifests.add(stem)
+        return datasets, manifests, columns
+
+    def cleanup(self, budget: int | None = None, keep=()) -> list[str]:
+        """
+        Delete least recently used datasets until the store fits in budget bytes (disk_budget by default).
+        Datasets in keep, held ones (see hold), mapped ones and parts of kept row-part manifests stay;
+        column files go with the last manifest that uses them. Returns the deleted dataset keys.
+        """
+        budget = self.disk_budget if budget is None else budget
+        keep = set(keep) | self.held_keys()
+        with self._lock:
+            keep |= set(self._mapped)
+        datasets, manifests, columns = self._scan()
+        used = sum(size for _, size in datasets.values()) + sum(columns.values())
+        if used <= budget:
+            return []
+
+        refs = {}
+        for key in manifests:
+            manifest = self._manifest(key) or {}
+            refs[key] = (list(manifest["parts"]) if "parts" in manifest
+                         else [f"col-{k}" for _, k in manifest.get("columns", [])])
+        users: dict[str, int] = {}
+        for targets in refs.values():
+            for t in targets:
+                users[t] = users.get(t, 0) + 1
+        deleted = []
+        progress = True
+        # a row-part manifest going frees its parts, which may be older than it: scan again
+        while used > budget and progress:
+            progress = False
+            for key in sorted(datasets, key=lambda k: datasets[k][0]):
+                if used <= budget:
+                    break
+                if key in keep or users.get(key):
+                    continue
+                path = self._manifest_path(key) if key in refs else self.path(key)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                used -= datasets.pop(key)[1]
+                deleted.append(key)
+                progress = True
+                for t in refs.pop(key, []):
+                    users[t] -= 1
+                    if not users[t] and t in columns:
+                        try:
+                            os.remove(self.path(t))
+                        except FileNotFoundError:
+                            pass
+                        used -= columns.pop(t)
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mapped": len(self._mapped),
+                "mapped_bytes": int(sum(n for _, n in self._mapped.values())),
+                "memory_budget": self.memory_budget,
+            }
+
+
+_default_store: DatasetStore | None = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> DatasetStore:
+    """Process-wide store shared by all sessions."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = DatasetStore()
+        return _default_store
+
+
+def session_df(state) -> pd.DataFrame | None:
+    """
+    Resolve the session's dataset handle to a (shared, memory-mapped) DataFrame.
+    If the dataset is gone from the store, the session is reset (no dataset, no history) and
+    state[NOTICE_KEY] says why.
+    """
+    key = state.get(SESSION_KEY)
+    if key is None:
+        return None
+    try:
+        return get_store().get(key)
+    except KeyError:
+        state.pop(SESSION_KEY, None)
+        state.pop("history", None)  # src.history.HISTORY_KEY (history imports this module)
+        state[NOTICE_KEY] = "The dataset of this session is no longer in the store. Upload it again (01 Data Upload)."
+        return None
+
+
+def set_session_df(state, df: pd.DataFrame, key: str | None = None) -> str:
+    """Store df (deduplicated by content) and point the session at it."""
+    key = get_store().put(df, key)
+    state[SESSION_KEY] = key
+    return key
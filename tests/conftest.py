@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# keep test datasets out of the shared store
+os.environ.setdefault("STATS_DASHBOARD_STORE", tempfile.mkdtemp(prefix="stats_dashboard_test_store_"))
+
+import src  # noqa: E402
+
+# src.stats_tests and src.viz live in nested directories of the namespace package
+# (a plain list: a namespace package's own path is recomputed and would drop them)
+src.__path__ = [str(ROOT / "src"), str(ROOT / "src/src"), str(ROOT / "src/src/src")]
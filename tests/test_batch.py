@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.batch import expand_inputs, main, run_batch, unique_paths
+
+SPEC = {
+    "inputs": ["*.csv"],
+    "cleaning": [
+        {"step": "coerce_numeric", "cols": ["amount"]},
+        {"step": "fill_missing", "numeric_strategy": "median"},
+        {"step": "drop_duplicates"},
+    ],
+    "tests": [
+        {"test": "t_test", "group_col": "variant", "value_col": "amount", "group1": "A", "group2": "B", "name": "ab"},
+        {"test": "t_test", "group_col": "variant", "value_col": "missing"},
+    ],
+}
+
+
+def _inputs(tmp_path):
+    (tmp_path / "a.csv").write_text("variant,amount\nA,1\nA,2\nB,3\nB,5\nA,2\n")
+    (tmp_path / "b.csv").write_text("variant,amount\nA,4\nB,\nB,7\nA,1\nB,9\n")
+    (tmp_path / "bad.csv").write_text("")
+    (tmp_path / "spec.json").write_text(json.dumps(SPEC))
+    return [str(tmp_path / n) for n in ("a.csv", "b.csv", "bad.csv")]
+
+
+def _read_results(out):
+    with open(out / "results.jsonl", encoding="utf-8") as f:
+        return {os.path.basename(r["file"]): r for r in map(json.loads, f)}
+
+
+def test_batch_reports_bad_file_without_aborting(tmp_path):
+    _inputs(tmp_path)
+    out = tmp_path / "out"
+    assert main([str(tmp_path / "spec.json"), "--out", str(out), "--workers", "1"]) == 1
+
+    results = _read_results(out)
+    assert set(results) == {"a.csv", "b.csv", "bad.csv"}
+    bad = results["bad.csv"]
+    assert bad["status"] == "error" and bad["error"].startswith("EmptyDataError")
+
+    a, b = results["a.csv"], results["b.csv"]
+    assert a["status"] == b["status"] == "ok"
+    assert (a["rows_in"], a["rows_out"]) == (5, 4)
+    assert [r["step"] for r in a["cleaning"]] == ["coerce_numeric", "fill_missing", "drop_duplicates"]
+    assert a["cleaning"][2]["removed"] == 1
+    assert b["cleaning"][1]["numeric_filled"] == 1 and b["cleaning"][1]["filled_columns"] == ["amount"]
+    # the blank B amount is filled with the column median (5.5) before testing
+    ref = stats.ttest_ind([4, 1], [5.5, 7, 9], equal_var=False)
+    res = b["tests"]["ab"]["result"]
+    assert b["tests"]["ab"]["status"] == "ok" and (res["n1"], res["n2"]) == (2, 3)
+    assert res["t"] == pytest.approx(ref.statistic) and res["pvalue"] == pytest.approx(ref.pvalue)
+    # a failing test is reported per test, the file still counts as ok
+    assert b["tests"]["t_test_1"]["status"] == "error" and "missing" in b["tests"]["t_test_1"]["error"]
+
+    timings = pd.read_csv(out / "timings.csv")
+    assert [os.path.basename(f) for f in timings["file"]] == ["a.csv", "b.csv", "bad.csv"]
+    assert list(timings["status"]) == ["ok", "ok", "error"]
+    assert list(timings.columns[-1:]) == ["total"] and {"read", "clean", "test:ab"} <= set(timings.columns)
+    assert timings["rows_out"].tolist()[:2] == [4, 5] and pd.isna(timings["rows_out"][2])
+    assert timings["total"].notna().all()
+
+
+def test_batch_pool_matches_serial_and_clean_run_exits_zero(tmp_path):
+    files = _inputs(tmp_path)[:2]
+    serial = run_batch(files, SPEC, str(tmp_path / "serial"), workers=1)
+    pooled = run_batch(files, SPEC, str(tmp_path / "pooled"), workers=2)
+    strip = lambda rs: [{k: v for k, v in r.items() if k != "timings"} for r in rs]
+    assert strip(pooled) == strip(serial)
+    assert main([str(tmp_path / "spec.json"), *files, "--out", str(tmp_path / "out"), "--workers", "1"]) == 1
+    (tmp_path / "bad.csv").unlink()
+    assert main([str(tmp_path / "spec.json"), "--out", str(tmp_path / "out"), "--workers", "1"]) == 0
+
+
+def test_chunked_batch_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 1500
+    df = pd.DataFrame({"variant": rng.choice(["A", "B", "C"], n), "amount": rng.normal(10, 3, n).round(3)})
+    df.loc[rng.random(n) < 0.05, "amount"] = np.nan
+    df.loc[[5, 6], "amount"] = [1000.0, -1000.0]
+    pd.concat([df, df.iloc[:200]]).to_csv(tmp_path / "big.csv", index=False)
+    spec = {"cleaning": [*SPEC["cleaning"], {"step": "iqr_filter", "col": "amount"}],
+            "tests": [SPEC["tests"][0], {"test": "batch_group_tests", "group_col": "variant", "name": "pairs"}]}
+
+    (expected,) = run_batch([str(tmp_path / "big.csv")], spec, str(tmp_path / "mem"), workers=1)
+    (got,) = run_batch([str(tmp_path / "big.csv")], {**spec, "chunked": True, "chunk_rows": 400},
+                       str(tmp_path / "chunked"), workers=1)
+    assert got["status"] == expected["status"] == "ok"
+    assert (got["rows_in"], got["rows_out"]) == (expected["rows_in"], expected["rows_out"]) == (1700, 1384)
+    assert "read+clean" in got["timings"] and "read" not in got["timings"]
+    for g, e in zip(got["cleaning"], expected["cleaning"]):
+        # the chunked records add sketch details; the counts they share must agree
+        shared = [k for k in g.keys() & e.keys() if not isinstance(e[k], float)]
+        assert g["step"] == e["step"] and {k: g[k] for k in shared} == {k: e[k] for k in shared}
+    for name in ("ab", "pairs"):
+        assert got["tests"][name]["status"] == "ok"
+        pd.testing.assert_frame_equal(pd.json_normalize(got["tests"][name]["result"]),
+                                      pd.json_normalize(expected["tests"][name]["result"]), rtol=1e-9)
+
+
+def test_inputs_deduplicated_by_resolved_path(tmp_path, monkeypatch):
+    for name in ("a.csv", "b.csv"):
+        (tmp_path / name).write_text("x\n1\n")
+    os.symlink(tmp_path / "a.csv", tmp_path / "link.txt")
+    monkeypatch.chdir(tmp_path)
+
+    files = expand_inputs(["*.csv", "a.csv", "./b.csv"], str(tmp_path))
+    assert files == [str(tmp_path / "a.csv"), str(tmp_path / "b.csv")]
+    # explicit command-line files on top of the spec's glob, relative or via a link
+    assert unique_paths(files + ["a.csv", "link.txt", "sub/../b.csv"]) == files
@@ -0,0 +1,76 @@
+import json
+import sys
+
+from src import bench
+from src.bench import MIN_MEMORY_DELTA, cases, compare, main, run_suite
+
+
+def test_suite_smoke_tiny_rows(monkeypatch):
+    calls = []
+    monkeypatch.setattr(bench, "warm_up", lambda: calls.append("warm_up"))
+    measure = bench.measure
+    monkeypatch.setattr(bench, "measure", lambda fn, repeat: calls.append("measure") or measure(fn, repeat))
+    # 300 rows take the on-disk chunked path
+    monkeypatch.setattr(bench, "IN_MEMORY_MAX_ROWS", 250)
+
+    res = run_suite([200, 300], repeat=1, cardinality=5, missing_rate=0.05)
+    assert calls[0] == "warm_up" and calls.count("warm_up") == 1
+    in_memory = [f"{name}[rows=200]" for name in cases({"csv": b"", "df": None, "compact": None})]
+    assert list(res) == in_memory + ["flow:chunked_clean_test[rows=300]"]
+    for r in res.values():
+        assert r["seconds"] > 0 and r["peak_bytes"] > 0
+    assert list(run_suite([200], only="stats:chi", repeat=1)) == ["stats:chi_square_independence[rows=200]"]
+
+
+def test_warm_up_imports_heavy_modules(monkeypatch):
+    monkeypatch.delitem(sys.modules, "json.tool", raising=False)
+    bench.warm_up(("json.tool",))
+    assert "json.tool" in sys.modules
+
+
+def test_compare_flags_only_regressions_beyond_tolerance_and_noise():
+    mb = 2**20
+    baseline = {
+        "slow": {"seconds": 1.0, "peak_bytes": 100 * mb},
+        "noise": {"seconds": 0.01, "peak_bytes": mb},
+        "ok": {"seconds": 1.0, "peak_bytes": 100 * mb},
+        "fat": {"seconds": 1.0, "peak_bytes": 100 * mb},
+    }
+    results = {
+        "slow": {"seconds": 1.3, "peak_bytes": 100 * mb},
+        # 3x slower and larger, but below MIN_TIME_DELTA / MIN_MEMORY_DELTA
+        "noise": {"seconds": 0.03, "peak_bytes": mb + MIN_MEMORY_DELTA - 1},
+        "ok": {"seconds": 1.2, "peak_bytes": 109 * mb},
+        "fat": {"seconds": 0.5, "peak_bytes": 120 * mb},
+        "new": {"seconds": 9.0, "peak_bytes": 900 * mb},
+    }
+    out = compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.10)
+    assert len(out) == 2
+    assert out[0].startswith("slow: time 1.000s -> 1.300s (+30%)")
+    assert out[1].startswith("fat: peak memory 100.0 MB -> 120.0 MB (+20%)")
+    assert compare(results, baseline, time_tolerance=0.5, memory_tolerance=0.5) == []
+
+
+def test_main_baseline_round_trip(tmp_path, capsys, monkeypatch):
+    path = tmp_path / "baseline.json"
+    args = ["--rows", "200", "--filter", "stats:group_moments", "--repeat", "1", "--baseline", str(path)]
+    assert main(args + ["--save-baseline"]) == 0
+    baseline = json.loads(path.read_text())
+    assert list(baseline) == ["stats:group_moments[rows=200]"]
+    assert main(args) == 0
+    assert "No regressions" in capsys.readouterr().out
+
+    # a slower, larger run of the same case fails the comparison
+    key = "stats:group_moments[rows=200]"
+    slower = {key: {"seconds": baseline[key]["seconds"] + 1.0, "peak_bytes": baseline[key]["peak_bytes"] * 2 + 2**21}}
+    monkeypatch.setattr(bench, "run_suite", lambda *a, **k: slower)
+    assert main(args) == 1
+    assert "PERFORMANCE REGRESSION (2)" in capsys.readouterr().err
+
+
+def test_make_csv_round_trips(tmp_path):
+    rows = 50
+    df = bench.make_dataset(rows, cardinality=3, missing_rate=0.1)
+    assert len(df) == rows and {"date", "seg_0", "seg_1", "x_0", "flag"} <= set(df.columns)
+    path = bench.make_csv(rows, str(tmp_path / "x.csv"), encoding="cp932")
+    assert open(path, "rb").read().decode("cp932").splitlines()[0].startswith("date,seg_0")
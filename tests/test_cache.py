@@ -0,0 +1,58 @@
+import gc
+
+import numpy as np
+import pandas as pd
+
+from src.cache import ResultCache, fingerprint, memoize, series_fingerprint
+
+
+def test_fingerprint_differs_for_unsampled_change_after_free():
+    keys = []
+    for _ in range(2):
+        s = pd.Series(np.random.default_rng(0).normal(size=100_000))
+        if keys:
+            s.iloc[1] = 1e6
+        keys.append(series_fingerprint(s))
+        del s
+        gc.collect()
+    assert keys[0] != keys[1]
+
+
+def test_fingerprint_arrow_column_stable_and_content_based():
+    a = pd.Series(np.arange(10_000), dtype="int64[pyarrow]")
+    b = pd.Series(np.arange(10_000), dtype="int64[pyarrow]")
+    c = pd.Series(np.r_[np.arange(9_999), -1], dtype="int64[pyarrow]")
+    assert series_fingerprint(a) == series_fingerprint(a) == series_fingerprint(b)
+    assert series_fingerprint(a) != series_fingerprint(c)
+    assert fingerprint(pd.DataFrame({"x": a})) != fingerprint(pd.DataFrame({"x": c}))
+
+
+def test_fingerprint_sees_in_place_numpy_write():
+    s = pd.Series(np.zeros(10_000))
+    before = series_fingerprint(s)
+    s.iloc[5_001] = 1.0
+    assert series_fingerprint(s) != before
+
+
+def test_result_cache_bounded_by_bytes():
+    cache = ResultCache(max_bytes=1000)
+    cache.put("a", np.zeros(100))
+    cache.put("b", np.zeros(100))
+    assert cache.info()["size"] == 1 and cache.info()["bytes"] <= 1000
+    assert cache.get("f", "b")[0] and not cache.get("f", "a")[0]
+    cache.put("big", np.zeros(1000))
+    assert not cache.get("f", "big")[0]
+
+
+def test_memoize_returns_fresh_result_for_new_content():
+    calls = []
+
+    @memoize(cache=ResultCache())
+    def total(s):
+        calls.append(1)
+        return float(s.sum())
+
+    assert total(pd.Series(np.ones(10_000))) == 10_000
+    assert total(pd.Series(np.ones(10_000))) == 10_000
+    assert total(pd.Series(np.r_[np.ones(9_999), 2.0])) == 10_001
+    assert len(calls) == 2
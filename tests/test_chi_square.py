@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.stats_tests import MAX_DENSE_CELLS, association_matrix, chi_square_independence, contingency_table
+
+
+def _frame(levels_a, levels_b, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.choice(levels_a, n)
+    b = rng.choice(levels_b, n)
+    if set(levels_a) == set(levels_b):
+        # some association, so the statistic is not ~0
+        b = np.where(rng.random(n) < 0.3, a, b)
+    df = pd.DataFrame({"a": a, "b": b})
+    df.loc[rng.random(n) < 0.02, "a"] = None
+    return df
+
+
+@pytest.mark.parametrize("levels", [["x", "y"], ["x", "y", "z", "w"]])
+def test_dense_and_sparse_agree_with_scipy(levels):
+    df = _frame(levels, levels)
+    table = pd.crosstab(df["a"], df["b"]).to_numpy()
+    ref = stats.chi2_contingency(table)  # Yates-corrected for 2x2
+    dense = chi_square_independence.uncached(df, "a", "b")
+    sparse = chi_square_independence.uncached(df, "a", "b", max_dense_cells=1)
+    assert (sparse["table"] is None) == (len(levels) > 2)  # a sparse 2x2 is densified for Yates
+    for res in (dense, sparse):
+        assert res["chi2"] == pytest.approx(ref[0]) and res["pvalue"] == pytest.approx(ref[1])
+        assert res["dof"] == ref[2]
+    assert dense["cramers_v"] == pytest.approx(sparse["cramers_v"])
+    # association_matrix and Cramér's V use the uncorrected statistic
+    uncorrected = stats.chi2_contingency(table, correction=False)[0]
+    m = association_matrix.uncached(df, ["a", "b"])
+    assert m["chi2"].loc["a", "b"] == pytest.approx(uncorrected)
+    assert dense["cramers_v"] == pytest.approx(np.sqrt(uncorrected / (table.sum() * (min(table.shape) - 1))))
+
+
+def test_2x2_keeps_yates_correction():
+    # regression: the value the chi-square page reported before the sparse/bincount rework
+    df = pd.DataFrame({"a": ["x"] * 30 + ["y"] * 30, "b": ["u"] * 20 + ["v"] * 10 + ["u"] * 8 + ["v"] * 22})
+    for cells in (MAX_DENSE_CELLS, 1):
+        res = chi_square_independence.uncached(df, "a", "b", max_dense_cells=cells)
+        assert res["chi2"] == pytest.approx(8.1026786, rel=1e-6)  # sum (|O - E| - 0.5)^2 / E
+        assert res["pvalue"] == pytest.approx(0.00441999, rel=1e-5)
+        assert res["dof"] == 1
+
+
+def test_contingency_table_matches_crosstab():
+    df = _frame(list("pqrs"), list("uvw"), seed=3)
+    df.loc[df["b"] == "w", "a"] = None  # a level of b that only occurs with missing a is dropped
+    table, rows, cols = contingency_table(df["a"], df["b"])
+    ref = pd.crosstab(df["a"], df["b"])
+    assert list(rows) == list(ref.index) and list(cols) == list(ref.columns)
+    assert (table == ref.to_numpy()).all()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.cleaning import CleaningPlan, RowHashSet, SeenHashes, format_step, row_hashes
+from src.ooc import ChunkedDataset, run_plan_chunked
+
+
+def _frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"g": rng.choice(["a", "b", "c"], n), "x": rng.normal(size=n).round(2),
+                       "y": rng.integers(0, 5, n).astype(float)})
+    df.loc[rng.random(n) < 0.05, "x"] = np.nan
+    df.loc[[10, 20], "x"] = [100.0, -100.0]
+    return pd.concat([df, df.iloc[:200]], ignore_index=True)
+
+
+def test_row_hash_set_runs_match_python_set():
+    rng = np.random.default_rng(1)
+    hs, ref = RowHashSet(), set()
+    for _ in range(20):
+        h = rng.integers(0, 5000, 300).astype(np.uint64)
+        assert (hs.contains(h) == np.array([v in ref for v in h.tolist()])).all()
+        hs.add(h)
+        ref.update(h.tolist())
+    assert len(hs.hashes) == len(ref) and (np.diff(hs.hashes.astype(np.int64)) > 0).all()
+
+
+def test_reapplying_cleaning_keeps_own_rows(tmp_path):
+    df = _frame()
+    plan = CleaningPlan().drop_duplicates(seen_path=str(tmp_path / "seen"))
+    out, _ = plan.run(df, source="upload-1")
+    plan.record_seen(out, "upload-1")
+    again, records = plan.run(df, source="upload-1")
+    assert len(again) == len(out) and records[0]["removed_history"] == 0
+
+    # another upload repeating some rows loses exactly those
+    other = pd.concat([df.iloc[:50], _frame(100, seed=9)], ignore_index=True)
+    res, records = plan.run(other, source="upload-2")
+    seen = set(row_hashes(out).tolist())
+    expected = ~pd.Series(row_hashes(other)).duplicated().to_numpy() & ~np.isin(row_hashes(other), list(seen))
+    assert len(res) == int(expected.sum())
+
+
+def test_rows_removed_by_later_steps_are_not_recorded(tmp_path):
+    df = _frame()
+    plan = CleaningPlan().drop_duplicates(seen_path=str(tmp_path / "seen")).iqr_filter("x")
+    out, _ = plan.run(df, source="s")
+    plan.record_seen(out, "s")
+    recorded = SeenHashes(str(tmp_path / "seen")).load()
+    assert len(recorded) == len(out.drop_duplicates())
+    assert not recorded.contains(row_hashes(df.loc[[10, 20]])).any()
+
+
+def test_nothing_recorded_before_commit(tmp_path):
+    plan = CleaningPlan().drop_duplicates(seen_path=str(tmp_path / "seen"))
+    plan.run(_frame(), source="s")
+    assert len(SeenHashes(str(tmp_path / "seen")).load()) == 0
+
+
+@pytest.mark.parametrize("strategy", ["median", "mean", "zero"])
+def test_chunked_plan_matches_in_memory(strategy):
+    df = _frame()
+    # exact medians: the out-of-core path uses a sketch, so compare with a tight eps
+    plan = CleaningPlan().coerce_numeric("x").fill_missing(strategy).drop_duplicates().iqr_filter("y")
+    expected, _ = plan.run(df)
+    parts = [df.iloc[i:i + 300] for i in range(0, len(df), 300)]
+    out, records = run_plan_chunked(ChunkedDataset(lambda: iter(parts)), plan)
+    try:
+        got = out.to_pandas()
+    finally:
+        out.cleanup()
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, atol=0.02)
+    assert {r["step"] for r in records} == {s["step"] for s in plan.steps}
+
+
+def test_fill_missing_fills_every_non_numeric_column_with_unknown():
+    # as the original fill_missing: numbers by strategy, everything else (text, dates, booleans) "Unknown"
+    df = pd.DataFrame({
+        "n": [1.0, None, 3.0],
+        "s": ["a", None, "b"],
+        "c": pd.Categorical(["u", None, "u"]),
+        "d": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+        "b": pd.Series([True, None, False], dtype=pd.ArrowDtype(pa.bool_())),
+    })
+    out, (rec,) = CleaningPlan().fill_missing("median").run(df)
+    assert out["n"].tolist() == [1.0, 2.0, 3.0]
+    for c in "scdb":
+        assert out[c].iloc[1] == "Unknown" and out[c].iloc[0] == df[c].iloc[0]
+    assert rec["numeric_filled"] == 1 and rec["categorical_filled"] == 4
+    assert sorted(rec["filled_columns"]) == sorted(df.columns)
+    assert format_step(rec) == "Filled missing (numeric=median): numeric=1, categorical=4"
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.stats_tests import correlation_matrix
+
+
+def _frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(1e6, 1, n)
+    df = pd.DataFrame({"x": x, "y": x * 0.5 + rng.normal(0, 1, n), "z": rng.exponential(1, n)})
+    df["w"] = df["z"].round(3).astype(str)  # numeric text, coerced block by block
+    df.loc[rng.random(n) < 0.05, "y"] = np.nan
+    df.loc[5, "w"] = "n/a"
+    return df
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_matches_reference(method):
+    df = _frame()
+    num = df.apply(pd.to_numeric, errors="coerce")
+    if method == "spearman":
+        # ranks are per column, so with missing data only complete rows match scipy exactly
+        df = num = num.dropna()
+    res = correlation_matrix.uncached(df, ["x", "y", "z", "w"], method=method, block_rows=300)
+    ref = num.corr(method=method)
+    np.testing.assert_allclose(res["r"].to_numpy(), ref.to_numpy(), atol=1e-9)
+    ok = num[["x", "y"]].dropna()
+    assert res["n"].loc["x", "y"] == len(ok)
+    test = stats.pearsonr if method == "pearson" else stats.spearmanr
+    assert res["pvalue"].loc["x", "y"] == pytest.approx(test(ok["x"], ok["y"]).pvalue, rel=1e-6)
+    assert res["pairwise_missing"] == (method == "pearson")
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.stats_tests import (adjust_pvalues, batch_group_tests, f_test_variance, group_codes, group_moments,
+                             merge_group_moments, t_test_independent)
+
+
+def _frame(k=4, n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    g = rng.choice([f"g{i}" for i in range(k)], n)
+    scale = 1 + pd.Series(g).str[1:].astype(int).to_numpy() * 0.3
+    df = pd.DataFrame({"g": g, "x": rng.normal(0, scale), "y": rng.exponential(2, n)})
+    df.loc[rng.random(n) < 0.05, "x"] = np.nan
+    return df
+
+
+def _f_scipy(a, b):
+    va, vb = np.var(a, ddof=1), np.var(b, ddof=1)
+    if va >= vb:
+        f, dfn, dfd = va / vb, len(a) - 1, len(b) - 1
+    else:
+        f, dfn, dfd = vb / va, len(b) - 1, len(a) - 1
+    return f, min(1.0, 2 * min(stats.f.sf(f, dfn, dfd), stats.f.cdf(f, dfn, dfd)))
+
+
+def test_batch_matches_scipy():
+    df = _frame()
+    res = batch_group_tests.uncached(df, "g", ["x", "y"], correction="none")
+    assert len(res) == 6 * 2
+    for row in res.itertuples():
+        a = df.loc[df["g"] == row.group1, row.value_col].dropna().to_numpy()
+        b = df.loc[df["g"] == row.group2, row.value_col].dropna().to_numpy()
+        welch = stats.ttest_ind(a, b, equal_var=False)
+        pooled = stats.ttest_ind(a, b, equal_var=True)
+        f, f_p = _f_scipy(a, b)
+        np.testing.assert_allclose([row.welch_t, row.welch_p, row.t, row.t_p, row.F, row.f_p],
+                                   [welch.statistic, welch.pvalue, pooled.statistic, pooled.pvalue, f, f_p],
+                                   rtol=1e-8)
+        np.testing.assert_allclose(row.welch_p_adj, row.welch_p)
+
+
+def test_moment_tests_match_scipy():
+    df = _frame(k=2)
+    x, y = df.loc[df["g"] == "g0", "x"], df.loc[df["g"] == "g1", "x"]
+    a, b = x.dropna().to_numpy(), y.dropna().to_numpy()
+    for equal_var in (False, True):
+        res = t_test_independent.uncached(x, y, equal_var=equal_var)
+        ref = stats.ttest_ind(a, b, equal_var=equal_var)
+        np.testing.assert_allclose([res["t"], res["pvalue"]], [ref.statistic, ref.pvalue], rtol=1e-8)
+    res = f_test_variance.uncached(x, y)
+    np.testing.assert_allclose([res["F"], res["pvalue"]], _f_scipy(a, b), rtol=1e-8)
+
+
+def test_merged_group_moments_match_full():
+    df = _frame()
+    full = group_moments.uncached(df["g"], df["x"])
+    half = len(df) // 2
+    merged = merge_group_moments(group_moments.uncached(df["g"][:half], df["x"][:half]),
+                                 group_moments.uncached(df["g"][half:], df["x"][half:]))
+    pd.testing.assert_frame_equal(merged.sort_index()[["n", "mean", "m2"]], full.sort_index()[["n", "mean", "m2"]],
+                                  check_dtype=False, rtol=1e-10)
+
+
+def test_batch_pair_limit():
+    df = _frame(k=30)
+    with pytest.raises(ValueError, match="comparisons"):
+        batch_group_tests.uncached(df, "g", ["x", "y"], max_pairs=100)
+    assert len(batch_group_tests.uncached(df, "g", ["x"], max_pairs=435)) == 435
+
+
+def test_adjust_pvalues_known_values():
+    p = np.array([0.01, 0.04, 0.03, 0.005, np.nan])
+    np.testing.assert_allclose(adjust_pvalues(p, "holm"), [0.03, 0.06, 0.06, 0.02, np.nan])
+    np.testing.assert_allclose(adjust_pvalues(p, "bh"), [0.02, 0.04, 0.04, 0.02, np.nan])
+    np.testing.assert_allclose(adjust_pvalues(p, "none"), p)
+    with pytest.raises(ValueError):
+        adjust_pvalues(p, "bonferroni")
+
+
+def test_adjust_pvalues_bh_matches_scipy():
+    p = np.random.default_rng(1).random(200) ** 3
+    np.testing.assert_allclose(adjust_pvalues(p, "bh"), stats.false_discovery_control(p))
+
+
+def test_group_codes_match_string_labels():
+    g = pd.Series([1, "1", "b", None, 2, "a", 1], name="g", dtype=object)
+    codes, labels = group_codes.uncached(g)
+    assert list(labels) == ["1", "2", "a", "b"] and labels.name == "g"
+    strings = g.astype("string")
+    for i, label in enumerate(labels):
+        assert ((codes == i) == (strings == label).fillna(False).to_numpy()).all()
+    assert codes[3] == -1
+    m = group_moments.uncached(g, pd.Series(np.arange(7.0)))
+    assert list(m.index) == list(labels) and m.loc["1", "n"] == 3
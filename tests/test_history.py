@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from src.history import HISTORY_KEY, checkout, commit_version, start_history
+from src.store import SESSION_KEY, bytes_key, get_store
+
+
+def _upload(state, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"a": rng.normal(size=50), "b": rng.integers(0, 5, 50), "c": list("xy") * 25})
+    key = get_store().put_columns(df, key=bytes_key(df.to_csv().encode(), test=True))
+    start_history(state, key, "upload")
+    state.setdefault("log", []).append("Uploaded")
+    return df, key
+
+
+def test_first_version_shares_columns():
+    state = {}
+    df, key = _upload(state)
+    store = get_store()
+    base = store.columns_of(key)
+    assert set(base) == {"a", "b", "c"}
+    pd.testing.assert_frame_equal(store.get(key).astype(df.dtypes.to_dict()), df, check_dtype=False)
+
+    out = df.assign(a=df["a"].round(1))
+    new = commit_version(state, out, "round", [{"step": "round", "column": "a"}], touched={"a"})
+    cols = store.columns_of(new)
+    assert cols["b"] == base["b"] and cols["c"] == base["c"] and cols["a"] != base["a"]
+    assert state[SESSION_KEY] == new
+
+
+def test_branch_drops_undone_records_from_log():
+    state = {}
+    df, _ = _upload(state, seed=1)
+    r1, r2, r3 = [{"step": "s1"}], [{"step": "s2"}], [{"step": "s3"}]
+    commit_version(state, df.head(40), "v1", r1)
+    commit_version(state, df.head(30), "v2", r2)
+    assert state["log"] == ["Uploaded", *r1, *r2]
+
+    checkout(state, 1)  # undo v2, then branch
+    commit_version(state, df.head(20), "v2'", r3)
+    assert state["log"] == ["Uploaded", *r1, *r3]
+    assert [v["label"] for v in state[HISTORY_KEY].versions] == ["upload", "v1", "v2'"]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from src.io import SNIFF_BYTES, compact_dtypes, iter_csv_chunks, read_csv_bytes
+
+
+def test_compact_category_threshold():
+    n = 10_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "few": rng.choice(["a", "b", "c"], n),
+        "many": [f"id{i % 2000}" for i in range(n)],  # 20% distinct: stays text
+        "n": np.arange(n, dtype=np.int64),
+    }).astype({"few": object, "many": object})
+    out, report = compact_dtypes(df)
+    assert isinstance(out["few"].dtype, pd.CategoricalDtype)
+    assert not isinstance(out["many"].dtype, pd.CategoricalDtype)
+    assert out["n"].dtype == np.int16
+    assert report["saved_bytes"] == report["before_bytes"] - report["after_bytes"] > 0
+    out, _ = compact_dtypes(df, max_categories=2)
+    assert not isinstance(out["few"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(out.astype({"n": np.int64, "many": object}), df, check_dtype=False)
+
+
+def test_read_csv_bytes_late_invalid_byte():
+    # the sniffed prefix is clean utf-8; bytes past it decode in no candidate encoding
+    rows = SNIFF_BYTES // 4 + 10
+    raw = b"a,b\n" + b"x,1\n" * rows + b"\x82\xff,2\n"
+    for kwargs in ({}, {"engine": "pyarrow", "dtype_backend": "pyarrow"}):
+        df = read_csv_bytes(raw, **kwargs)
+        assert len(df) == rows + 1
+        assert df["a"].iloc[-1] == "\ufffd\ufffd"
+        assert df["a"].iloc[0] == "x"
+
+
+def _late_japanese_csv():
+    # ASCII rows past the sniffed prefix, then the first Japanese row (cp932)
+    rows = SNIFF_BYTES // 4 + 10
+    raw = b"a,b\n" + b"x,1\n" * rows + "東京,2\n".encode("cp932")
+    return raw, rows
+
+
+def test_read_csv_bytes_late_cp932():
+    raw, rows = _late_japanese_csv()
+    for kwargs in ({}, {"engine": "pyarrow", "dtype_backend": "pyarrow"}, {"chunksize": 100_000}):
+        df = read_csv_bytes(raw, **kwargs)
+        assert len(df) == rows + 1
+        assert df["a"].iloc[-1] == "東京"
+        assert (df["a"].iloc[:-1] == "x").all()
+        assert df.index.equals(pd.RangeIndex(rows + 1))
+
+
+def test_iter_csv_chunks_restarts_without_repeating_rows(tmp_path):
+    raw, rows = _late_japanese_csv()
+    path = tmp_path / "late.csv"
+    path.write_bytes(raw)
+    chunks = list(iter_csv_chunks(str(path), chunksize=50_000))
+    df = pd.concat(chunks)
+    assert len(df) == rows + 1 and df["a"].iloc[-1] == "東京"
+    assert df.index.is_unique
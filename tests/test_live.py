@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.live import LiveDataset
+from src.stats_tests import group_moments
+from src.store import get_store
+from src.viz import pareto_table, resample_mean, time_index
+
+
+def _batch(seed, n=500):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01") + pd.Timedelta(days=100 * seed)  # gaps between batches
+    df = pd.DataFrame({
+        "date": (start + pd.to_timedelta(rng.integers(0, 60 * 24, n), unit="h")).strftime("%Y-%m-%d %H:%M"),
+        "g": rng.choice(["a", "b", "c"], n),
+        "h": rng.choice(["x", "y"], n),
+        "v": rng.normal(seed, 1, n),
+    })
+    df.loc[rng.random(n) < 0.05, "g"] = None
+    return df
+
+
+AGGS = [("group_moments", "g", "v"), ("contingency", "g", "h"), ("category_counts", "g"), ("resample", "date", "v", "W")]
+
+
+def _full(kind, df, *args):
+    if kind == "group_moments":
+        return group_moments.uncached(df[args[0]], df[args[1]]).sort_index()
+    if kind == "contingency":
+        return pd.crosstab(df[args[0]], df[args[1]])
+    if kind == "category_counts":
+        return pareto_table.uncached(df, args[0])
+    return resample_mean(time_index.uncached(df[args[0]], df[args[1]]), args[2])
+
+
+def _assert_same(kind, got, ref):
+    if kind == "resample":
+        pd.testing.assert_series_equal(got, ref, check_freq=False, check_names=False, check_index_type=False)
+    elif kind == "category_counts":
+        got, ref = got.set_index("g").sort_index(), ref.set_index("g").sort_index()
+        pd.testing.assert_frame_equal(got, ref, check_dtype=False, check_index_type=False)
+    else:
+        pd.testing.assert_frame_equal(got, ref[got.columns] if kind == "group_moments" else ref,
+                                      check_dtype=False, check_names=False, check_index_type=False,
+                                      check_column_type=False)
+
+
+@pytest.mark.parametrize("agg", AGGS, ids=[a[0] for a in AGGS])
+def test_aggregates_match_full_recompute(agg):
+    kind, *args = agg
+    live = LiveDataset()
+    batches = [_batch(i) for i in range(4)]
+    live.append(batches[0])
+    live.aggregate(kind, *args)  # built over the history, then updated batch by batch
+    for b in batches[1:]:
+        assert live.append(b) == len(b)
+    assert live.append(batches[1]) == 0  # the same batch twice is ignored
+
+    full = pd.concat(batches, ignore_index=True)
+    _assert_same(kind, live.aggregate(kind, *args), _full(kind, full, *args))
+    # the same aggregate built from scratch over the stored batches
+    fresh = LiveDataset()
+    fresh.parts = list(live.parts)
+    _assert_same(kind, fresh.aggregate(kind, *args), _full(kind, full, *args))
+    assert len(get_store().get(live.key)) == len(full) == live.rows
@@ -0,0 +1,36 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ooc import chunked_summary
+from src.progressive import Cancelled, cancellable_chunks
+
+
+@pytest.mark.parametrize("n", [0, 1, 1000, 1001])
+def test_chunked_summary_matches_pandas(n):
+    rng = np.random.default_rng(n)
+    s = pd.Series(rng.normal(5, 2, n), name="x")
+    s[rng.random(n) < 0.1] = np.nan
+    res = chunked_summary(cancellable_chunks(s.to_frame(), threading.Event(), chunk_rows=97), "x")
+    assert res["count"] == s.count()
+    assert res["median_rank_error"] == 0.0  # small columns stay exact
+    np.testing.assert_allclose([res["mean"], res["median"]], [s.mean(), s.median()], rtol=1e-12)
+
+
+def test_chunked_summary_median_within_rank_error():
+    x = np.random.default_rng(0).lognormal(size=300_000)
+    res = chunked_summary(cancellable_chunks(pd.DataFrame({"x": x}), threading.Event(), chunk_rows=20_000),
+                          "x", eps=0.005)
+    assert res["median_rank_error"] == 0.005
+    rank = np.searchsorted(np.sort(x), res["median"]) / len(x)
+    assert abs(rank - 0.5) <= 0.005
+    assert res["mean"] == pytest.approx(x.mean(), rel=1e-12)
+
+
+def test_chunked_summary_cancel():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(Cancelled):
+        chunked_summary(cancellable_chunks(pd.DataFrame({"x": [1.0, 2.0]}), cancel), "x")
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+from src.resampling import bootstrap_ci, permutation_test
+
+
+def _groups(shift, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=300), rng.normal(shift, size=300)
+
+
+def test_concurrent_tests_do_not_share_data():
+    a, b = _groups(0.0, 1), _groups(1.0, 2)
+    solo = [permutation_test.uncached(*g, "welch_t", n_resamples=2000, alpha=None) for g in (a, b)]
+    with ThreadPoolExecutor(2) as pool:
+        for _ in range(3):
+            futs = [pool.submit(permutation_test.uncached, *g, "welch_t", n_resamples=2000, alpha=None)
+                    for g in (a, b)]
+            assert [f.result()["pvalue"] for f in futs] == [r["pvalue"] for r in solo]
+
+
+def test_pool_matches_in_process():
+    x, y = _groups(0.1, 3)
+    one = permutation_test.uncached(x, y, "mean_diff", n_resamples=3000, alpha=None, workers=1)
+    two = permutation_test.uncached(x, y, "mean_diff", n_resamples=3000, alpha=None, workers=2)
+    assert one["pvalue"] == two["pvalue"]
+
+
+def test_permutation_pvalue_close_to_welch():
+    x, y = _groups(0.2, 4)
+    res = permutation_test.uncached(x, y, "welch_t", n_resamples=9999, alpha=None)
+    assert abs(res["pvalue"] - stats.ttest_ind(x, y, equal_var=False).pvalue) < 0.02
+
+
+def test_bootstrap_ci_covers_observed_difference():
+    x, y = _groups(0.5, 5)
+    res = bootstrap_ci.uncached(x, y, "mean_diff", n_resamples=2000)
+    lo, hi = res["ci"]
+    assert lo < res["observed"] < hi
+
+
+def _shm_segments():
+    return {f for f in os.listdir("/dev/shm") if f.startswith("psm_")} if os.path.isdir("/dev/shm") else set()
+
+
+def test_pool_shares_samples_and_releases_them():
+    x, y = _groups(0.1, 6)
+    before = _shm_segments()
+    one = bootstrap_ci.uncached(x, y, "welch_t", n_resamples=1500, workers=1)
+    two = bootstrap_ci.uncached(x, y, "welch_t", n_resamples=1500, workers=3)
+    assert one["ci"] == two["ci"]
+    # early stop with blocks still in flight
+    res = permutation_test.uncached(x, y + 2, "mean_diff", n_resamples=50_000, alpha=0.05, workers=3)
+    assert res["stopped_early"] and res["n_resamples"] < 50_000
+    assert _shm_segments() == before
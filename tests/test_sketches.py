@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sketches import HeavyHitters, QuantileSketch, heavy_hitters_series
+
+QS = np.linspace(0, 1, 41)
+
+
+def _rank_error(data_sorted, values, qs):
+    # normalized distance between the target rank and the rank interval of each returned value
+    n = len(data_sorted)
+    lo = np.searchsorted(data_sorted, values, side="left") / n
+    hi = np.searchsorted(data_sorted, values, side="right") / n
+    return np.maximum(np.maximum(lo - qs, qs - hi), 0.0)
+
+
+def test_quantile_sketch_exact_while_small():
+    x = np.random.default_rng(0).normal(size=50)
+    sk = QuantileSketch(eps=0.01, seed=0).update(x)
+    assert sk.rank_error == 0.0
+    np.testing.assert_allclose(sk.quantile(QS), np.quantile(x, QS))
+
+
+@pytest.mark.parametrize("eps", [0.01, 0.005])
+def test_quantile_sketch_rank_error(eps):
+    rng = np.random.default_rng(1)
+    x = np.concatenate([rng.lognormal(size=150_000), np.full(20_000, 3.0), rng.uniform(-5, 0, 30_000)])
+    rng.shuffle(x)
+    sk = QuantileSketch(eps=eps, seed=2)
+    for chunk in np.array_split(x, 37):
+        sk.update(chunk)
+    assert sk.n == len(x) and sk.rank_error == eps
+    assert len(np.concatenate(sk._levels)) < len(x) / 10
+    assert _rank_error(np.sort(x), sk.quantile(QS), QS).max() <= eps
+    assert sk.quantile(0) == x.min() and sk.quantile(1) == x.max()
+
+
+def test_quantile_sketch_merge():
+    rng = np.random.default_rng(3)
+    parts = [rng.normal(i, 1 + i, 40_000) for i in range(5)]
+    merged = QuantileSketch(eps=0.01, seed=0)
+    for i, p in enumerate(parts):
+        merged.merge(QuantileSketch(eps=0.01, seed=i).update(p))
+    x = np.sort(np.concatenate(parts))
+    assert merged.n == len(x)
+    assert _rank_error(x, merged.quantile(QS), QS).max() <= 0.01
+    # NaN and non-numeric values are skipped
+    assert QuantileSketch().update([1.0, np.nan, "a", 3.0]).quantile(0.5) == 2.0
+
+
+def _zipf(n=200_000, seed=4):
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.zipf(1.3, n) % 50_000).astype(str)
+
+
+def _check_heavy_hitters(hh, s):
+    true = s.value_counts()
+    assert hh.n == len(s)
+    assert len(hh.counts) <= hh.capacity
+    assert hh.max_error <= len(s) / (hh.capacity + 1)
+    est = hh.counts.reindex(true.index, fill_value=0)
+    # counts are lower bounds, low by at most max_error
+    assert (est <= true).all() and (est >= true - hh.max_error).all()
+    # every value above n / (capacity + 1) is kept
+    assert set(true[true > len(s) / (hh.capacity + 1)].index) <= set(hh.counts.index)
+
+
+def test_heavy_hitters_error_bound():
+    s = _zipf()
+    hh = heavy_hitters_series(s, capacity=200, chunk_rows=7_000)
+    assert not hh.exact
+    _check_heavy_hitters(hh, s)
+
+
+def test_heavy_hitters_merge():
+    s = _zipf(seed=5)
+    merged = HeavyHitters(200)
+    for part in np.array_split(np.arange(len(s)), 6):
+        merged.merge(heavy_hitters_series(s.iloc[part], capacity=200, chunk_rows=10_000))
+    _check_heavy_hitters(merged, s)
+    assert list(merged.top(5).index) == list(s.value_counts().head(5).index)
+
+
+def test_heavy_hitters_exact_within_capacity():
+    s = pd.Series(["a", "b", None, "b", "c", "b", "a"] * 100)
+    hh = HeavyHitters(10).update(s.iloc[:300]).merge(HeavyHitters(10).update(s.iloc[300:]))
+    assert hh.exact
+    expected = s.fillna("Unknown").value_counts()
+    pd.testing.assert_series_equal(hh.top().sort_index(), expected.sort_index(), check_names=False,
+                                   check_index_type=False, check_dtype=False)
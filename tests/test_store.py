@@ -0,0 +1,85 @@
+import gc
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.history import HISTORY_KEY
+from src.store import NOTICE_KEY, SESSION_KEY, DatasetStore, session_df
+
+
+def _frame(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"a": rng.normal(size=n), "b": rng.integers(0, 9, n)})
+
+
+def _age(store, key, seconds):
+    for path in (store.path(key), store._manifest_path(key)):
+        if os.path.exists(path):
+            t = time.time() - seconds
+            os.utime(path, (t, t))
+
+
+def test_cleanup_deletes_least_recently_used(tmp_path):
+    store = DatasetStore(str(tmp_path), memory_budget=0)
+    old, mid, new = (store.put(_frame(i)) for i in range(3))
+    _age(store, old, 300)
+    _age(store, mid, 200)
+    _age(store, new, 100)
+    store.get(old)  # reading counts as use
+    size = os.path.getsize(store.path(new))
+    deleted = store.cleanup(budget=2 * size + 1, keep={new})
+    assert deleted == [mid]
+    assert old in store and new in store and mid not in store
+
+
+def test_cleanup_keeps_shared_columns_and_live_parts(tmp_path):
+    store = DatasetStore(str(tmp_path), memory_budget=0)
+    df = _frame(0)
+    v0 = store.put_columns(df)
+    v1 = store.put_columns(df.assign(a=df["a"] * 2), reuse={"b": store.columns_of(v0)["b"]})
+    p1, p2 = store.put(_frame(1)), store.put(_frame(2))
+    live = store.put_parts([p1, p2])
+    for i, key in enumerate([p1, p2, v0, v1, live]):
+        _age(store, key, 500 - 100 * i)
+    store._mapped.clear()
+
+    deleted = store.cleanup(budget=1, keep={v1})
+    # v1 is kept with both its columns (b shared with v0); the parts go only after their manifest
+    assert deleted == [v0, live, p1, p2]
+    pd.testing.assert_series_equal(store.get(v1)["b"], df["b"], check_dtype=False)
+    assert sorted(f for f in os.listdir(tmp_path) if f.startswith("col-")) == \
+        sorted(f"col-{k}.arrow" for k in store.columns_of(v1).values())
+
+
+def test_cleanup_spares_history_versions_until_released(tmp_path, monkeypatch):
+    import src.store
+    from src.history import History, commit_version
+
+    store = DatasetStore(str(tmp_path), memory_budget=0)
+    monkeypatch.setattr(src.store, "_default_store", store)
+    df = _frame(0)
+    state = {}
+    v0 = store.put_columns(df)
+    state[HISTORY_KEY] = History(v0, "upload")
+    v1 = commit_version(state, df.head(100), "head", [])
+    other = store.put(_frame(1))
+    for key in (v0, v1, other):
+        _age(store, key, 100)
+
+    assert store.cleanup(budget=1) == [other]
+    assert session_df({SESSION_KEY: v0}) is not None and len(store.get(v1)) == 100
+
+    # the session ends: its versions are released
+    del state
+    gc.collect()
+    store._mapped.clear()
+    assert sorted(store.cleanup(budget=1)) == sorted([v0, v1])
+
+
+def test_session_df_resets_session_when_dataset_is_gone():
+    state = {SESSION_KEY: "0" * 32, HISTORY_KEY: object()}
+    assert session_df(state) is None
+    assert SESSION_KEY not in state and HISTORY_KEY not in state
+    assert "Upload it again" in state[NOTICE_KEY]